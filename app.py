@@ -3,20 +3,34 @@ import dash
 import logging
 import os
 from pathlib import Path
-from dash.dependencies import Input, Output
-from dash import html, dcc
+from dash.dependencies import Input, Output, State
+from dash import html, dcc, no_update, ctx, Patch
+from flask import jsonify
 
-from utils.helpers import load_config, build_checklist_options_from_components
+from utils.helpers import load_config
 from utils.dataset_manager import (
     scan_datasets,
-    load_processed_or_build,
-    get_duckdb_con,
-    load_full_df_to_ram,
-    get_ram_df,
+    make_dataset_handle,
+    resolve_dataset_handle,
 )
+from utils.build_jobs import (
+    build_in_progress,
+    build_status_text,
+    build_step_durations,
+    ensure_dataset_built,
+    has_built_version,
+    is_ready,
+    read_build_status,
+    readiness,
+)
+from utils.compression import register_compression
+from utils.duckdb_pool import read_connection
+from utils.metrics import REGISTRY, instrument_callback, register_metrics_route
 from layouts.dashboard_layout import serve_layout
 from callbacks.filtros import registrar_callbacks_filtros
-from callbacks.grafico_temporal import actualizar_grafico
+from callbacks.grafico_temporal import (
+    actualizar_grafico, actualizar_series, actualizar_zoom, rango_x, series_trazadas,
+)
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 log = logging.getLogger("App")
@@ -46,7 +60,49 @@ config_inicial = load_config(datasets_disponibles[dataset_defecto]["config"])
 logging.info("Config inicial cargada correctamente")
 
 # Registrar callbacks de filtros (usa stores para datos dinámicos)
-registrar_callbacks_filtros(app)
+registrar_callbacks_filtros(app, datasets_disponibles)
+
+# -------------------------------------------------------------
+# Métricas Prometheus en /metrics (callbacks, pipeline, DuckDB, cachés RAM).
+# Las construcciones corren en otro proceso: sus pasos se exportan desde
+# el fichero de estado de cada dataset.
+# -------------------------------------------------------------
+register_metrics_route(server)
+# gzip de las respuestas; registrado después para que /metrics mida los bytes comprimidos
+register_compression(server)
+
+
+def _metricas_construccion():
+    out = {}
+    for nombre, info in datasets_disponibles.items():
+        for paso, segundos in build_step_durations(read_build_status(info)).items():
+            out[(("dataset", nombre), ("step", paso))] = round(segundos, 3)
+    return out
+
+
+REGISTRY.gauge_callback("mds_build_step_seconds", "Duración de cada paso en la última construcción",
+                        _metricas_construccion)
+REGISTRY.gauge_callback("mds_build_running", "Construcción en curso por dataset", lambda: {
+    (("dataset", nombre),): int(build_in_progress(read_build_status(info)))
+    for nombre, info in datasets_disponibles.items()
+})
+
+# -------------------------------------------------------------
+# Arranque sin construcciones en frío: lo normal es que `python -m
+# utils.prebuild` haya construido todo antes (ExecStartPre del servicio); si
+# no, lo que falte se encola aquí y /ready responde 503 hasta que termine.
+# -------------------------------------------------------------
+if os.environ.get("MDS_BUILD_ON_START", "1") != "0":
+    for _nombre, _info in datasets_disponibles.items():
+        ensure_dataset_built(_nombre, _info)
+
+
+@server.route("/ready")
+def ready():
+    estado = readiness(datasets_disponibles)
+    listo = is_ready(estado)
+    return jsonify({"ready": listo, **estado}), 200 if listo else 503
+
 
 # -------------------------------------------------------------
 # Layout estático (evaluado una sola vez)
@@ -57,7 +113,9 @@ def get_layout():
             dcc.Store(id="current-config"),
             dcc.Store(id="current-components"),
             dcc.Store(id="current-columns"),
-            dcc.Store(id="cached-df"),   # DF serializado JSON
+            dcc.Store(id="dataset-handle"),   # {dataset, version}: el DF vive en el servidor
+            dcc.Store(id="grafico-series"),   # {handle, series, x_range} de la figura dibujada
+            dcc.Interval(id="build-poll", interval=1000, disabled=True),  # progreso de construcción
 
             serve_layout(
                 config=config_inicial,
@@ -73,74 +131,161 @@ def get_layout():
 app.layout = get_layout()
 
 # -------------------------------------------------------------
-# CALLBACK: al cambiar dataset -> asegurar DuckDB, cargar DF a RAM (si falta),
-#             y devolver stores (NO checklist options aquí para evitar duplicados)
+# CALLBACK: al cambiar dataset -> comprobar si hay que construir/actualizar
+#             (en segundo plano), devolver stores de la última versión buena
+#             y sondear el progreso mientras dure la construcción
 # -------------------------------------------------------------
 @app.callback(
     [
         Output("current-config", "data"),
         Output("current-components", "data"),
         Output("current-columns", "data"),
-        Output("cached-df", "data"),
+        Output("dataset-handle", "data"),
+        Output("build-status", "children"),
+        Output("build-poll", "disabled"),
+        Output("build-retry", "style"),
     ],
-    Input("dataset-selector", "value"),
+    [
+        Input("dataset-selector", "value"),
+        Input("build-poll", "n_intervals"),
+        Input("build-retry", "n_clicks"),
+    ],
+    State("dataset-handle", "data"),
 )
-def actualizar_dataset(dataset_name):
+@instrument_callback("actualizar_dataset")
+def actualizar_dataset(dataset_name, _n_intervals, _n_retry, handle_actual):
     info = datasets_disponibles[dataset_name]
 
     # 1) cargar config y componentes
     cfg = load_config(info["config"])
     components_dict = info.get("components", {}) or {}
 
-    # 2) asegurar tabla DuckDB (no cargamos todo aún)
-    con = get_duckdb_con(info["duckdb"])
-    # load_processed_or_build garantizará que la tabla exista (sin traer a RAM completo)
-    df_head, cols = load_processed_or_build(con, info, cfg)
+    # 2) la pipeline nunca corre en el request: si falta la tabla o hay CSV
+    #    nuevos se encola una construcción y se sondea su progreso. Una
+    #    construcción fallida solo se repite si cambia la entrada o el usuario
+    #    pulsa "Reintentar"
+    status = ensure_dataset_built(dataset_name, info, force=ctx.triggered_id == "build-retry")
+    en_curso = build_in_progress(status)
+    texto = build_status_text(status)
+    retry_style = {"display": "inline-block" if (status or {}).get("state") == "error" else "none"}
 
-    # 3) cargar en RAM SOLO SI NO ESTÁ (Option B)
-    df_ram = get_ram_df(dataset_name)
-    if df_ram is None:
-        df_ram = load_full_df_to_ram(dataset_name, info)
-    else:
-        logging.info("Usando dataset desde RAM: %s", dataset_name)
+    if not has_built_version(info):
+        # primera construcción: todavía no hay nada que enseñar
+        return cfg, components_dict, [], None, texto, not en_curso, retry_style
 
-    # 4) serializar DF a JSON para pasar por Store (orient split es eficiente)
-    df_json = df_ram.to_json(date_format="iso", orient="split")
+    # 3) al navegador solo viaja un handle de la última versión publicada; los
+    #    datos se quedan en el servidor
+    handle = make_dataset_handle(dataset_name, info)
+    if ctx.triggered_id == "build-poll" and handle == handle_actual:
+        return no_update, no_update, no_update, no_update, texto, not en_curso, retry_style
 
-    log.info("Dataset '%s' preparado: filas=%s cols=%s", dataset_name, len(df_ram), len(cols))
+    ds = resolve_dataset_handle(handle, datasets_disponibles)
+    cols = [c for c in ds.columns if c != "Timestamp"]
+
+    log.info("Dataset '%s' preparado: filas=%s cols=%s", dataset_name, ds.n_rows, len(cols))
 
     # Devuelve stores (NO checklist aquí)
-    return cfg, components_dict, cols, df_json
+    return cfg, components_dict, cols, handle, texto, not en_curso, retry_style
 
 # -------------------------------------------------------------
-# CALLBACK: graficar usando DF cacheado (cached-df store)
+# CALLBACK: graficar resolviendo el handle al DF en RAM del servidor
+#   - dataset nuevo (o sin figura previa): figura completa
+#   - solo cambia la selección: Patch que quita/añade las series afectadas
 # -------------------------------------------------------------
 @app.callback(
-    Output("grafico-temporal", "figure"),
+    [
+        Output("grafico-temporal", "figure"),
+        Output("grafico-series", "data"),
+    ],
     [
         Input("checklist-columnas", "value"),
-        Input("cached-df", "data"),
-    ]
+        Input("dataset-handle", "data"),
+    ],
+    State("grafico-series", "data"),
 )
-def grafico_callback(columnas, df_json):
+@instrument_callback("grafico_callback")
+def grafico_callback(columnas, handle, estado):
     from plotly.graph_objects import Figure
-    import pandas as pd
 
     if not columnas:
-        return Figure().update_layout(title="Selecciona una columna")
-
-    if not df_json:
-        return Figure().update_layout(title="Dataset no cargado todavía")
+        return Figure().update_layout(title="Selecciona una columna"), None
 
-    df = pd.read_json(df_json, orient="split")
+    ds = resolve_dataset_handle(handle, datasets_disponibles)
+    if ds is None:
+        return Figure().update_layout(title="Dataset no cargado todavía"), None
 
-    return actualizar_grafico(
-        columnas_seleccionadas=columnas,
-        relayout_data=None,
-        df_plot=df,
+    info = datasets_disponibles[handle["dataset"]]
+    comunes = dict(
+        df_plot=None,
         x_timer="Timestamp",
-        format_label_with_unit=lambda c: c
+        format_label_with_unit=lambda c: c,
+        table=info["table_name"],
+        cache_key=(handle["dataset"], handle["version"]),
+        dataset=ds,
     )
+    # los carriles de eventos se renumeran al cambiar la selección: figura completa
+    incremental = (
+        ctx.triggered_id == "checklist-columnas"
+        and estado and estado.get("handle") == handle and estado.get("series")
+        and not ds.is_event_log
+    )
+    with read_connection(info["duckdb"]) as con:
+        if incremental:
+            patch, series = actualizar_series(
+                columnas_seleccionadas=columnas,
+                series_actuales=estado["series"],
+                x_range=estado.get("x_range"),
+                con=con,
+                **comunes,
+            )
+            return patch, {"handle": handle, "series": series, "x_range": estado.get("x_range")}
+
+        fig = actualizar_grafico(columnas_seleccionadas=columnas, relayout_data=None, con=con, **comunes)
+    return fig, {"handle": handle, "series": series_trazadas(columnas, dataset=ds), "x_range": None}
+
+# -------------------------------------------------------------
+# CALLBACK: pan/zoom -> re-agregar solo las trazas para el nuevo rango X
+# -------------------------------------------------------------
+@app.callback(
+    [
+        Output("grafico-temporal", "figure", allow_duplicate=True),
+        Output("grafico-series", "data", allow_duplicate=True),
+    ],
+    Input("grafico-temporal", "relayoutData"),
+    [
+        State("grafico-series", "data"),
+        State("dataset-handle", "data"),
+    ],
+    prevent_initial_call=True,
+)
+@instrument_callback("zoom_callback")
+def zoom_callback(relayout_data, estado, handle):
+    if not estado or not estado.get("series") or not relayout_data or estado.get("handle") != handle:
+        return no_update, no_update
+
+    ds = resolve_dataset_handle(handle, datasets_disponibles)
+    if ds is None:
+        return no_update, no_update
+
+    info = datasets_disponibles[handle["dataset"]]
+    with read_connection(info["duckdb"]) as con:
+        patch = actualizar_zoom(
+            columnas_seleccionadas=estado["series"],
+            relayout_data=relayout_data,
+            df_plot=None,
+            x_timer="Timestamp",
+            con=con,
+            table=info["table_name"],
+            cache_key=(handle["dataset"], handle["version"]),
+            dataset=ds,
+        )
+    if patch is no_update:
+        return no_update, no_update
+
+    # rango X visible, para calcular en él las series que se añadan después
+    rango = Patch()
+    rango["x_range"] = rango_x(relayout_data)
+    return patch, rango
 
 # -------------------------------------------------------------
 # MAIN
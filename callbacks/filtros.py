@@ -2,17 +2,21 @@
 from dash import ctx
 from dash.dependencies import Input, Output, State
 from dash import no_update
-from utils.helpers import build_checklist_options_from_components
+from utils.dataset_manager import resolve_dataset_handle
+from utils.metrics import instrument_callback
 
-def registrar_callbacks_filtros(app):
+def registrar_callbacks_filtros(app, datasets_disponibles):
     """
     Callback único que gestiona:
       - dropdown-componentes
       - dropdown-tipo
       - boton-mostrar-seleccionados
       - dataset-selector (para reinicializar al cambiar dataset)
+      - current-columns (las columnas llegan cuando termina la construcción)
     Este callback produce checklist.options + checklist.value (única fuente), evitando
     outputs duplicados en la app.
+    Las opciones salen del catálogo del dataset (ServerDataset.options), construido
+    una vez por versión: los filtros son búsquedas en sus índices.
     """
 
     @app.callback(
@@ -30,18 +34,18 @@ def registrar_callbacks_filtros(app):
             Input('dropdown-tipo', 'value'),
             Input('boton-mostrar-seleccionados', 'n_clicks'),
             Input('dataset-selector', 'value'),  # reinicializa al cambiar dataset
+            Input('current-columns', 'data'),    # ... y cuando hay columnas nuevas
         ],
         [
             State('checklist-columnas', 'value'),
-            State('current-config', 'data'),
-            State('current-components', 'data'),
-            State('current-columns', 'data'),
+            State('dataset-handle', 'data'),
             State('boton-mostrar-seleccionados', 'className'),
         ],
         prevent_initial_call=False
     )
-    def actualizar_checklist(componente_sel, tipo_sel, n_clicks, dataset_name,
-                              seleccionados, current_config, components_dict, cols, boton_clase):
+    @instrument_callback("actualizar_checklist")
+    def actualizar_checklist(componente_sel, tipo_sel, n_clicks, dataset_name, cols,
+                              seleccionados, handle, boton_clase):
         """
         - Cuando dataset_name cambia -> debemos re-generar options base y devolver defaults.
         - Cuando dropdowns o botón cambian -> filtrar opciones sobre la base.
@@ -49,22 +53,17 @@ def registrar_callbacks_filtros(app):
 
         triggered = ctx.triggered_id
 
-        components_dict = components_dict or {}
-        cols = cols or []
-        current_config = current_config or {}
-
-        # dataset_type viene del config almacenado
-        dataset_type = current_config.get("metadata", {}).get("type") if current_config else None
-
-        # Construir options base
-        opciones_base = build_checklist_options_from_components(components_dict, dataset_type, cols)
-
-        # Si no hay opciones base -> fallback con columnas reales
-        if not opciones_base:
-            opciones_base = [{"label": c, "value": c} for c in cols if c.lower() != "timestamp"]
+        # catálogo de la versión cargada (el handle llega junto con current-columns)
+        ds = None
+        if handle and handle.get("dataset") == dataset_name:
+            ds = resolve_dataset_handle(handle, datasets_disponibles)
+        if ds is None:
+            return [], [], 'ALL', "", 'ALL', "", ""
+        catalogo = ds.options
+        opciones_base = catalogo.options
 
         # ---------- Caso: cambio de dataset (o carga inicial) ----------
-        if triggered == 'dataset-selector' or triggered is None:
+        if triggered in ('dataset-selector', 'current-columns') or triggered is None:
             # Resetar todo al cambio de dataset
             default_value = [opciones_base[0]["value"]] if opciones_base else []
             return opciones_base, default_value, 'ALL', "", 'ALL', "", ""
@@ -78,7 +77,7 @@ def registrar_callbacks_filtros(app):
             else:
                 # Activar: mostrar solo las opciones actualmente seleccionadas
                 if seleccionados:
-                    opciones_filtradas = [opt for opt in opciones_base if opt['value'] in seleccionados]
+                    opciones_filtradas = catalogo.for_values(seleccionados)
                     return opciones_filtradas, seleccionados, 'ALL', "", 'ALL', "", "active-filter"
                 else:
                     # no hay seleccionados -> no cambiar
@@ -88,29 +87,15 @@ def registrar_callbacks_filtros(app):
         if triggered == 'dropdown-componentes':
             if componente_sel in (None, 'ALL'):
                 return opciones_base, seleccionados or [], 'ALL', "", 'ALL', "", ""
-            # Filtrar por prefijo "comp_id::" o por label que contenga nombre del componente
-            opciones_filtradas = [opt for opt in opciones_base if opt['value'].startswith(f"{componente_sel}::") or f"({componente_sel})" in opt['label']]
+            opciones_filtradas = catalogo.for_component(componente_sel)
             return opciones_filtradas, seleccionados or [], componente_sel, "active-filter", 'ALL', "", ""
 
         # ---------- Caso: filtro por tipo ----------
         if triggered == 'dropdown-tipo':
             if tipo_sel in (None, 'ALL'):
                 return opciones_base, seleccionados or [], 'ALL', "", 'ALL', "", ""
-            # Filtrar por tipo: buscamos en labels o en metadata del components_dict
-            opciones_filtradas = []
-            # First attempt: label matching
-            for opt in opciones_base:
-                if tipo_sel.lower() in opt['label'].lower():
-                    opciones_filtradas.append(opt)
-            # If nothing found by label, try components_dict meta (tabular)
-            if not opciones_filtradas:
-                for comp_id, comp in components_dict.items():
-                    for meas_key, meas_meta in comp.get("measurements", {}).items():
-                        if meas_meta.get("type") == tipo_sel:
-                            # find corresponding option(s)
-                            for opt in opciones_base:
-                                if opt['value'] == meas_key or opt['value'].endswith(f"::{meas_key}"):
-                                    opciones_filtradas.append(opt)
+            # tipo del YAML (Tabular) o raw/from_to (EventEncoded); si no, por etiqueta
+            opciones_filtradas = catalogo.for_type(tipo_sel)
             return opciones_filtradas, seleccionados or [], 'ALL', "", tipo_sel, "active-filter", ""
 
         # fallback
@@ -1,124 +1,541 @@
-# callbacks/grafico_temporal.py
+import base64
 import logging
+import os
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from plotly_resampler import FigureResampler
+from dash import Patch, no_update
+from plotly_resampler.aggregation import MinMaxLTTB
 from layouts.visuals.graph_style import get_graph_layout
+from utils.aggregation_pyramid import load_pyramid_meta, select_level, query_level, level_to_xy
+from utils.ram_cache import RamCache, budget_from_env
+from utils.event_store import event_buckets, events_to_xy
+from utils.gap_index import has_gap_index, query_gap_runs, merge_runs, runs_from_frame
+from utils.metrics import register_cache, timed_query
 
-def actualizar_grafico(columnas_seleccionadas, relayout_data, df_plot, x_timer, format_label_with_unit, default_n_shown_samples=600):
-    logging.info(f"Callback ejecutado con columnas: {columnas_seleccionadas}")
+# -------------------------------------------------------------
+# Series del servidor: valores válidos ya ordenados por tiempo, para
+# que cada paso de zoom sea un searchsorted + downsample del tramo visible.
+# Clave: (cache_key, particiones, columna) con cache_key = (dataset, versión).
+# LRU por columna con presupuesto en bytes (SERIES_CACHE_BUDGET_MB).
+# Solo para datasets sin almacén compartido: con él se lee directamente de
+# los .npy mapeados (_serie_almacen), sin copia por worker.
+# -------------------------------------------------------------
+_SERIES_SERVIDOR = RamCache(budget_from_env("SERIES_CACHE_BUDGET_MB", 256))
+register_cache("series", _SERIES_SERVIDOR.stats)
+
+_DOWNSAMPLER = MinMaxLTTB()
+
+# -------------------------------------------------------------
+# Transporte de x/y al navegador (GRAPH_TRANSPORT)
+#   - "binary" (por defecto): typed arrays en base64 ({dtype, bdata}) que
+#     Plotly.js decodifica sin parsear JSON: tiempo en ms epoch como float64
+#     (Plotly.js no admite int64; exacto hasta 2^53 ms) sobre el eje de tipo
+#     fecha, y valores en float32. Sirve igual en figuras y en Patch.
+#   - "json": listas JSON con fechas ISO (formato anterior, para depurar)
+# -------------------------------------------------------------
+TRANSPORTE_BINARIO = os.environ.get("GRAPH_TRANSPORT", "binary").lower() != "json"
+_NAT = np.iinfo("int64").min
+
+
+def _typed_array(valores, dtype: str) -> dict:
+    arr = np.ascontiguousarray(valores, dtype="<" + dtype)
+    return {"dtype": dtype, "bdata": base64.b64encode(arr.tobytes()).decode("ascii")}
+
+
+def _epoch_ms(x) -> np.ndarray:
+    """Fechas -> ms epoch en float64 (NaT -> NaN, que Plotly trata como hueco)."""
+    ns = np.asarray(x, dtype="datetime64[ns]").view("int64")
+    ms = ns / 1e6
+    ms[ns == _NAT] = np.nan
+    return ms
+
+
+def _xy(x, y, y_dtype: str = "f4") -> dict:
+    """{x, y} de una traza en el formato de transporte activo."""
+    if not TRANSPORTE_BINARIO:
+        return {"x": x, "y": y}
+    return {"x": _typed_array(_epoch_ms(x), "f8"), "y": _typed_array(y, y_dtype)}
+
+
+def _columna_real(col):
+    """
+    Las opciones EventEncoded llegan como 'comp_id::mode::columna';
+    en el DF la columna real es la última parte.
+    """
+    if "::" in col:
+        try:
+            _, _, real_col = col.split("::", 2)
+            return real_col
+        except Exception:
+            return col
+    return col
+
+
+def _rango_desde_relayout(relayout_data):
+    """
+    Devuelve (x_min, x_max, cambia_x) a partir de relayoutData.
+    cambia_x=False si el evento no afecta al eje X (p.ej. zoom solo en Y).
+    """
+    if not relayout_data:
+        return None, None, False
+
+    if relayout_data.get("xaxis.autorange"):
+        return None, None, True
+
+    rango = None
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        rango = (relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"])
+    elif isinstance(relayout_data.get("xaxis.range"), (list, tuple)):
+        rango = tuple(relayout_data["xaxis.range"][:2])
+
+    if rango is None:
+        return None, None, False
+
+    try:
+        x_min, x_max = pd.to_datetime(rango[0]), pd.to_datetime(rango[1])
+        logging.info(f"Nuevo rango detectado: {x_min} → {x_max}")
+        return x_min, x_max, True
+    except Exception:
+        return None, None, False
 
-    if not columnas_seleccionadas:
-        return go.Figure().update_layout(title="Por favor, selecciona al menos una serie.")
 
-    x_min, x_max = None, None
-    if relayout_data:
-        if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
-            try:
-                x_min = pd.to_datetime(relayout_data['xaxis.range[0]'])
-                x_max = pd.to_datetime(relayout_data['xaxis.range[1]'])
-                logging.info(f"Nuevo rango detectado: {x_min} → {x_max}")
-            except Exception:
-                x_min, x_max = None, None
+def rango_x(relayout_data):
+    """Rango X visible tras un relayout como [inicio, fin] ISO (None = completo)."""
+    x_min, x_max, _ = _rango_desde_relayout(relayout_data)
+    if x_min is None or x_max is None:
+        return None
+    return [x_min.isoformat(), x_max.isoformat()]
 
-    df_visible = df_plot[(df_plot[x_timer] >= x_min) & (df_plot[x_timer] <= x_max)] if x_min is not None else df_plot
-    fig = FigureResampler(go.Figure(), default_n_shown_samples=default_n_shown_samples)
 
-    y_min_global, y_max_global = None, None
+def _serie_servidor(cargar_df, x_timer, col, clave=None):
+    """
+    (ts_ns, y) de los valores válidos (sin sentinelas) de una columna.
+    cargar_df solo se llama si la serie no está ya en la caché del servidor.
+    """
+    serie = _SERIES_SERVIDOR.get(clave) if clave is not None else None
+    if serie is not None:
+        return serie
+
+    df_plot = cargar_df()
+    valores = df_plot[col].to_numpy(dtype="float64", na_value=np.nan)
+    validos = (valores >= -999998.0) & (valores <= 999998.0)
+    ts_ns = df_plot[x_timer].to_numpy(dtype="datetime64[ns]").view("int64")[validos]
+    y = valores[validos]
+    if len(ts_ns) > 1 and (np.diff(ts_ns) < 0).any():
+        orden = np.argsort(ts_ns, kind="stable")
+        ts_ns, y = ts_ns[orden], y[orden]
+
+    serie = (ts_ns, y)
+    if clave is not None:
+        _SERIES_SERVIDOR[clave] = serie
+    return serie
+
+
+def _serie_almacen(store, col, x_min, x_max):
+    """
+    (ts_ns, y) de los valores válidos de [x_min, x_max] leídos del almacén
+    compartido: searchsorted sobre el Timestamp mapeado (ya ordenado) y vistas
+    del tramo. Solo se copian los valores válidos del tramo visible, y no se
+    guardan en _SERIES_SERVIDOR: las páginas de los .npy las comparten todos
+    los workers.
+    """
+    ts = store.arrays[store.ts_col].view("int64")
+    i0 = np.searchsorted(ts, pd.Timestamp(x_min).value, side="left") if x_min is not None else 0
+    i1 = np.searchsorted(ts, pd.Timestamp(x_max).value, side="right") if x_max is not None else len(ts)
+    valores = np.asarray(store.arrays[col][i0:i1], dtype="float64")
+    validos = (valores >= -999998.0) & (valores <= 999998.0)
+    return np.asarray(ts[i0:i1])[validos], valores[validos]
+
+
+def _serie_rango(df_plot, x_timer, col, x_min, x_max, n_shown_samples, cache_key=None, dataset=None):
+    """
+    Tramo [x_min, x_max] de la serie cruda, submuestreado a n_shown_samples con MinMaxLTTB.
+    Con `dataset` (ServerDataset) se lee del almacén compartido si existe; si
+    no, solo se cargan las particiones que solapan el tramo, y de ellas solo
+    Timestamp y la columna pedida.
+    """
+    store = getattr(dataset, "store", None)
+    if store is not None and col in store.arrays:
+        ts_ns, y = _serie_almacen(store, col, x_min, x_max)
+    else:
+        if dataset is not None:
+            clave = (cache_key, dataset.window_key(x_min, x_max), col)
+            ts_ns, y = _serie_servidor(lambda: dataset.window(x_min, x_max, columns=[col]), x_timer, col, clave)
+        else:
+            clave = (cache_key, None, col) if cache_key is not None else None
+            ts_ns, y = _serie_servidor(lambda: df_plot, x_timer, col, clave)
+
+        i0 = np.searchsorted(ts_ns, pd.Timestamp(x_min).value, side="left") if x_min is not None else 0
+        i1 = np.searchsorted(ts_ns, pd.Timestamp(x_max).value, side="right") if x_max is not None else len(ts_ns)
+        ts_ns, y = ts_ns[i0:i1], y[i0:i1]
+
+    if len(y) > n_shown_samples:
+        idx = _DOWNSAMPLER.arg_downsample(ts_ns, y, n_out=n_shown_samples)
+        ts_ns, y = ts_ns[idx], y[idx]
+    return pd.to_datetime(ts_ns), y
+
+
+# Colores de los tramos sentinela (orden fijo de las trazas de huecos)
+COLORES_TRAMOS = {"anomalia": "orange", "relleno": "red"}
+# Trazas por serie en la figura: la de datos + una por tipo de tramo
+TRAZAS_POR_SERIE = 1 + len(COLORES_TRAMOS)
+# Altura de los tramos en el eje auxiliar y2 (0 = pie del gráfico, 1 = techo)
+BASE_TRAMOS = 0.02
+
+
+def _trazas_huecos(columnas_trazadas, x_min, x_max, x_timer, n_shown_samples, base_y,
+                   df_visible=None, con=None, table=None, dataset=None):
+    """
+    Segmentos de tramos sentinela por columna y tipo, leídos del índice de
+    huecos (<table>__gaps) para el rango visible. Los tramos a menos de ~1
+    píxel se unen, así que el número de segmentos está acotado por el ancho
+    del gráfico y no por el número de muestras perdidas.
+    Devuelve una traza por (columna, tipo), vacía si no hay tramos, para que
+    los índices de traza sean estables entre zooms.
+    """
+    if x_min is not None and x_max is not None:
+        span = pd.Timestamp(x_max) - pd.Timestamp(x_min)
+    elif dataset is not None and dataset.t_min is not None:
+        span = pd.Timestamp(dataset.t_max) - pd.Timestamp(dataset.t_min)
+    elif df_visible is not None and not df_visible.empty:
+        span = df_visible[x_timer].max() - df_visible[x_timer].min()
+    else:
+        span = pd.Timedelta(0)
+    tolerancia = span / max(n_shown_samples, 1)
+
+    usar_indice = con is not None and table and has_gap_index(con, table)
+    trazas = []
+    for col in columnas_trazadas:
+        if usar_indice:
+            runs = timed_query("gap_runs", lambda: query_gap_runs(con, table, col, x_min, x_max), table)
+            tramos = merge_runs(runs, tolerancia)
+        elif df_visible is not None and col in df_visible.columns:
+            tramos = runs_from_frame(df_visible, col, x_timer, tolerancia)
+        else:
+            tramos = pd.DataFrame(columns=["start_ts", "end_ts", "kind"])
+
+        for kind in COLORES_TRAMOS:
+            sel = tramos[tramos["kind"] == kind]
+            inicio, fin = pd.to_datetime(sel["start_ts"]), pd.to_datetime(sel["end_ts"])
+            if TRANSPORTE_BINARIO:
+                # segmentos [inicio, fin] separados por NaN
+                x = np.full(3 * len(sel), np.nan)
+                x[0::3], x[1::3] = _epoch_ms(inicio), _epoch_ms(fin)
+                y = np.full(3 * len(sel), np.nan, dtype="float32")
+                y[0::3] = base_y
+                y[1::3] = base_y
+                trazas.append({"col": col, "kind": kind, "x": _typed_array(x, "f8"), "y": _typed_array(y, "f4")})
+                continue
+            # segmentos [inicio, fin] separados por None
+            x = np.full(3 * len(sel), None, dtype=object)
+            x[0::3] = inicio.dt.strftime("%Y-%m-%d %H:%M:%S.%f").to_numpy()
+            x[1::3] = fin.dt.strftime("%Y-%m-%d %H:%M:%S.%f").to_numpy()
+            y = np.full(3 * len(sel), None, dtype=object)
+            y[0::3] = base_y
+            y[1::3] = base_y
+            trazas.append({"col": col, "kind": kind, "x": x, "y": y})
+    return trazas
+
+
+def _trazas_rango(columnas_seleccionadas, x_min, x_max, df_plot, x_timer, n_shown_samples, con=None, table=None,
+                  cache_key=None, dataset=None):
+    """
+    Calcula los datos (x, y) de cada serie para el rango visible:
+      - si hay pirámide: nivel más grueso que aún da ~n_shown_samples puntos
+      - si no, o a resolución máxima: tramo crudo submuestreado en el servidor
+    Devuelve lista de dicts {col, real, x, y, ymin, ymax} en orden de trazas.
+    """
+    columnas_disponibles = set(dataset.columns if dataset is not None else df_plot.columns)
+    meta = load_pyramid_meta(con, table) if con is not None and table else None
+    nivel = select_level(meta, x_min, x_max, n_shown_samples)
+    df_nivel = None
+    if nivel > 0:
+        cols_nivel = [c for c in dict.fromkeys(_columna_real(c) for c in columnas_seleccionadas) if c in columnas_disponibles]
+        df_nivel = timed_query("pyramid_level", lambda: query_level(con, table, nivel, cols_nivel, x_min, x_max), table)
+        bucket_ms = int(meta.loc[meta["level"] == nivel, "bucket_ms"].iloc[0])
+        logging.info("Usando nivel %s de la pirámide (%s buckets)", nivel, len(df_nivel))
+
+    trazas = []
     for col in columnas_seleccionadas:
-        etiqueta = format_label_with_unit(col)
         # Si el valor es codificado tipo comp::mode::col necesitamos mapear al nombre real en df
         # Para EventEncoded entries, columnas en df normalmente contendrán el nombre real (por ejemplo "Q05")
         # y la opción del checklist guarda "comp::mode::Q05". Por ello, si el col contiene '::' extraemos el subcol.
-        col_to_use = col
-        if "::" in col:
-            # comp_id::mode::column_name
-            try:
-                _, _, real_col = col.split("::", 2)
-                col_to_use = real_col
-            except Exception:
-                col_to_use = col
-
-        if col_to_use not in df_visible.columns:
-            logging.warning("Col '%s' no existe en df_visible", col_to_use)
+        col_to_use = _columna_real(col)
+
+        if col_to_use not in columnas_disponibles:
+            logging.warning("Col '%s' no existe en el dataset", col_to_use)
             continue
 
-        serie = df_visible[[x_timer, col_to_use]].copy()
+        if df_nivel is not None:
+            # Serie pre-agregada: min/max por bucket, coste acotado por píxeles
+            x, y = level_to_xy(df_nivel, col_to_use, bucket_ms)
+        else:
+            x, y = _serie_rango(df_plot, x_timer, col_to_use, x_min, x_max, n_shown_samples, cache_key, dataset)
 
-        # Considerar valores sentinela como no válidos para cálculos mínimos/máximos
-        serie_validos = serie[serie[col_to_use].between(-999998.0, 999998.0)]
-        if not serie_validos.empty:
-            ymin, ymax = serie_validos[col_to_use].min(), serie_validos[col_to_use].max()
-            y_min_global = ymin if y_min_global is None else min(y_min_global, ymin)
-            y_max_global = ymax if y_max_global is None else max(y_max_global, ymax)
+        stats = dataset.stats.get(col_to_use) if dataset is not None else None
+        if stats is not None:
+            # rango válido precalculado al construir (<table>__stats)
+            ymin, ymax = stats["min"], stats["max"]
+        else:
+            finitos = y[np.isfinite(y)]
+            ymin, ymax = (finitos.min(), finitos.max()) if len(finitos) else (None, None)
+        trazas.append({
+            "col": col,
+            "real": col_to_use,
+            "x": x,
+            "y": y,
+            "ymin": ymin,
+            "ymax": ymax,
+        })
+    return trazas
 
-        # Añadir serie con plotly-resampler
-        fig.add_trace(
-            go.Scatter(name=etiqueta, line=dict(width=2)),
-            hf_x=serie_validos[x_timer],
-            hf_y=serie_validos[col_to_use]
-        )
 
-    # Determinar posición vertical para los marcadores de "huecos"
-    marker_base_y = y_min_global if y_min_global is not None else 0
+def rango_y(columnas, dataset, margen=0.05):
+    """
+    Rango del eje Y que abarca todos los valores válidos de `columnas`, leído
+    de las estadísticas del dataset (sin recorrer datos). None si falta alguna.
+    """
+    stats = getattr(dataset, "stats", None) or {}
+    minimos, maximos = [], []
+    for col in columnas:
+        s = stats.get(_columna_real(col))
+        if s is None:
+            return None
+        if s["min"] is not None:
+            minimos.append(s["min"])
+            maximos.append(s["max"])
+    if not minimos:
+        return None
+    lo, hi = min(minimos), max(maximos)
+    pad = (hi - lo) * margen or abs(hi) * margen or 1.0
+    return [lo - pad, hi + pad]
 
-    # Añadir anomalías (-999999.0) colocadas en marker_base_y para que sean visibles
-    for col in columnas_seleccionadas:
-        col_to_use = col
-        if "::" in col:
-            try:
-                _, _, real_col = col.split("::", 2)
-                col_to_use = real_col
-            except Exception:
-                col_to_use = col
-
-        if col_to_use not in df_visible.columns:
-            continue
 
-        serie_anomalos = df_visible[df_visible[col_to_use] == -999999.0]
-        if not serie_anomalos.empty:
-            fig.add_trace(
-                go.Scatter(
-                    x=serie_anomalos[x_timer],
-                    y=[marker_base_y] * len(serie_anomalos),
-                    mode='markers',
-                    marker=dict(color='orange', size=10, symbol='square'),
-                    showlegend=False
-                )
-            )
-
-    # Añadir nulos (999999.0) colocados en marker_base_y para que sean visibles
-    for col in columnas_seleccionadas:
-        col_to_use = col
-        if "::" in col:
-            try:
-                _, _, real_col = col.split("::", 2)
-                col_to_use = real_col
-            except Exception:
-                col_to_use = col
-
-        if col_to_use not in df_visible.columns:
-            continue
+def _trazas_eventos(columnas_seleccionadas, x_min, x_max, n_shown_samples, con, table, dataset):
+    """
+    Trazas de un dataset en modo registro de eventos: un carril por opción
+    seleccionada ('comp::grupo::columna' -> código) con un marcador por
+    intervalo que contiene eventos (n = nº de eventos en el intervalo).
+    """
+    codigos = {c: dataset.event_codes[c] for c in columnas_seleccionadas if c in dataset.event_codes}
+    if x_min is None or x_max is None:
+        x_min, x_max = dataset.t_min, dataset.t_max
+    buckets = timed_query(
+        "event_buckets", lambda: event_buckets(con, table, list(set(codigos.values())), x_min, x_max, n_shown_samples), table
+    )
+
+    trazas = []
+    for lane, (col, code) in enumerate(codigos.items()):
+        x, y, n = events_to_xy(buckets, code, lane)
+        trazas.append({"col": col, "x": x, "y": y, "n": n})
+    return trazas
+
+
+def _grafico_eventos(columnas_seleccionadas, x_min, x_max, format_label_with_unit, n_shown_samples,
+                     con, table, dataset):
+    fig = go.Figure()
+    trazas = _trazas_eventos(columnas_seleccionadas, x_min, x_max, n_shown_samples, con, table, dataset)
+    for traza in trazas:
+        fig.add_trace(go.Scatter(
+            name=format_label_with_unit(traza["col"]),
+            customdata=_typed_array(traza["n"], "i4") if TRANSPORTE_BINARIO else traza["n"],
+            **_xy(traza["x"], traza["y"]),
+            mode="markers", marker=dict(symbol="line-ns-open", size=14),
+            hovertemplate="%{x}<br>eventos: %{customdata}<extra>%{fullData.name}</extra>",
+        ))
+
+    try:
+        fig.update_layout(get_graph_layout(x_min, x_max, dataset.t_min, dataset.t_max))
+    except Exception as e:
+        logging.warning("No se pudo aplicar get_graph_layout: %s", e)
+    fig.update_yaxes(
+        tickmode="array",
+        tickvals=list(range(len(trazas))),
+        ticktext=[t["col"].split("::", 1)[-1].replace("::", " · ") for t in trazas],
+        range=[-0.5, max(len(trazas), 1) - 0.5],
+    )
+    return fig
+
+
+def _scatter_tramo(tramo):
+    """Traza de un tipo de tramo sentinela, sobre el eje auxiliar y2 (abajo del gráfico)."""
+    return go.Scatter(
+        x=tramo["x"],
+        y=tramo["y"],
+        yaxis="y2",
+        mode='lines+markers',
+        line=dict(color=COLORES_TRAMOS[tramo["kind"]], width=8),
+        marker=dict(color=COLORES_TRAMOS[tramo["kind"]], size=8, symbol='square'),
+        connectgaps=False,
+        showlegend=False
+    )
+
+
+def _trazas_figura(trazas, tramos, format_label_with_unit):
+    """
+    Trazas de la figura agrupadas por serie: la de datos y detrás sus tramos
+    (anomalía, relleno). Cada serie ocupa TRAZAS_POR_SERIE posiciones
+    consecutivas, así se puede quitar o añadir sin tocar las demás.
+    """
+    n = len(COLORES_TRAMOS)
+    out = []
+    for k, traza in enumerate(trazas):
+        out.append(go.Scatter(name=format_label_with_unit(traza["col"]), line=dict(width=2),
+                              **_xy(traza["x"], traza["y"])))
+        out += [_scatter_tramo(tramo) for tramo in tramos[k * n:(k + 1) * n]]
+    return out
 
-        serie_nulos = df_visible[df_visible[col_to_use] == 999999.0]
-        if not serie_nulos.empty:
-            fig.add_trace(
-                go.Scatter(
-                    x=serie_nulos[x_timer],
-                    y=[marker_base_y] * len(serie_nulos),
-                    mode='markers',
-                    marker=dict(color='red', size=10, symbol='square'),
-                    showlegend=False
-                )
-            )
 
-    slider_min, slider_max = df_plot[x_timer].min(), df_plot[x_timer].max()
+def series_trazadas(columnas_seleccionadas, df_plot=None, dataset=None):
+    """Columnas de la selección que tienen traza en la figura, en orden de trazas."""
+    if dataset is not None and dataset.is_event_log:
+        return [c for c in columnas_seleccionadas if c in dataset.event_codes]
+    columnas_disponibles = set(dataset.columns if dataset is not None else df_plot.columns)
+    return [c for c in columnas_seleccionadas if _columna_real(c) in columnas_disponibles]
+
+
+def actualizar_grafico(columnas_seleccionadas, relayout_data, df_plot, x_timer, format_label_with_unit,
+                       default_n_shown_samples=600, con=None, table=None, cache_key=None, dataset=None):
+    """
+    Construye la figura completa. Las series se calculan en el servidor para el
+    rango visible (pirámide de agregados si existe, tramo crudo submuestreado si
+    no); los zooms posteriores los atiende actualizar_zoom y los cambios de
+    selección actualizar_series, sin rehacer la figura.
+    Con `dataset` (ServerDataset) df_plot puede ser None: los datos crudos se
+    cargan por particiones solo si el nivel elegido es el 0.
+    """
+    logging.info(f"Callback ejecutado con columnas: {columnas_seleccionadas}")
+
+    if not columnas_seleccionadas:
+        return go.Figure().update_layout(title="Por favor, selecciona al menos una serie.")
+
+    x_min, x_max, _ = _rango_desde_relayout(relayout_data)
+
+    if dataset is not None and dataset.is_event_log:
+        return _grafico_eventos(columnas_seleccionadas, x_min, x_max, format_label_with_unit,
+                                default_n_shown_samples, con, table, dataset)
+
+    df_visible = None
+    if df_plot is not None:
+        df_visible = df_plot[(df_plot[x_timer] >= x_min) & (df_plot[x_timer] <= x_max)] if x_min is not None else df_plot
+
+    trazas = _trazas_rango(columnas_seleccionadas, x_min, x_max, df_plot, x_timer, default_n_shown_samples,
+                           con=con, table=table, cache_key=cache_key, dataset=dataset)
+
+    # Tramos de anomalías (-999999.0, naranja) y rellenos (999999.0, rojo) al pie del gráfico
+    tramos = _trazas_huecos([t["real"] for t in trazas], x_min, x_max, x_timer, default_n_shown_samples,
+                            BASE_TRAMOS, df_visible, con, table, dataset)
+    fig = go.Figure(data=_trazas_figura(trazas, tramos, format_label_with_unit))
+
+    if dataset is not None:
+        slider_min, slider_max = dataset.t_min, dataset.t_max
+    else:
+        slider_min, slider_max = df_plot[x_timer].min(), df_plot[x_timer].max()
 
     # Aplicar layout modular (usa tu función get_graph_layout)
     try:
         fig.update_layout(get_graph_layout(x_min, x_max, slider_min, slider_max))
     except Exception as e:
         logging.warning("No se pudo aplicar get_graph_layout: %s", e)
-        fig.update_layout(title="Gráfico temporal", xaxis=dict(title=x_timer))
+        fig.update_layout(title="Gráfico temporal", xaxis=dict(title=x_timer, type="date"))
+    # Eje auxiliar de los tramos: fijo en [0, 1] y oculto, así su posición no
+    # depende del rango de las series y no hay que moverlos al cambiar la selección
+    fig.update_layout(yaxis2=dict(overlaying="y", range=[0, 1], visible=False, fixedrange=True))
+    # Eje Y fijo al rango válido de las series (estadísticas precalculadas):
+    # no salta al hacer pan/zoom en X. Solo el eje principal: yaxis2 sigue en [0, 1]
+    rango = rango_y([t["col"] for t in trazas], dataset)
+    if rango is not None:
+        fig.update_layout(yaxis=dict(range=rango, autorange=False))
 
     return fig
+
+
+def actualizar_series(columnas_seleccionadas, series_actuales, x_range, df_plot, x_timer, format_label_with_unit,
+                      default_n_shown_samples=600, con=None, table=None, cache_key=None, dataset=None):
+    """
+    Cambio de selección sobre una figura ya dibujada: devuelve (Patch, series)
+    que borra los grupos de trazas de las columnas quitadas y añade al final
+    los de las nuevas, calculados solo para ellas en el rango X visible
+    (`x_range`, None = completo). Las demás trazas no se tocan, así que el
+    coste no depende de cuántas series haya ya en pantalla.
+    """
+    seleccion = set(columnas_seleccionadas)
+    quitar = [k for k, col in enumerate(series_actuales) if col not in seleccion]
+    nuevas = [c for c in series_trazadas(columnas_seleccionadas, df_plot, dataset) if c not in set(series_actuales)]
+
+    patch = Patch()
+    # de atrás hacia delante: cada borrado desplaza las trazas posteriores
+    for k in reversed(quitar):
+        for i in reversed(range(k * TRAZAS_POR_SERIE, (k + 1) * TRAZAS_POR_SERIE)):
+            del patch["data"][i]
+    series = [c for c in series_actuales if c in seleccion]
+
+    if nuevas:
+        x_min, x_max = (pd.Timestamp(x_range[0]), pd.Timestamp(x_range[1])) if x_range else (None, None)
+        df_visible = None
+        if df_plot is not None:
+            df_visible = df_plot[(df_plot[x_timer] >= x_min) & (df_plot[x_timer] <= x_max)] if x_min is not None else df_plot
+        trazas = _trazas_rango(nuevas, x_min, x_max, df_plot, x_timer, default_n_shown_samples,
+                               con=con, table=table, cache_key=cache_key, dataset=dataset)
+        tramos = _trazas_huecos([t["real"] for t in trazas], x_min, x_max, x_timer, default_n_shown_samples,
+                                BASE_TRAMOS, df_visible, con, table, dataset)
+        for traza in _trazas_figura(trazas, tramos, format_label_with_unit):
+            patch["data"].append(traza)
+        series += [t["col"] for t in trazas]
+
+    if quitar or nuevas:
+        rango = rango_y(series, dataset)
+        if rango is not None:
+            patch["layout"]["yaxis"]["range"] = rango
+            patch["layout"]["yaxis"]["autorange"] = False
+        elif series:
+            patch["layout"]["yaxis"]["autorange"] = True
+
+    logging.info("Selección actualizada: -%s +%s series (%s en pantalla)", len(quitar), len(nuevas), len(series))
+    return patch, series
+
+
+def actualizar_zoom(columnas_seleccionadas, relayout_data, df_plot, x_timer, default_n_shown_samples=600,
+                    con=None, table=None, cache_key=None, dataset=None):
+    """
+    Camino de pan/zoom: re-agrega solo las series para el nuevo rango X y
+    devuelve un Patch con x/y de cada traza (layout intacto). Las trazas van
+    agrupadas por serie (datos, anomalía, relleno) en el orden de
+    `columnas_seleccionadas`, que debe ser el de las series ya trazadas.
+    """
+    x_min, x_max, cambia_x = _rango_desde_relayout(relayout_data)
+    if not cambia_x or not columnas_seleccionadas:
+        return no_update
+
+    if dataset is not None and dataset.is_event_log:
+        patch = Patch()
+        for i, traza in enumerate(_trazas_eventos(columnas_seleccionadas, x_min, x_max, default_n_shown_samples,
+                                                  con, table, dataset)):
+            xy = _xy(traza["x"], traza["y"])
+            patch["data"][i]["x"] = xy["x"]
+            patch["data"][i]["y"] = xy["y"]
+            patch["data"][i]["customdata"] = _typed_array(traza["n"], "i4") if TRANSPORTE_BINARIO else traza["n"]
+        return patch
+
+    trazas = _trazas_rango(columnas_seleccionadas, x_min, x_max, df_plot, x_timer, default_n_shown_samples,
+                           con=con, table=table, cache_key=cache_key, dataset=dataset)
+
+    df_visible = None
+    if df_plot is not None:
+        df_visible = df_plot[(df_plot[x_timer] >= x_min) & (df_plot[x_timer] <= x_max)] if x_min is not None else df_plot
+    tramos = _trazas_huecos([t["real"] for t in trazas], x_min, x_max, x_timer, default_n_shown_samples,
+                            BASE_TRAMOS, df_visible, con, table, dataset)
+
+    patch = Patch()
+    n = len(COLORES_TRAMOS)
+    for k, traza in enumerate(trazas):
+        base = k * TRAZAS_POR_SERIE
+        xy = _xy(traza["x"], traza["y"])
+        patch["data"][base]["x"] = xy["x"]
+        patch["data"][base]["y"] = xy["y"]
+        # las trazas de tramos ya vienen en el formato de transporte
+        for i, tramo in enumerate(tramos[k * n:(k + 1) * n], start=base + 1):
+            patch["data"][i]["x"] = tramo["x"]
+            patch["data"][i]["y"] = tramo["y"]
+    return patch
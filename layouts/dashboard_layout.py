@@ -26,6 +26,12 @@ def serve_layout(config, datasets, opciones_checklist, columnas, x_timer="Timest
                 datasets_disponibles=datasets
             ),
 
+            # Progreso de la construcción en segundo plano del dataset
+            html.Div(id='build-status', style={'margin': '8px 0', 'color': '#555'}),
+            # Solo visible si la última construcción falló: las fallidas no se
+            # reintentan solas mientras no cambien raw/ ni la configuración
+            html.Button('Reintentar construcción', id='build-retry', n_clicks=0, style={'display': 'none'}),
+
             # Zona de gráfico temporal
             html.Div(
                 id='zona-grafico',
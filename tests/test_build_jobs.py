@@ -0,0 +1,100 @@
+# tests/test_build_jobs.py
+from concurrent.futures import Future
+
+import duckdb
+import pytest
+
+from utils import build_jobs
+
+
+class _ExecutorFalso:
+    """Registra los trabajos enviados sin lanzar ningún proceso."""
+
+    def __init__(self):
+        self.enviados = []
+
+    def submit(self, fn, *args):
+        self.enviados.append(args)
+        fut = Future()
+        fut.set_result(None)
+        return fut
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    base = tmp_path / "Demo-Dataset"
+    (base / "raw").mkdir(parents=True)
+    (base / "processed").mkdir()
+    (base / "raw" / "day_000.csv").write_text("Timestamp,a\n2022-05-01 00:00:00,1\n", encoding="utf-8")
+    config = base / "control_dataset.yml"
+    config.write_text("metadata:\n  type: TabularDataSet\n", encoding="utf-8")
+    return {
+        "path": base,
+        "config": config,
+        "components": {},
+        "duckdb": base / "processed" / "Demo-Dataset.duckdb",
+        "type": "TabularDataSet",
+        "storage": "table",
+        "dictionary": None,
+        "table_name": "demo_dataset",
+        "pipelineCleanData": {},
+    }
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    falso = _ExecutorFalso()
+    monkeypatch.setattr(build_jobs, "_executor", lambda: falso)
+    monkeypatch.setattr(build_jobs, "_JOBS", {})
+    return falso
+
+
+@pytest.fixture
+def construccion_fallida(dataset, monkeypatch):
+    def falla(*args, **kwargs):
+        raise ValueError("columna desconocida")
+
+    monkeypatch.setattr(build_jobs, "load_processed_or_build", falla)
+    build_jobs.run_build("Demo-Dataset", dataset)
+    status = build_jobs.read_build_status(dataset)
+    assert status["state"] == "error"
+    return status
+
+
+def test_fallida_no_se_reencola_sin_cambios(dataset, executor, construccion_fallida):
+    for _ in range(2):
+        status = build_jobs.ensure_dataset_built("Demo-Dataset", dataset)
+        assert status["state"] == "error"
+        assert not build_jobs.build_in_progress(status)
+    assert executor.enviados == []
+
+    estado = build_jobs.readiness({"Demo-Dataset": dataset})
+    assert estado["pending"] == {}
+    assert estado["errors"] == {"Demo-Dataset": "columna desconocida"}
+    # sin versión publicada no hay nada que servir: no está listo
+    assert estado["unbuilt"] == ["Demo-Dataset"]
+    assert not build_jobs.is_ready(estado)
+
+
+def test_fallida_con_version_publicada_no_bloquea(dataset, executor, construccion_fallida):
+    duckdb.connect(str(dataset["duckdb"])).close()  # versión anterior (desfasada)
+
+    estado = build_jobs.readiness({"Demo-Dataset": dataset})
+    assert estado["errors"] == {"Demo-Dataset": "columna desconocida"}
+    assert estado["unbuilt"] == []
+    assert build_jobs.is_ready(estado)
+
+
+def test_fallida_se_reencola_si_cambia_raw(dataset, executor, construccion_fallida):
+    (dataset["path"] / "raw" / "day_001.csv").write_text("Timestamp,a\n2022-05-02 00:00:00,2\n", encoding="utf-8")
+
+    assert build_jobs.readiness({"Demo-Dataset": dataset})["pending"] == {"Demo-Dataset": "pending"}
+    status = build_jobs.ensure_dataset_built("Demo-Dataset", dataset)
+    assert status["state"] == "queued"
+    assert len(executor.enviados) == 1
+
+
+def test_fallida_se_reencola_si_se_fuerza(dataset, executor, construccion_fallida):
+    status = build_jobs.ensure_dataset_built("Demo-Dataset", dataset, force=True)
+    assert status["state"] == "queued"
+    assert len(executor.enviados) == 1
@@ -0,0 +1,58 @@
+# tests/test_grafico_temporal.py
+from types import SimpleNamespace
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from callbacks import grafico_temporal
+from utils.shared_store import SharedStore, write_shared_store
+
+
+def _dataset(df, stats):
+    """ServerDataset mínimo: ventana en RAM, sin almacén compartido."""
+    return SimpleNamespace(
+        name="demo", columns=list(df.columns), stats=stats, is_event_log=False, store=None,
+        t_min=df["Timestamp"].min(), t_max=df["Timestamp"].max(),
+        window_key=lambda x_min=None, x_max=None: None,
+        window=lambda x_min=None, x_max=None, columns=None: df[["Timestamp", *(columns or df.columns[1:])]],
+    )
+
+
+def test_rango_y_no_mueve_el_eje_de_tramos():
+    ts = pd.date_range("2022-05-01", periods=100, freq="s")
+    valores = np.linspace(41.3, 155.2, 100)
+    valores[10:15] = 999999.0
+    df = pd.DataFrame({"Timestamp": ts, "a": valores})
+    dataset = _dataset(df, {"a": {"min": 41.3, "max": 155.2}})
+
+    fig = grafico_temporal.actualizar_grafico(["a"], None, None, "Timestamp", str, cache_key=("demo", 1),
+                                              dataset=dataset)
+
+    assert fig.layout.yaxis2.range == (0, 1)
+    assert fig.layout.yaxis.autorange is False
+    lo, hi = fig.layout.yaxis.range
+    assert lo < 41.3 and hi > 155.2
+
+
+def test_serie_del_almacen_compartido_sin_copia_en_cache(tmp_path):
+    ts = pd.date_range("2022-05-01", periods=5000, freq="s")
+    valores = np.sin(np.arange(5000) / 50.0)
+    valores[100:200] = 999999.0
+    valores[300:310] = -999999.0
+    df = pd.DataFrame({"Timestamp": ts, "a": valores})
+    info = {"duckdb": tmp_path / "demo.duckdb"}
+    with duckdb.connect(str(info["duckdb"])) as con:
+        con.execute("CREATE TABLE demo AS SELECT * FROM df")
+        write_shared_store(con, "demo", info)
+    dataset = _dataset(df, {})
+    dataset.store = SharedStore(info)
+    grafico_temporal._SERIES_SERVIDOR.clear()
+
+    x_min, x_max = ts[50], ts[1500]
+    x, y = grafico_temporal._serie_rango(None, "Timestamp", "a", x_min, x_max, 400, ("demo", 1), dataset)
+    x_ram, y_ram = grafico_temporal._serie_rango(df, "Timestamp", "a", x_min, x_max, 400)
+
+    assert len(grafico_temporal._SERIES_SERVIDOR) == 0
+    assert (x == x_ram).all() and np.array_equal(y, y_ram)
+    assert len(y) <= 400 and np.abs(y).max() <= 1.0
@@ -0,0 +1,78 @@
+# tests/test_ingesta_incremental.py
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from utils.dataset_manager import get_duckdb_con, load_processed_or_build
+
+PIPELINE = {
+    "run_enabled": True,
+    "checkpoint": False,
+    "available_functions": [
+        {"merge_all_datasets": {"enabled": True, "module": "utils.clean_functions._0_merge_datasets",
+                                "func": "merge_all_datasets", "params": {"n_workers": 1}}},
+        {"clean_and_unify_duplicates": {"enabled": True, "module": "utils.clean_functions._2_clean_and_unify_duplicatses",
+                                        "func": "clean_and_unify_duplicates"}},
+        {"rellenar_timestamps": {"enabled": True, "module": "utils.clean_functions._4_missing_data",
+                                 "func": "rellenar_timestamps"}},
+        {"normalize_timestamp_column": {"enabled": True, "module": "utils.clean_functions._5_nomalizar_timestamps",
+                                        "func": "normalize_timestamp_column"}},
+    ],
+}
+
+
+def _csv(path, inicio, n):
+    ts = pd.date_range(inicio, periods=n, freq="s")
+    rng = np.random.default_rng(int(path.stem[-3:]))
+    pd.DataFrame({"Timestamp": ts, "a": rng.normal(50, 5, n).round(3), "b": rng.normal(0, 1, n).round(3)}).to_csv(
+        path, index=False
+    )
+
+
+def _dataset_info(base, nombre):
+    processed = base / nombre
+    processed.mkdir()
+    return {
+        "path": base,
+        "config": base / "control_dataset.yml",
+        "components": {},
+        "duckdb": processed / "demo.duckdb",
+        "type": "TabularDataSet",
+        "storage": "table",
+        "dictionary": None,
+        "table_name": "demo",
+        "pipelineCleanData": PIPELINE,
+    }
+
+
+def _construir(info):
+    with get_duckdb_con(info["duckdb"]) as con:
+        load_processed_or_build(con, info, {"pipelineCleanData": PIPELINE})
+        return con.execute("SELECT * FROM demo ORDER BY Timestamp").df()
+
+
+@pytest.fixture
+def raw(tmp_path):
+    (tmp_path / "raw").mkdir()
+    _csv(tmp_path / "raw" / "day_000.csv", "2022-05-01 00:00:00", 600)
+    _csv(tmp_path / "raw" / "day_001.csv", "2022-05-01 00:10:00", 600)
+    _csv(tmp_path / "raw" / "day_002.csv", "2022-05-01 00:30:00", 600)
+    return tmp_path
+
+
+def test_fichero_recortado_igual_que_construccion_completa(raw):
+    incremental = _dataset_info(raw, "incremental")
+    _construir(incremental)
+
+    # el segundo fichero pasa a cubrir solo sus 5 primeros minutos
+    _csv(raw / "raw" / "day_001.csv", "2022-05-01 00:10:00", 300)
+    df_incremental = _construir(incremental)
+    df_completo = _construir(_dataset_info(raw, "completo"))
+
+    pdt.assert_frame_equal(df_incremental.astype("float64", errors="ignore"),
+                           df_completo.astype("float64", errors="ignore"), check_dtype=False)
+    # las filas viejas del tramo recortado quedan como relleno, no como datos
+    recortado = df_incremental[(df_incremental["Timestamp"] >= "2022-05-01 00:15:00")
+                               & (df_incremental["Timestamp"] < "2022-05-01 00:30:00")]
+    assert (recortado["a"] == 999999.0).all()
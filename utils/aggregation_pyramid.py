@@ -0,0 +1,269 @@
+# utils/aggregation_pyramid.py
+import logging
+import numpy as np
+import pandas as pd
+
+# Valores fuera de este rango son sentinelas (999999.0 relleno / -999999.0 anomalía)
+VALID_LIMIT = 999998.0
+
+# Se deja de crear niveles cuando el nivel tiene menos buckets que esto
+MIN_BUCKETS = 256
+MAX_LEVELS = 40
+
+
+def _q(name: str) -> str:
+    """Cita un identificador para SQL de DuckDB."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def pyramid_meta_table(table: str) -> str:
+    return f"{table}__pyramid"
+
+
+def pyramid_level_table(table: str, level: int) -> str:
+    return f"{table}__lvl{level}"
+
+
+def _aggs_from_base(columns, ts_col):
+    aggs = []
+    for c in columns:
+        valid = f"{_q(c)} BETWEEN {-VALID_LIMIT} AND {VALID_LIMIT}"
+        aggs += [
+            f"min({_q(c)}) FILTER (WHERE {valid}) AS {_q(c + '__min')}",
+            f"max({_q(c)}) FILTER (WHERE {valid}) AS {_q(c + '__max')}",
+            f"arg_min({_q(c)}, {_q(ts_col)}) FILTER (WHERE {valid}) AS {_q(c + '__first')}",
+            f"arg_max({_q(c)}, {_q(ts_col)}) FILTER (WHERE {valid}) AS {_q(c + '__last')}",
+            f"count({_q(c)}) FILTER (WHERE {valid}) AS {_q(c + '__count')}",
+        ]
+    return aggs
+
+
+def _aggs_from_level(columns):
+    aggs = []
+    for c in columns:
+        first, last = _q(c + "__first"), _q(c + "__last")
+        aggs += [
+            f"min({_q(c + '__min')}) AS {_q(c + '__min')}",
+            f"max({_q(c + '__max')}) AS {_q(c + '__max')}",
+            f"arg_min({first}, bucket_ms) FILTER (WHERE {first} IS NOT NULL) AS {first}",
+            f"arg_max({last}, bucket_ms) FILTER (WHERE {last} IS NOT NULL) AS {last}",
+            f"sum({_q(c + '__count')})::BIGINT AS {_q(c + '__count')}",
+        ]
+    return aggs
+
+
+def build_pyramid(con, table: str, columns=None, ts_col: str = "Timestamp", min_buckets: int = MIN_BUCKETS):
+    """
+    Construye la pirámide de agregados min/max/first/last/count por bucket
+    temporal junto a la tabla base:
+      - nivel 0 = tabla base (resolución de muestreo)
+      - nivel k = buckets de resolución * 2^k, alineados a epoch (cada bucket
+        del nivel k+1 es la unión exacta de dos buckets del nivel k)
+    Cada nivel se calcula a partir del anterior, así que el coste total es
+    aproximadamente el de un único GROUP BY sobre la tabla base.
+    Los metadatos de los niveles se guardan en <table>__pyramid.
+    """
+    if columns is None:
+        desc = con.execute(f"DESCRIBE {table}").fetchall()
+        numeric = ("DOUBLE", "FLOAT", "REAL", "DECIMAL", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "HUGEINT", "BOOLEAN")
+        columns = [r[0] for r in desc if r[0] != ts_col and str(r[1]).upper().startswith(numeric)]
+
+    drop_pyramid(con, table)
+    if not columns:
+        logging.info("Pirámide de %s: sin columnas numéricas, se omite", table)
+        return []
+
+    base_ms, t_min_ms, t_max_ms, n_rows = con.execute(f"""
+        SELECT
+            (SELECT mode(d) FROM (
+                SELECT epoch_ms({_q(ts_col)}) - lag(epoch_ms({_q(ts_col)})) OVER (ORDER BY {_q(ts_col)}) AS d
+                FROM {table}
+            ) WHERE d > 0),
+            epoch_ms(min({_q(ts_col)})),
+            epoch_ms(max({_q(ts_col)})),
+            count(*)
+        FROM {table}
+    """).fetchone()
+
+    if not n_rows or base_ms is None:
+        logging.info("Pirámide de %s: tabla vacía o sin resolución, se omite", table)
+        return []
+
+    base_ms = max(int(base_ms), 1)
+    levels = [(0, base_ms, int(n_rows))]
+
+    level, width, n_buckets = 0, base_ms, int(n_rows)
+    while n_buckets > min_buckets and level < MAX_LEVELS:
+        level += 1
+        width *= 2
+        dst = pyramid_level_table(table, level)
+        con.execute(f"CREATE TABLE {dst} AS {_level_select_sql(table, columns, ts_col, level, width)}")
+        n_buckets = con.execute(f"SELECT count(*) FROM {dst}").fetchone()[0]
+        levels.append((level, width, int(n_buckets)))
+
+    _write_meta(con, table, levels, t_min_ms, t_max_ms)
+    logging.info("🔺 Pirámide de %s: %s niveles (resolución base %s ms)", table, len(levels) - 1, base_ms)
+    return levels
+
+
+def _level_select_sql(table, columns, ts_col, level, width, lo_ms=None, hi_ms=None):
+    """SELECT que agrega el nivel `level` (desde la base o desde el nivel anterior), opcionalmente acotado en ms."""
+    if level == 1:
+        select = ",\n".join([f"({_q('__ts_ms')} // {width}) * {width} AS bucket_ms"] + _aggs_from_base(columns, ts_col))
+        where = ""
+        if lo_ms is not None:
+            where = f"WHERE {_q(ts_col)} >= epoch_ms({int(lo_ms)}) AND {_q(ts_col)} < epoch_ms({int(hi_ms)})"
+        source = f"(SELECT *, epoch_ms({_q(ts_col)}) AS {_q('__ts_ms')} FROM {table} {where})"
+    else:
+        select = ",\n".join([f"(bucket_ms // {width}) * {width} AS bucket_ms"] + _aggs_from_level(columns))
+        source = pyramid_level_table(table, level - 1)
+        if lo_ms is not None:
+            source = f"(SELECT * FROM {source} WHERE bucket_ms >= {int(lo_ms)} AND bucket_ms < {int(hi_ms)})"
+    return f"SELECT {select} FROM {source} GROUP BY 1 ORDER BY 1"
+
+
+def _write_meta(con, table, levels, t_min_ms, t_max_ms):
+    meta = pd.DataFrame(levels, columns=["level", "bucket_ms", "n_buckets"])
+    meta["t_min_ms"] = int(t_min_ms)
+    meta["t_max_ms"] = int(t_max_ms)
+    con.execute(f"DROP TABLE IF EXISTS {pyramid_meta_table(table)}")
+    con.register("tmp_pyramid_meta", meta)
+    con.execute(f"CREATE TABLE {pyramid_meta_table(table)} AS SELECT * FROM tmp_pyramid_meta")
+    con.unregister("tmp_pyramid_meta")
+
+
+def _pyramid_columns(con, table):
+    desc = con.execute(f"DESCRIBE {pyramid_level_table(table, 1)}").fetchall()
+    return [r[0][:-len("__min")] for r in desc if r[0].endswith("__min")]
+
+
+def refresh_pyramid(con, table: str, ts_min, ts_max, ts_col: str = "Timestamp", min_buckets: int = MIN_BUCKETS):
+    """
+    Actualiza la pirámide tras reescribir el tramo [ts_min, ts_max] de la tabla
+    base: en cada nivel se recalculan solo los buckets que tocan ese tramo.
+    Si la pirámide no existe, cambian las columnas o hace falta un nivel más,
+    se reconstruye completa.
+    """
+    meta = load_pyramid_meta(con, table)
+    if meta is None or len(meta) < 2:
+        return build_pyramid(con, table, ts_col=ts_col, min_buckets=min_buckets)
+
+    base_cols = {r[0] for r in con.execute(f"DESCRIBE {table}").fetchall()} - {ts_col}
+    columns = _pyramid_columns(con, table)
+    if set(columns) != base_cols:
+        return build_pyramid(con, table, ts_col=ts_col, min_buckets=min_buckets)
+
+    lo_ms, hi_ms = _to_ms(ts_min), _to_ms(ts_max)
+    t_min_ms, t_max_ms, n_rows = con.execute(
+        f"SELECT epoch_ms(min({_q(ts_col)})), epoch_ms(max({_q(ts_col)})), count(*) FROM {table}"
+    ).fetchone()
+
+    levels = [(0, int(meta["bucket_ms"].iloc[0]), int(n_rows))]
+    for level, width in zip(meta["level"][1:], meta["bucket_ms"][1:]):
+        level, width = int(level), int(width)
+        b_lo, b_hi = (lo_ms // width) * width, (hi_ms // width) * width + width
+        dst = pyramid_level_table(table, level)
+        con.execute(f"DELETE FROM {dst} WHERE bucket_ms >= ? AND bucket_ms < ?", [b_lo, b_hi])
+        con.execute(f"INSERT INTO {dst} {_level_select_sql(table, columns, ts_col, level, width, b_lo, b_hi)}")
+        n_buckets = con.execute(f"SELECT count(*) FROM {dst}").fetchone()[0]
+        levels.append((level, width, int(n_buckets)))
+
+    if levels[-1][2] > min_buckets and levels[-1][0] < MAX_LEVELS:
+        return build_pyramid(con, table, ts_col=ts_col, min_buckets=min_buckets)
+
+    _write_meta(con, table, levels, t_min_ms, t_max_ms)
+    logging.info("🔺 Pirámide de %s actualizada en [%s, %s]", table, ts_min, ts_max)
+    return levels
+
+
+def drop_pyramid(con, table: str):
+    """Elimina todos los niveles y metadatos de la pirámide de una tabla."""
+    existing = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+    prefix = f"{table}__lvl"
+    for t in existing:
+        if t.startswith(prefix) and t[len(prefix):].isdigit():
+            con.execute(f"DROP TABLE {t}")
+    con.execute(f"DROP TABLE IF EXISTS {pyramid_meta_table(table)}")
+
+
+def has_pyramid(con, table: str) -> bool:
+    existing = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+    return pyramid_meta_table(table) in existing
+
+
+def load_pyramid_meta(con, table: str):
+    """Devuelve los metadatos de la pirámide (DataFrame) o None si no existe."""
+    if not has_pyramid(con, table):
+        return None
+    return con.execute(f"SELECT * FROM {pyramid_meta_table(table)} ORDER BY level").df()
+
+
+def _to_ms(ts):
+    return int(pd.Timestamp(ts).value // 1_000_000)
+
+
+def select_level(meta, x_min=None, x_max=None, n_shown_samples: int = 600) -> int:
+    """
+    Elige el nivel más grueso que todavía da ~n_shown_samples puntos en el
+    rango pedido (cada bucket aporta 2 puntos: min y max). 0 = datos crudos.
+    """
+    if meta is None or meta.empty:
+        return 0
+
+    t_min_ms = _to_ms(x_min) if x_min is not None else int(meta["t_min_ms"].iloc[0])
+    t_max_ms = _to_ms(x_max) if x_max is not None else int(meta["t_max_ms"].iloc[0])
+    span_ms = max(t_max_ms - t_min_ms, 0)
+
+    best = 0
+    for level, width in zip(meta["level"], meta["bucket_ms"]):
+        if level == 0:
+            continue
+        if 2 * span_ms / int(width) >= n_shown_samples:
+            best = int(level)
+    return best
+
+
+def query_level(con, table: str, level: int, columns, x_min=None, x_max=None) -> pd.DataFrame:
+    """Lee los buckets de un nivel (>0) para las columnas y rango pedidos."""
+    src = pyramid_level_table(table, level)
+    cols_sql = []
+    for c in columns:
+        cols_sql += [_q(c + s) for s in ("__min", "__max", "__first", "__last")]
+
+    where, params = [], []
+    if x_min is not None:
+        where.append("bucket_ms >= ?")
+        params.append(_to_ms(x_min))
+    if x_max is not None:
+        where.append("bucket_ms <= ?")
+        params.append(_to_ms(x_max))
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+    return con.execute(
+        f"SELECT bucket_ms, {', '.join(cols_sql)} FROM {src} {where_sql} ORDER BY bucket_ms",
+        params,
+    ).df()
+
+
+def level_to_xy(df_level: pd.DataFrame, column: str, bucket_ms: int):
+    """
+    Convierte los buckets de una columna en puntos (x, y) para la traza:
+    dos puntos por bucket (min y max), ordenados según la tendencia
+    first→last del bucket para no invertir la forma de la señal.
+    """
+    t0 = df_level["bucket_ms"].to_numpy(dtype="int64")
+    vmin = df_level[column + "__min"].to_numpy(dtype="float64")
+    vmax = df_level[column + "__max"].to_numpy(dtype="float64")
+    first = df_level[column + "__first"].to_numpy(dtype="float64")
+    last = df_level[column + "__last"].to_numpy(dtype="float64")
+
+    ascending = ~(first > last)
+    y = np.empty(2 * len(t0), dtype="float64")
+    y[0::2] = np.where(ascending, vmin, vmax)
+    y[1::2] = np.where(ascending, vmax, vmin)
+
+    x_ms = np.empty(2 * len(t0), dtype="int64")
+    x_ms[0::2] = t0
+    x_ms[1::2] = t0 + bucket_ms // 2
+    x = pd.to_datetime(x_ms, unit="ms")
+    return x, y
@@ -0,0 +1,139 @@
+# utils/benchmark/check_incremental.py
+"""
+Comprobación de la ingesta incremental contra una construcción completa.
+
+Genera un dataset tabular sintético cuyo último CSV empieza `--seam-hours`
+después del final del anterior (un corte en la costura entre datos viejos y
+nuevos) y lo construye de dos formas en carpetas separadas:
+  - incremental: todos los CSV menos el último y después el último
+  - completa: todos los CSV de una vez
+La tabla base, el índice de huecos (__gaps), la pirámide (__pyramid y cada
+__lvlN), las estadísticas (__stats) y las particiones tienen que coincidir.
+
+Uso:
+    python -m utils.benchmark.check_incremental
+    python -m utils.benchmark.check_incremental --rows 400000 --files 4 --seam-hours 3
+"""
+import argparse
+import logging
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from utils.aggregation_pyramid import pyramid_meta_table
+from utils.benchmark.generate_data import generate_tabular
+from utils.column_stats import column_stats_table
+from utils.dataset_manager import get_duckdb_con, load_processed_or_build, scan_datasets
+from utils.gap_index import gap_index_table
+from utils.helpers import load_config
+from utils.partitions import list_partitions, partitions_dir, read_partition
+
+
+def _abrir_costura(csv: Path, horas: float):
+    """Quita las primeras `horas` del CSV: el fichero empieza tras un corte."""
+    df = pd.read_csv(csv)
+    ts = pd.to_datetime(df["Timestamp"])
+    df[ts >= ts.min() + pd.Timedelta(hours=horas)].to_csv(csv, index=False)
+
+
+def _construir(info: dict, cfg: dict, work_dir: Path, csv_files) -> dict:
+    """Construye el dataset en `work_dir` ingiriendo `csv_files` por tandas (una por elemento)."""
+    info = dict(info, duckdb=work_dir / "processed" / f"{info['path'].name}.duckdb")
+    raw_dir = info["path"] / "raw"
+    aparte = work_dir / "aparte"
+    aparte.mkdir(parents=True, exist_ok=True)
+    todos = [f for tanda in csv_files for f in tanda]
+    for f in todos:
+        shutil.move(str(raw_dir / f.name), aparte / f.name)
+    try:
+        for tanda in csv_files:
+            for f in tanda:
+                shutil.move(str(aparte / f.name), raw_dir / f.name)
+            with get_duckdb_con(info["duckdb"]) as con:
+                load_processed_or_build(con, info, cfg)
+    finally:
+        for f in aparte.glob("*.csv"):
+            shutil.move(str(f), raw_dir / f.name)
+    return info
+
+
+def _tablas(con, table: str) -> dict:
+    """Tablas a comparar, cada una con un orden determinista."""
+    existentes = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+    consultas = {
+        table: f"SELECT * FROM {table} ORDER BY Timestamp",
+        gap_index_table(table): f'SELECT * FROM {gap_index_table(table)} ORDER BY "column", start_ts, kind',
+        pyramid_meta_table(table): f"SELECT * FROM {pyramid_meta_table(table)} ORDER BY level",
+        column_stats_table(table): f'SELECT * FROM {column_stats_table(table)} ORDER BY "column"',
+    }
+    for t in sorted(existentes):
+        if t.startswith(f"{table}__lvl"):
+            consultas[t] = f"SELECT * FROM {t} ORDER BY bucket_ms"
+    return {t: con.execute(sql).df() for t, sql in consultas.items()}
+
+
+def _comparar(nombre: str, a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    try:
+        pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True), check_dtype=False)
+    except AssertionError as e:
+        logging.error("❌ %s difiere entre incremental y completa:\n%s", nombre, e)
+        return False
+    logging.info("✅ %s: %s filas iguales", nombre, len(a))
+    return True
+
+
+def check(base_dir: Path, rows: int, files: int, seam_hours: float, seed: int) -> bool:
+    generate_tabular(base_dir / "datasets", "Check-Incremental", rows=rows, cols=4, files=files, seed=seed)
+    info = scan_datasets(base_dir / "datasets")["Check-Incremental"]
+    cfg = load_config(info["config"])
+    csv_files = sorted((info["path"] / "raw").glob("*.csv"))
+    _abrir_costura(csv_files[-1], seam_hours)
+
+    inc = _construir(info, cfg, base_dir / "incremental", [csv_files[:-1], csv_files[-1:]])
+    full = _construir(info, cfg, base_dir / "completa", [csv_files])
+
+    table = info["table_name"]
+    with get_duckdb_con(inc["duckdb"]) as con_inc, get_duckdb_con(full["duckdb"]) as con_full:
+        t_inc, t_full = _tablas(con_inc, table), _tablas(con_full, table)
+    ok = set(t_inc) == set(t_full)
+    if not ok:
+        logging.error("❌ Tablas distintas: %s", sorted(set(t_inc) ^ set(t_full)))
+    for nombre in sorted(set(t_inc) & set(t_full)):
+        ok &= _comparar(nombre, t_inc[nombre], t_full[nombre])
+
+    p_inc, p_full = list_partitions(partitions_dir(inc)), list_partitions(partitions_dir(full))
+    if p_inc != p_full:
+        logging.error("❌ Particiones distintas: %s vs %s", p_inc, p_full)
+        return False
+    columnas = list(t_full[table].columns)  # sin las auxiliares filename/file_row_number
+    for key in p_inc:
+        ok &= _comparar(f"partición {key}", read_partition(partitions_dir(inc), key, columnas),
+                        read_partition(partitions_dir(full), key, columnas))
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compara una ingesta incremental con una construcción completa.")
+    parser.add_argument("--rows", type=int, default=200_000, help="Segundos de datos generados")
+    parser.add_argument("--files", type=int, default=4, help="CSV del dataset (el último se ingiere aparte)")
+    parser.add_argument("--seam-hours", type=float, default=1.0, help="Corte al inicio del último CSV")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="Carpeta de trabajo (por defecto temporal, se borra al terminar)")
+    args = parser.parse_args(argv)
+
+    work_dir = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="mds-check-"))
+    try:
+        ok = check(work_dir, args.rows, args.files, args.seam_hours, args.seed)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    logging.info("🏁 Incremental %s a la construcción completa", "igual" if ok else "DISTINTA")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,253 @@
+# utils/benchmark/generate_data.py
+"""
+Generador de datasets sintéticos para los benchmarks.
+
+Escribe carpetas de dataset completas (control_dataset.yml + YAML de
+componentes + raw/*.csv) que scan_datasets reconoce igual que las reales:
+  - Tabular (estilo MDS): Timestamp a 1 s + N columnas de medida, con
+    huecos (bloques de timestamps ausentes), timestamps duplicados y
+    valores sentinela (±999999.0) inyectados.
+  - EventEncoded (estilo Epoch): Timestamp epoch en segundos + código de
+    evento, con el diccionario de eventos y control_groupedDictionary.yml
+    (componentes de 6 cuantiles raw + 30 transiciones from_to). Huecos =
+    tramos sin eventos; duplicados = eventos repetidos.
+
+Uso:
+    python -m utils.benchmark.generate_data --out /tmp/bench --rows 1000000 --cols 50
+    python -m utils.benchmark.generate_data --out /tmp/bench --kind events --rows 5000000 --cols 360
+"""
+import argparse
+import json
+import logging
+from itertools import permutations
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from utils.helpers import load_config
+
+TEMPLATE_DIR = Path(__file__).resolve().parents[2] / "Datasets" / ".Template"
+T0 = pd.Timestamp("2022-05-01 00:00:00")
+SENTINELAS = (999999.0, -999999.0)
+CUANTILES = ["Q05", "Q10", "Q20", "Q50", "Q90", "Q95"]
+TRANSICIONES = [f"{a}_to_{b}" for a, b in permutations(CUANTILES, 2)]
+
+# tipo -> (valor medio, amplitud de la oscilación diaria, ruido)
+TIPOS = {
+    "voltaje": (230.0, 4.0, 0.8),
+    "frecuencia": (50.0, 0.05, 0.01),
+    "potencia": (0.0, 40.0, 5.0),
+    "temperatura": (25.0, 6.0, 0.3),
+}
+UNIDADES = {"voltaje": "V", "frecuencia": "Hz", "potencia": "kW", "temperatura": "°C"}
+
+
+def _metadata(nombre: str, tipo: str, **extra) -> dict:
+    meta = {
+        "version": "1.0",
+        "dataset": nombre,
+        "description": "Dataset sintético para benchmarks",
+        "date_created": pd.Timestamp.now().strftime("%Y-%m-%d"),
+        "type": tipo,
+    }
+    meta.update(extra)
+    return meta
+
+
+def _dump_yaml(path: Path, data: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, sort_keys=False, allow_unicode=True)
+
+
+def _mascara_huecos(n: int, gap_ratio: float, rng, max_len: int = 600) -> np.ndarray:
+    """True = fila presente; se quitan bloques contiguos hasta ~gap_ratio de las filas."""
+    keep = np.ones(n, dtype=bool)
+    objetivo = int(n * gap_ratio)
+    quitadas = 0
+    while quitadas < objetivo:
+        largo = int(rng.integers(5, max_len))
+        inicio = int(rng.integers(0, max(n - largo, 1)))
+        quitadas += int(keep[inicio:inicio + largo].sum())
+        keep[inicio:inicio + largo] = False
+    return keep
+
+
+# -----------------------------------------------------------
+# Tabular (MDS)
+# -----------------------------------------------------------
+def generate_tabular(out_dir: Path, name: str = "Bench-Tabular", rows: int = 1_000_000, cols: int = 10,
+                     files: int = 4, gap_ratio: float = 0.01, dup_ratio: float = 0.001,
+                     sentinel_ratio: float = 0.0005, chunk_rows: int = 500_000, seed: int = 0) -> Path:
+    """
+    Dataset tabular de `rows` segundos consecutivos (antes de quitar huecos)
+    y `cols` medidas repartidas en componentes de 5 medidas.
+    Los CSV se escriben por bloques de `chunk_rows` filas.
+    """
+    rng = np.random.default_rng(seed)
+    ds_dir = Path(out_dir) / name
+    raw_dir = ds_dir / "raw"
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    for old in raw_dir.glob("*.csv"):
+        old.unlink()
+
+    # componentes y medidas
+    tipos = list(TIPOS)
+    columnas, components = [], {}
+    for i in range(cols):
+        comp_id = f"Comp_{i // 5:03d}"
+        tipo = tipos[i % len(tipos)]
+        col = f"{comp_id}_{tipo.capitalize()}_{i:04d}"
+        columnas.append((col, tipo))
+        comp = components.setdefault(comp_id, {"name": comp_id, "description": "Componente sintético",
+                                               "measurements": {}})
+        comp["measurements"][col] = {"unit": UNIDADES[tipo], "description": f"{tipo} sintética",
+                                     "display_name": col, "type": tipo}
+
+    config = load_config(TEMPLATE_DIR / "control_dataset1.yml")
+    config["metadata"] = _metadata(name, "TabularDataSet", components="control_components.yml")
+    _dump_yaml(ds_dir / "control_dataset.yml", config)
+    _dump_yaml(ds_dir / "control_components.yml", {"components": components})
+
+    filas_por_fichero = -(-rows // files)
+    escritas = 0
+    for n_file in range(files):
+        path = raw_dir / f"day_{n_file:03d}.csv"
+        fin_fichero = min(rows, (n_file + 1) * filas_por_fichero)
+        cabecera = True
+        while escritas < fin_fichero:
+            n = min(chunk_rows, fin_fichero - escritas)
+            segundos = np.arange(escritas, escritas + n, dtype="int64")
+            keep = _mascara_huecos(n, gap_ratio, rng)
+            segundos = segundos[keep]
+
+            # duplicados: mismo timestamp con valores ligeramente distintos
+            n_dup = int(len(segundos) * dup_ratio)
+            if n_dup:
+                segundos = np.sort(np.concatenate([segundos, rng.choice(segundos, n_dup, replace=False)]))
+
+            fase = 2 * np.pi * segundos / 86400.0
+            data = {"Timestamp": (T0 + pd.to_timedelta(segundos, unit="s")).strftime("%Y-%m-%d %H:%M:%S")}
+            for col, tipo in columnas:
+                media, amplitud, ruido = TIPOS[tipo]
+                valores = media + amplitud * np.sin(fase + rng.uniform(0, np.pi)) + rng.normal(0, ruido, len(segundos))
+                n_sent = int(len(valores) * sentinel_ratio)
+                if n_sent:
+                    valores[rng.choice(len(valores), n_sent, replace=False)] = rng.choice(SENTINELAS, n_sent)
+                data[col] = valores
+
+            pd.DataFrame(data).to_csv(path, mode="w" if cabecera else "a", header=cabecera,
+                                      index=False, float_format="%.3f")
+            cabecera = False
+            escritas += n
+        logging.info("🧪 %s: %s", path.name, escritas)
+
+    logging.info("🧪 Dataset tabular %s: %s filas x %s columnas en %s", name, rows, cols, ds_dir)
+    return ds_dir
+
+
+# -----------------------------------------------------------
+# EventEncoded (Epoch)
+# -----------------------------------------------------------
+def generate_events(out_dir: Path, name: str = "Bench-Events", rows: int = 1_000_000, cols: int = 72,
+                    files: int = 4, gap_ratio: float = 0.01, dup_ratio: float = 0.001,
+                    events_per_second: float = 1.0, chunk_rows: int = 1_000_000, seed: int = 0) -> Path:
+    """
+    Dataset de `rows` eventos con `cols` códigos (componentes de 36 códigos:
+    6 raw + 30 from_to). Los códigos siguen una distribución de Zipf para que
+    haya códigos frecuentes y raros, como en el dataset real.
+    """
+    rng = np.random.default_rng(seed)
+    ds_dir = Path(out_dir) / name
+    raw_dir = ds_dir / "raw"
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    for old in raw_dir.glob("*.csv"):
+        old.unlink()
+
+    components, dictionary = {}, {}
+    code = 1
+    for n_comp in range(-(-cols // 36)):
+        comp_id = f"Comp_{n_comp:03d}_Active_Power"
+        grupos = {"raw": CUANTILES, "from_to": TRANSICIONES}
+        components[comp_id] = {"name": comp_id, "measurements": {}}
+        for grupo, nombres in grupos.items():
+            nombres = nombres[:max(0, cols - code + 1)]
+            if not nombres:
+                continue
+            encoded = list(range(code, code + len(nombres)))
+            components[comp_id]["measurements"][grupo] = {"columns": nombres, "columns_encoded": encoded}
+            for c, e in zip(nombres, encoded):
+                clave = f"{comp_id}_{c}" if grupo == "raw" else f"{comp_id}_from_{c}"
+                dictionary[clave] = e
+            code += len(nombres)
+
+    config = load_config(TEMPLATE_DIR / "control_dataset2.yml")
+    config["metadata"] = _metadata(name, "EventEncodedDataSet", dictionary="Events_Dictionary.json",
+                                   components="control_groupedDictionary.yml")
+    _dump_yaml(ds_dir / "control_dataset.yml", config)
+    _dump_yaml(ds_dir / "control_groupedDictionary.yml", {"components": components})
+    with open(ds_dir / "Events_Dictionary.json", "w", encoding="utf-8") as f:
+        json.dump(dictionary, f, indent=4)
+
+    n_codes = code - 1
+    pesos = 1.0 / np.arange(1, n_codes + 1) ** 1.1
+    pesos /= pesos.sum()
+    orden = rng.permutation(n_codes) + 1
+
+    t0 = int(T0.timestamp())
+    filas_por_fichero = -(-rows // files)
+    escritas = 0
+    for n_file in range(files):
+        path = raw_dir / f"events_{n_file:03d}.csv"
+        fin_fichero = min(rows, (n_file + 1) * filas_por_fichero)
+        cabecera = True
+        while escritas < fin_fichero:
+            n = min(chunk_rows, fin_fichero - escritas)
+            ts = t0 + np.floor((escritas + np.arange(n)) / events_per_second).astype("int64")
+            keep = _mascara_huecos(n, gap_ratio, rng)
+            ts = ts[keep]
+            codigos = orden[rng.choice(n_codes, len(ts), p=pesos)]
+
+            n_dup = int(len(ts) * dup_ratio)
+            if n_dup:
+                idx = rng.choice(len(ts), n_dup, replace=False)
+                ts, codigos = np.concatenate([ts, ts[idx]]), np.concatenate([codigos, codigos[idx]])
+                o = np.argsort(ts, kind="stable")
+                ts, codigos = ts[o], codigos[o]
+
+            pd.DataFrame({"Timestamp": ts, "event": codigos}).to_csv(
+                path, mode="w" if cabecera else "a", header=cabecera, index=False)
+            cabecera = False
+            escritas += n
+        logging.info("🧪 %s: %s", path.name, escritas)
+
+    logging.info("🧪 Dataset de eventos %s: %s eventos, %s códigos en %s", name, rows, n_codes, ds_dir)
+    return ds_dir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera datasets sintéticos (tabular MDS o eventos Epoch).")
+    parser.add_argument("--out", required=True, help="Carpeta base donde crear el dataset")
+    parser.add_argument("--kind", choices=["tabular", "events"], default="tabular")
+    parser.add_argument("--name", help="Nombre de la carpeta del dataset")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Filas (tabular) o eventos")
+    parser.add_argument("--cols", type=int, default=10, help="Medidas (tabular) o códigos de evento")
+    parser.add_argument("--files", type=int, default=4, help="Número de CSV en raw/")
+    parser.add_argument("--gap-ratio", type=float, default=0.01, help="Fracción de filas quitadas en bloques")
+    parser.add_argument("--dup-ratio", type=float, default=0.001, help="Fracción de filas duplicadas")
+    parser.add_argument("--sentinel-ratio", type=float, default=0.0005, help="Fracción de celdas sentinela (tabular)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.kind == "tabular":
+        generate_tabular(Path(args.out), args.name or "Bench-Tabular", args.rows, args.cols, args.files,
+                         args.gap_ratio, args.dup_ratio, args.sentinel_ratio, seed=args.seed)
+    else:
+        generate_events(Path(args.out), args.name or "Bench-Events", args.rows, args.cols, args.files,
+                        args.gap_ratio, args.dup_ratio, seed=args.seed)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    main()
@@ -0,0 +1,276 @@
+# utils/benchmark/run_benchmark.py
+"""
+Benchmark de la pila completa del dashboard sobre datasets sintéticos (o
+existentes) con salida JSON para comparar ejecuciones antes/después de un
+cambio.
+
+Pasos medidos por dataset:
+  - pipeline:<paso>        cada etapa de cargar_dataset_completo
+  - build:<paso>           cada paso de load_processed_or_build (DuckDB, pirámide,
+                           huecos, particiones, almacén...) sobre un DuckDB nuevo
+  - load_full_df_to_ram    carga completa en RAM
+  - store_json_roundtrip   handle del dcc.Store y DF de `--json-rows` filas a JSON y vuelta
+  - checklist_options      build_checklist_options_from_components y OptionCatalog
+  - actualizar_grafico     figura inicial con N series (una medida por cada --series)
+  - actualizar_zoom        Patch de zoom sobre el 10 % central del rango
+
+El DuckDB y los derivados se construyen en una carpeta aparte (--work-dir),
+así que nunca se tocan los processed/ de los datasets.
+
+Uso:
+    python -m utils.benchmark.run_benchmark --generate tabular --rows 1000000 --cols 50 --output bench.json
+    python -m utils.benchmark.run_benchmark --base-dir Datasets --dataset MDS-Dataset --series 1 5
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+from dash._utils import to_json
+
+from callbacks.grafico_temporal import actualizar_grafico, actualizar_zoom
+from utils.benchmark.generate_data import generate_events, generate_tabular
+from utils.data_loader import cargar_dataset_completo
+from utils.duckdb_pool import read_connection
+from utils.dataset_manager import (
+    RAM_DATASETS,
+    ServerDataset,
+    get_duckdb_con,
+    load_full_df_to_ram,
+    load_processed_or_build,
+    make_dataset_handle,
+    scan_datasets,
+)
+from utils.helpers import build_checklist_options_from_components, load_config
+from utils.option_catalog import OptionCatalog
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+
+
+class _Pasos:
+    """Callback `progress` que cronometra cada paso hasta que empieza el siguiente."""
+
+    def __init__(self):
+        self.marcas = []
+
+    def __call__(self, paso):
+        self.marcas.append((paso, time.perf_counter()))
+
+    def duraciones(self, fin: float) -> list:
+        out = []
+        for i, (paso, t) in enumerate(self.marcas):
+            t_fin = self.marcas[i + 1][1] if i + 1 < len(self.marcas) else fin
+            out.append((paso, t_fin - t))
+        return out
+
+
+class Benchmark:
+    def __init__(self, repeat: int = 3):
+        self.repeat = max(int(repeat), 1)
+        self.results = []
+
+    def record(self, dataset: str, step: str, seconds: float, **extra):
+        self.results.append({"dataset": dataset, "step": step, "seconds": round(seconds, 6), **extra})
+        logging.info("⏱️ %s · %s: %.3f s", dataset, step, seconds)
+
+    def once(self, dataset: str, step: str, fn, **extra):
+        t = time.perf_counter()
+        value = fn()
+        self.record(dataset, step, time.perf_counter() - t, **extra)
+        return value
+
+    def repeated(self, dataset: str, step: str, fn, **extra):
+        """Primera ejecución (fría) + mínimo y mediana de `repeat` ejecuciones."""
+        tiempos, value = [], None
+        for _ in range(self.repeat):
+            t = time.perf_counter()
+            value = fn()
+            tiempos.append(time.perf_counter() - t)
+        self.record(dataset, step, tiempos[0], seconds_min=round(min(tiempos), 6),
+                    seconds_median=round(statistics.median(tiempos), 6), repeat=self.repeat, **extra)
+        return value
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _versions() -> dict:
+    out = {}
+    for mod in ("pandas", "numpy", "duckdb", "dash", "plotly"):
+        try:
+            out[mod] = __import__(mod).__version__
+        except Exception:
+            out[mod] = None
+    return out
+
+
+def bench_dataset(bench: Benchmark, name: str, info: dict, work_dir: Path, series: list, json_rows: int):
+    cfg = load_config(info["config"])
+    csv_files = sorted((info["path"] / "raw").glob("*.csv"))
+    if not csv_files:
+        logging.warning("Dataset %s sin CSV, se omite", name)
+        return
+    filas_csv = None
+
+    # 1) etapas de la pipeline de limpieza (solo tabular: los eventos no la usan)
+    if info.get("storage") != "events":
+        pasos = _Pasos()
+        t = time.perf_counter()
+        df = cargar_dataset_completo([str(f) for f in csv_files], cfg.get("pipelineCleanData", {}), progress=pasos)
+        fin = time.perf_counter()
+        filas_csv = len(df)
+        for paso, dur in pasos.duraciones(fin):
+            bench.record(name, f"pipeline:{paso}", dur)
+        bench.record(name, "pipeline:total", fin - t, rows=len(df), columns=len(df.columns))
+        del df
+
+    # 2) construcción DuckDB completa en una carpeta de trabajo propia
+    info = dict(info, duckdb=work_dir / name / "processed" / f"{name}.duckdb")
+    shutil.rmtree(info["duckdb"].parent, ignore_errors=True)
+    pasos = _Pasos()
+    t = time.perf_counter()
+    with get_duckdb_con(info["duckdb"]) as con:
+        load_processed_or_build(con, info, cfg, progress=pasos)
+        con.execute("CHECKPOINT")
+    fin = time.perf_counter()
+    for paso, dur in pasos.duraciones(fin):
+        bench.record(name, f"build:{paso}", dur)
+    bench.record(name, "build:total", fin - t, duckdb_bytes=info["duckdb"].stat().st_size)
+
+    # 3) vista de servidor y carga completa en RAM
+    ds = bench.once(name, "server_dataset", lambda: ServerDataset(name, info))
+    df = bench.once(name, "load_full_df_to_ram", lambda: load_full_df_to_ram(name, info),
+                    rows=ds.n_rows, columns=len(ds.columns) - 1)
+    df_bytes = int(df.memory_usage(deep=True).sum())
+    bench.results[-1]["frame_bytes"] = df_bytes
+
+    # 4) ida y vuelta por JSON: el handle que viaja hoy y un DF como el que viajaba antes
+    handle = make_dataset_handle(name, info)
+    bench.repeated(name, "store_json_roundtrip:handle", lambda: json.loads(to_json(handle)),
+                   payload_bytes=len(to_json(handle)))
+    muestra = df.head(json_rows)
+    payload = muestra.to_json(orient="split", date_format="iso")
+    bench.repeated(name, "store_json_roundtrip:frame",
+                   lambda: pd.read_json(StringIO(muestra.to_json(orient="split", date_format="iso")), orient="split"),
+                   rows=len(muestra), payload_bytes=len(payload))
+    del df, muestra
+    RAM_DATASETS.pop(name, None)
+
+    # 5) opciones del checklist
+    columnas = list(ds.columns)
+    bench.repeated(name, "checklist_options",
+                   lambda: build_checklist_options_from_components(info["components"], info["type"], columnas),
+                   n_columns=len(columnas))
+    catalogo = bench.repeated(name, "option_catalog",
+                              lambda: OptionCatalog(info["components"], info["type"], columnas),
+                              n_options=len(ds.options.options))
+
+    # 6) figura inicial y zoom para N series
+    valores = [opt["value"] for opt in catalogo.options]
+    span = ds.t_max - ds.t_min
+    x0, x1 = ds.t_min + span * 0.45, ds.t_min + span * 0.55
+    relayout = {"xaxis.range[0]": str(x0), "xaxis.range[1]": str(x1)}
+    for n in series:
+        sel = valores[:n]
+        if len(sel) < n:
+            logging.warning("%s: solo hay %s series para N=%s", name, len(sel), n)
+        with read_connection(info["duckdb"]) as con:
+            kw = dict(con=con, table=info["table_name"], cache_key=(name, "bench"), dataset=ds)
+            fig = bench.repeated(name, "actualizar_grafico",
+                                 lambda: actualizar_grafico(sel, None, None, "Timestamp", lambda c: c, **kw),
+                                 n_series=len(sel))
+            bench.results[-1]["payload_bytes"] = len(fig.to_json())
+            patch = bench.repeated(name, "actualizar_zoom",
+                                   lambda: actualizar_zoom(sel, relayout, None, "Timestamp", **kw),
+                                   n_series=len(sel))
+            if hasattr(patch, "to_plotly_json"):
+                bench.results[-1]["payload_bytes"] = len(to_json(patch.to_plotly_json()))
+
+    if filas_csv is not None:
+        bench.results.append({"dataset": name, "step": "summary", "rows_after_pipeline": filas_csv,
+                              "rows_table": ds.n_rows, "frame_bytes": df_bytes})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del dashboard con salida JSON.")
+    parser.add_argument("--base-dir", help="Carpeta con datasets (por defecto se generan en --work-dir)")
+    parser.add_argument("--dataset", nargs="*", help="Datasets a medir (por defecto todos)")
+    parser.add_argument("--generate", choices=["tabular", "events", "both"],
+                        help="Generar datasets sintéticos antes de medir")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Filas/eventos a generar")
+    parser.add_argument("--cols", type=int, default=10, help="Columnas/códigos a generar")
+    parser.add_argument("--files", type=int, default=4, help="CSV por dataset generado")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--series", type=int, nargs="+", default=[1, 5, 20], help="N de series a graficar")
+    parser.add_argument("--json-rows", type=int, default=100_000, help="Filas del DF en la ida y vuelta JSON")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones de los pasos rápidos")
+    parser.add_argument("--work-dir", help="Carpeta de trabajo (DuckDB y derivados); por defecto temporal")
+    parser.add_argument("--keep", action="store_true", help="No borrar la carpeta de trabajo temporal")
+    parser.add_argument("--output", help="Fichero JSON de salida (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    temporal = args.work_dir is None
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="mds-bench-"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        base_dir = Path(args.base_dir) if args.base_dir else work_dir / "datasets"
+        if args.generate in ("tabular", "both"):
+            generate_tabular(base_dir, rows=args.rows, cols=args.cols, files=args.files, seed=args.seed)
+        if args.generate in ("events", "both"):
+            generate_events(base_dir, rows=args.rows, cols=args.cols, files=args.files, seed=args.seed)
+        if not base_dir.exists():
+            parser.error(f"No existe {base_dir}: usa --base-dir o --generate")
+
+        datasets = scan_datasets(base_dir)
+        nombres = args.dataset or list(datasets)
+        bench = Benchmark(repeat=args.repeat)
+        inicio = pd.Timestamp.now().isoformat()
+        t = time.perf_counter()
+        for name in nombres:
+            if name not in datasets:
+                parser.error(f"Dataset desconocido: {name}")
+            bench_dataset(bench, name, datasets[name], work_dir / "build", sorted(args.series), args.json_rows)
+
+        report = {
+            "meta": {
+                "started_at": inicio,
+                "elapsed_seconds": round(time.perf_counter() - t, 3),
+                "git_commit": _git_commit(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "versions": _versions(),
+                "args": vars(args),
+            },
+            "results": bench.results,
+        }
+        texto = json.dumps(report, indent=2, default=str)
+        if args.output:
+            Path(args.output).write_text(texto, encoding="utf-8")
+            logging.info("📄 Resultados en %s", args.output)
+        else:
+            print(texto)
+    finally:
+        if temporal and not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    main()
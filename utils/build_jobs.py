@@ -0,0 +1,394 @@
+# utils/build_jobs.py
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from utils.helpers import load_config
+from utils.duckdb_pool import read_connection
+from utils.dataset_manager import get_duckdb_con, load_processed_or_build, dataset_needs_build
+from utils.partitions import partitions_dir
+from utils.pipeline_executor import CHECKPOINT_DIR
+from utils.shared_store import current_store_version, has_shared_store, publish_store_version, shared_store_dir
+
+# -----------------------------------------------------------
+# Construcción de datasets en segundo plano
+#   - cola local: ProcessPoolExecutor con un único proceso trabajador
+#   - estado/progreso en processed/build_status.json (lo leen todos los workers)
+#   - build.lock evita que dos procesos construyan el mismo dataset a la vez
+#   - se construye en processed/.staging/: copia del DuckDB, de las
+#     particiones y del almacén compartido (enlaces duros: los ficheros nunca
+#     se modifican en sitio). Al terminar se publica todo junto: la versión
+#     nueva del almacén se mueve junto a la vigente, el DuckDB sustituye al
+#     bueno con os.replace, después las particiones y por último CURRENT.
+#     Mientras tanto, o si la construcción falla, se sirve la última versión
+#     válida completa (los checkpoints de la pipeline sí quedan en processed/
+#     para poder reanudar)
+# -----------------------------------------------------------
+STATUS_FILE = "build_status.json"
+LOCK_FILE = "build.lock"
+STAGING_DIR = ".staging"
+ESTADOS_EN_CURSO = ("queued", "running")
+
+_EXECUTOR = None
+_JOBS: dict = {}  # dataset -> Future (solo los enviados desde este proceso)
+
+
+def _processed_dir(dataset_info: dict) -> Path:
+    return Path(dataset_info["duckdb"]).parent
+
+
+def staging_dir(dataset_info: dict) -> Path:
+    return _processed_dir(dataset_info) / STAGING_DIR
+
+
+def staging_info(dataset_info: dict) -> dict:
+    """dataset_info de la construcción: DuckDB, particiones y almacén bajo processed/.staging/."""
+    live = Path(dataset_info["duckdb"])
+    return dict(dataset_info, duckdb=staging_dir(dataset_info) / live.name,
+                checkpoint_dir=_processed_dir(dataset_info) / CHECKPOINT_DIR)
+
+
+def _wal(path: Path) -> Path:
+    return path.with_name(path.name + ".wal")
+
+
+def _pid_vivo(pid) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except (OSError, TypeError, ValueError):
+        return False
+    return True
+
+
+# -----------------------------------------------------------
+# Estado
+# -----------------------------------------------------------
+def read_build_status(dataset_info: dict):
+    try:
+        return json.loads((_processed_dir(dataset_info) / STATUS_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_status(dataset_info: dict, **campos):
+    """Actualiza el fichero de estado (escritura atómica: tmp + os.replace)."""
+    status = read_build_status(dataset_info) or {}
+    status.update(campos)
+    path = _processed_dir(dataset_info) / STATUS_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{STATUS_FILE}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(status, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+    return status
+
+
+def inputs_fingerprint(dataset_info: dict) -> str:
+    """
+    Huella barata de la entrada de una construcción: nombre, tamaño y mtime
+    de los CSV de raw/ y de los ficheros de configuración (YAML/JSON) del
+    dataset. Solo stat, sin leer contenidos.
+    """
+    base = Path(dataset_info["path"])
+    ficheros = sorted((base / "raw").glob("*.csv")) + sorted(
+        p for p in base.iterdir() if p.is_file() and p.suffix in (".yml", ".yaml", ".json")
+    )
+    h = hashlib.sha256()
+    for p in ficheros:
+        st = p.stat()
+        h.update(f"{p.relative_to(base)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def build_failed_unchanged(dataset_info: dict, status) -> bool:
+    """La última construcción falló y la entrada no ha cambiado desde entonces (reintentar daría igual)."""
+    return bool(status) and status.get("state") == "error" and status.get("inputs") == inputs_fingerprint(dataset_info)
+
+
+def build_in_progress(status) -> bool:
+    """Hay un trabajo encolado o corriendo (y el proceso que lo lleva sigue vivo)."""
+    return bool(status) and status.get("state") in ESTADOS_EN_CURSO and _pid_vivo(status.get("pid"))
+
+
+def build_step_durations(status) -> dict:
+    """{paso: segundos} de la última construcción (el paso en curso cuenta hasta ahora)."""
+    steps = (status or {}).get("steps") or []
+    fin = status.get("finished_at") if status and status.get("state") not in ESTADOS_EN_CURSO else None
+    out = {}
+    for i, s in enumerate(steps):
+        t_fin = steps[i + 1]["t"] if i + 1 < len(steps) else (fin or time.time())
+        out[s["step"]] = out.get(s["step"], 0.0) + max(t_fin - s["t"], 0.0)
+    return out
+
+
+def build_status_text(status) -> str:
+    """Texto corto para la UI."""
+    if not status:
+        return ""
+    state = status.get("state")
+    if state == "queued":
+        return f"⏳ Construcción de {status.get('dataset')} en cola…"
+    if state == "running":
+        steps = status.get("steps", [])
+        segundos = int(time.time() - status.get("started_at", time.time()))
+        return f"🔧 Construyendo {status.get('dataset')}: paso {len(steps)} · {status.get('step')} ({segundos}s)"
+    if state == "error":
+        return f"❌ Error construyendo {status.get('dataset')}: {status.get('error')}"
+    return ""
+
+
+# -----------------------------------------------------------
+# Lock entre procesos
+# -----------------------------------------------------------
+def _tomar_lock(dataset_info: dict) -> bool:
+    lock = _processed_dir(dataset_info) / LOCK_FILE
+    for _ in range(2):
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                pid = lock.read_text(encoding="utf-8").strip()
+            except FileNotFoundError:
+                continue
+            if _pid_vivo(pid):
+                return False
+            logging.warning("Lock de construcción huérfano (pid %s), se elimina", pid)
+            lock.unlink(missing_ok=True)
+            continue
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+
+def _soltar_lock(dataset_info: dict):
+    (_processed_dir(dataset_info) / LOCK_FILE).unlink(missing_ok=True)
+
+
+# -----------------------------------------------------------
+# Staging y publicación
+# -----------------------------------------------------------
+def _copiar_enlaces(src: Path, dst: Path):
+    """Copia un árbol con enlaces duros (copia normal si no se puede enlazar)."""
+    def enlazar(a, b):
+        try:
+            os.link(a, b)
+        except OSError:
+            shutil.copy2(a, b)
+    shutil.copytree(src, dst, copy_function=enlazar)
+
+
+def _preparar_staging(dataset_info: dict, staging: dict):
+    """
+    La ingesta incremental parte de la última versión buena: copia del DuckDB
+    (los callbacks solo leen el fichero publicado, así que se puede copiar),
+    de las particiones y de la versión vigente del almacén.
+    """
+    shutil.rmtree(staging_dir(dataset_info), ignore_errors=True)
+    staging_dir(dataset_info).mkdir(parents=True)
+    live = Path(dataset_info["duckdb"])
+    if live.exists():
+        shutil.copy2(live, staging["duckdb"])
+        if _wal(live).exists():
+            shutil.copy2(_wal(live), _wal(staging["duckdb"]))
+    if partitions_dir(dataset_info).exists():
+        _copiar_enlaces(partitions_dir(dataset_info), partitions_dir(staging))
+    if has_shared_store(dataset_info):
+        version = current_store_version(dataset_info)
+        _copiar_enlaces(shared_store_dir(dataset_info) / version, shared_store_dir(staging) / version)
+        publish_store_version(staging, version)
+
+
+def _publicar(dataset_info: dict, staging: dict):
+    """Sustituye DuckDB, particiones y almacén vigentes por los de staging."""
+    live = Path(dataset_info["duckdb"])
+
+    # 1) versión nueva del almacén junto a la vigente (invisible hasta mover CURRENT)
+    version = current_store_version(staging)
+    nueva_version = version is not None and version != current_store_version(dataset_info)
+    if nueva_version:
+        shared_store_dir(dataset_info).mkdir(parents=True, exist_ok=True)
+        os.replace(shared_store_dir(staging) / version, shared_store_dir(dataset_info) / version)
+
+    # 2) DuckDB y, justo detrás, las particiones (ServerDataset lee la tabla
+    #    si falta la partición de un mes en el instante del cambio)
+    _wal(live).unlink(missing_ok=True)
+    os.replace(staging["duckdb"], live)
+    viejas = None
+    if partitions_dir(staging).exists():
+        if partitions_dir(dataset_info).exists():
+            viejas = staging_dir(dataset_info) / "partitions.old"
+            os.replace(partitions_dir(dataset_info), viejas)
+        os.replace(partitions_dir(staging), partitions_dir(dataset_info))
+
+    # 3) por último CURRENT (borra las versiones anteriores del almacén)
+    if nueva_version:
+        publish_store_version(dataset_info, version)
+    if viejas is not None:
+        shutil.rmtree(viejas, ignore_errors=True)
+
+
+def _limpiar_staging(dataset_info: dict):
+    """Borra la carpeta staging y la copia <name>.duckdb.staging (+ .wal) de versiones anteriores."""
+    shutil.rmtree(staging_dir(dataset_info), ignore_errors=True)
+    live = Path(dataset_info["duckdb"])
+    antigua = live.with_name(live.name + ".staging")
+    for p in (antigua, _wal(antigua)):
+        p.unlink(missing_ok=True)
+
+
+# -----------------------------------------------------------
+# Trabajo (se ejecuta en el proceso trabajador)
+# -----------------------------------------------------------
+def run_build(dataset_name: str, dataset_info: dict):
+    """
+    Construye/actualiza el dataset en processed/.staging/ y lo publica al
+    terminar (_publicar). El progreso de cada paso se escribe en el fichero
+    de estado.
+    """
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+    if not _tomar_lock(dataset_info):
+        logging.info("Construcción de %s ya en curso en otro proceso", dataset_name)
+        return
+
+    staging = staging_info(dataset_info)
+    steps = []
+    # huella tomada antes de leer nada: si raw/ cambia durante la construcción
+    # y esta falla, la siguiente comprobación la reintenta
+    inputs = inputs_fingerprint(dataset_info)
+
+    def progreso(paso):
+        steps.append({"step": paso, "t": time.time()})
+        _write_status(dataset_info, step=paso, steps=steps)
+        logging.info("🔧 [%s] %s", dataset_name, paso)
+
+    try:
+        _write_status(dataset_info, dataset=dataset_name, state="running", pid=os.getpid(),
+                      started_at=time.time(), step="copia staging", steps=[], error=None, inputs=None)
+        _preparar_staging(dataset_info, staging)
+
+        cfg = load_config(dataset_info["config"])
+        with get_duckdb_con(staging["duckdb"]) as con:
+            load_processed_or_build(con, staging, cfg, progress=progreso)
+            con.execute("CHECKPOINT")
+
+        _publicar(dataset_info, staging)
+        _write_status(dataset_info, state="done", step=None, finished_at=time.time())
+        logging.info("✅ Construcción de %s publicada", dataset_name)
+    except Exception as e:
+        logging.exception("Error construyendo %s", dataset_name)
+        _write_status(dataset_info, state="error", error=str(e), inputs=inputs, finished_at=time.time())
+    finally:
+        _limpiar_staging(dataset_info)
+        _soltar_lock(dataset_info)
+
+
+# -----------------------------------------------------------
+# Cola (lado servidor web)
+# -----------------------------------------------------------
+def _executor():
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        # spawn: el trabajador no hereda el estado del servidor (hilos, conexiones)
+        _EXECUTOR = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    return _EXECUTOR
+
+
+def submit_build(dataset_name: str, dataset_info: dict):
+    """Encola la construcción si no hay ya una en curso. Devuelve el estado."""
+    status = read_build_status(dataset_info)
+    if build_in_progress(status):
+        return status
+    fut = _JOBS.get(dataset_name)
+    if fut is not None and not fut.done():
+        return status
+
+    status = _write_status(dataset_info, dataset=dataset_name, state="queued", pid=os.getpid(),
+                           queued_at=time.time(), step=None, steps=[], error=None, inputs=None)
+    _JOBS[dataset_name] = _executor().submit(run_build, dataset_name, dataset_info)
+    logging.info("📨 Construcción de %s encolada", dataset_name)
+    return status
+
+
+def ensure_dataset_built(dataset_name: str, dataset_info: dict, force: bool = False):
+    """
+    Comprobación barata desde un callback: si el dataset necesita construirse
+    (o actualizarse) y no hay trabajo en curso, se encola. Devuelve el estado
+    actual (None si nunca se construyó en segundo plano y está al día).
+    Una construcción fallida no se reencola mientras no cambien raw/ ni la
+    configuración (build_failed_unchanged), salvo con force=True (el usuario
+    pide reintentar).
+    """
+    status = read_build_status(dataset_info)
+    if build_in_progress(status):
+        return status
+    if not force and build_failed_unchanged(dataset_info, status):
+        return status
+    if needs_rebuild(dataset_info):
+        return submit_build(dataset_name, dataset_info)
+    return status
+
+
+def has_raw_data(dataset_info: dict) -> bool:
+    """Hay algún CSV en raw/ (sin ellos no hay nada que construir)."""
+    return any((Path(dataset_info["path"]) / "raw").glob("*.csv"))
+
+
+def needs_rebuild(dataset_info: dict) -> bool:
+    """Hay CSV en raw/ y no hay versión publicada o la publicada está desfasada."""
+    if not has_raw_data(dataset_info):
+        return False
+    live = Path(dataset_info["duckdb"])
+    if not live.exists():
+        return True
+    with read_connection(live) as con:
+        return dataset_needs_build(con, dataset_info)
+
+
+def has_built_version(dataset_info: dict) -> bool:
+    """Existe una versión publicada (las construcciones se publican completas)."""
+    return Path(dataset_info["duckdb"]).exists()
+
+
+def readiness(datasets: dict) -> dict:
+    """
+    Estado de servicio de los datasets (lo usan /ready y el prebuild):
+      - pending: {dataset: motivo} en construcción o por construir (vacío = listo)
+      - errors: {dataset: error} cuya última construcción falló con la misma
+        entrada que hay ahora (build_failed_unchanged) y no tienen una versión
+        al día; no se reencolan
+      - unbuilt: los de errors sin ninguna versión publicada (no hay nada que
+        servir); bloquean, los demás errores no: se sirve lo publicado
+      - empty: datasets sin CSV en raw/, que no se construyen
+    Un dataset con la versión publicada al día está listo aunque su última
+    construcción fallara; si la entrada cambió tras el fallo vuelve a estar
+    pendiente. Ver is_ready.
+    """
+    estado = {"pending": {}, "errors": {}, "unbuilt": [], "empty": []}
+    for nombre, info in datasets.items():
+        if not has_raw_data(info):
+            estado["empty"].append(nombre)
+            continue
+        status = read_build_status(info)
+        if build_in_progress(status):
+            estado["pending"][nombre] = status.get("state")
+        elif needs_rebuild(info):
+            if build_failed_unchanged(info, status):
+                estado["errors"][nombre] = status.get("error")
+                if not has_built_version(info):
+                    estado["unbuilt"].append(nombre)
+            else:
+                estado["pending"][nombre] = "pending"
+    return estado
+
+
+def is_ready(estado: dict) -> bool:
+    """Listo para servir (según readiness): nada pendiente y ningún dataset fallido sin versión publicada."""
+    return not estado["pending"] and not estado["unbuilt"]
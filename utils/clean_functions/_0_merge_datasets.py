@@ -2,15 +2,40 @@ import logging
 from math import log
 import os
 import glob
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Optional, Union
 
 import pandas as pd
 
 
+def _resolver_n_workers(n_workers) -> int:
+    """None/1 -> secuencial; 0 o 'auto' -> todos los cores; N -> N procesos."""
+    if n_workers in (None, 1, "1"):
+        return 1
+    if n_workers in (0, "0", "auto"):
+        return os.cpu_count() or 1
+    return max(1, int(n_workers))
+
+
+def _leer_csv(file: str) -> pd.DataFrame:
+    """
+    Lee un CSV y convierte su Timestamp (se ejecuta en cada proceso del pool).
+    Devuelve el trozo ya indexado por tiempo, sin filas con timestamp inválido.
+    """
+    # Lectura defensiva: usar separador coma y decimal punto tal y como pediste
+    df_piece = pd.read_csv(file, sep=',', decimal='.')
+    if 'Timestamp' not in df_piece.columns:
+        raise KeyError(f"Columna 'Timestamp' no encontrada en {os.path.basename(file)}")
+    df_piece['Timestamp'] = pd.to_datetime(df_piece['Timestamp'], errors='coerce')
+    df_piece.dropna(subset=['Timestamp'], inplace=True)
+    return df_piece.set_index('Timestamp')
+
+
 def merge_all_datasets(
     file_pattern: Union[str, List[str]],
     max_files: Optional[int] = None,
     year_filter: Optional[str] = None,
+    n_workers: Optional[Union[int, str]] = None,
 ) -> pd.DataFrame:
     """
     Carga y concatena múltiples CSV en un único DataFrame listo para que el resto
@@ -20,6 +45,10 @@ def merge_all_datasets(
         file_pattern: patrón glob (ej. "-dataset/*.csv") o lista de patrones/rutas.
         max_files: si se indica, limita la cargMDSa a los primeros N archivos.
         year_filter: si se indica, filtra los archivos cuyo nombre contiene este texto.
+        n_workers: procesos para leer y convertir timestamps fichero a fichero
+            (None/1 = secuencial, 0/"auto" = todos los cores). El resultado es
+            idéntico en ambos modos: se concatena en el orden de los ficheros y
+            se ordena con un sort estable.
 
     Returns:
         pd.DataFrame: DataFrame combinado con índice datetime en la columna 'Timestamp'.
@@ -53,26 +82,22 @@ def merge_all_datasets(
         logging.info(f"  -> {os.path.basename(file_path)}")
     logging.info("-" * 50)
 
+    data_frames: List[pd.DataFrame]
+    workers = _resolver_n_workers(n_workers)
+    if workers > 1 and len(file_list) > 1:
+        logging.info(f"⚡ Lectura paralela con {workers} procesos")
+        with ProcessPoolExecutor(max_workers=min(workers, len(file_list))) as pool:
+            data_frames = list(pool.map(_leer_csv, file_list))
+    else:
+        data_frames = [_leer_csv(file) for file in file_list]
 
-    data_frames: List[pd.DataFrame] = []
-    for file in file_list:
-        # Lectura defensiva: usar separador coma y decimal punto tal y como pediste
-        df_piece = pd.read_csv(file, sep=',', decimal='.')
-        data_frames.append(df_piece)
+    for file, df_piece in zip(file_list, data_frames):
         logging.info(f"   ✔️ Cargado {os.path.basename(file)} con {len(df_piece)} filas y {len(df_piece.columns)} columnas")
 
-    df = pd.concat(data_frames, ignore_index=True)
+    df = pd.concat(data_frames)
     logging.info(f"📊 DataFrame combinado tiene {len(df)} filas y {len(df.columns)} columnas")
-    # Procesar timestamps
-    logging.info(f"Número de filas antes de procesar timestamps: {len(df)}")
-    if 'Timestamp' not in df.columns:
-        raise KeyError("Columna 'Timestamp' no encontrada en los archivos cargados")
-
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
-    df.dropna(subset=['Timestamp'], inplace=True)
-    logging.info(f"Número de filas después de eliminar timestamps inválidos: {len(df)}")
 
-    df.set_index('Timestamp', inplace=True)
-    df.sort_index(inplace=True)
+    # merge determinista: orden de ficheros + sort estable por tiempo
+    df.sort_index(inplace=True, kind='mergesort')
 
     return df
@@ -1,10 +1,99 @@
 import pandas as pd
 import numpy as np
 
+
+def timestamps_faltantes(prev_ts, curr_ts, resolution, margen=0.5):
+    """
+    Timestamps que faltan entre cada par (prev_ts[i], curr_ts[i]) con la
+    resolución dada, con el mismo criterio que rellenar_timestamps:
+    hueco si |delta - resolución| > margen, y floor((delta + margen) / res) - 1
+    muestras ausentes. Acepta escalares o arrays.
+    """
+    prev_ts = pd.DatetimeIndex(np.atleast_1d(prev_ts))
+    curr_ts = pd.DatetimeIndex(np.atleast_1d(curr_ts))
+    resolution = pd.Timedelta(resolution)
+    res_s = resolution.total_seconds()
+
+    gaps_s = (curr_ts - prev_ts).total_seconds().to_numpy()
+    hueco = np.abs(gaps_s - res_s) > margen
+    missing = np.where(hueco, np.maximum(0, np.floor((gaps_s + margen) / res_s).astype(int) - 1), 0)
+
+    if missing.sum() == 0:
+        return pd.DatetimeIndex([])
+    base = np.repeat(prev_ts.asi8, missing)
+    # j = 1..missing dentro de cada hueco
+    j = np.arange(missing.sum()) - np.repeat(np.cumsum(missing) - missing, missing) + 1
+    return pd.DatetimeIndex(base + j * resolution.value)
+
+def _insertar_filas_relleno(df, nuevos, valor_relleno):
+    """
+    Inserta filas con valor_relleno en los timestamps `nuevos` (ordenados y
+    distintos de los existentes) sobre un df con índice ya ordenado, sin
+    concat + sort_index: las posiciones finales se calculan con searchsorted
+    y cada columna se escribe una sola vez en su array de salida.
+    """
+    idx = df.index.asi8
+    nuevos = nuevos.asi8
+    n_total = len(idx) + len(nuevos)
+
+    pos_orig = np.arange(len(idx)) + np.searchsorted(nuevos, idx, side="left")
+    pos_new = np.arange(len(nuevos)) + np.searchsorted(idx, nuevos, side="right")
+
+    ts = np.empty(n_total, dtype="int64")
+    ts[pos_orig] = idx
+    ts[pos_new] = nuevos
+
+    columnas = {}
+    for col in df.columns:
+        valores = df[col].to_numpy()
+        if np.issubdtype(valores.dtype, np.number) or valores.dtype == bool:
+            dtype = np.result_type(valores.dtype, np.asarray(valor_relleno).dtype)
+        else:
+            dtype = object
+        out = np.empty(n_total, dtype=dtype)
+        out[pos_orig] = valores
+        out[pos_new] = valor_relleno
+        columnas[col] = out
+
+    index = pd.DatetimeIndex(ts.view("datetime64[ns]"), name=df.index.name)
+    return pd.DataFrame(columnas, index=index, columns=df.columns)
+
+
+def _detectar_huecos(index, resolution, margen, prev_ts=None):
+    """
+    Huecos entre timestamps consecutivos de `index` (y entre prev_ts y el
+    primero, si se da). Devuelve (anomalies, nuevos_timestamps).
+    """
+    ts = index.asi8
+    if prev_ts is not None:
+        ts = np.concatenate([[pd.Timestamp(prev_ts).value], ts])
+
+    deltas_s = np.diff(ts) / 1e9
+    resolution_seconds = pd.Timedelta(resolution).total_seconds()
+    off_mask = np.abs(deltas_s - resolution_seconds) > margen
+
+    prev = pd.DatetimeIndex(ts[:-1][off_mask].view("datetime64[ns]"))
+    curr = pd.DatetimeIndex(ts[1:][off_mask].view("datetime64[ns]"))
+    gaps_s = deltas_s[off_mask]
+    missing = np.maximum(0, np.floor((gaps_s + margen) / resolution_seconds).astype(int) - 1)
+
+    anomalies = pd.DataFrame({
+        "prev_ts": prev,
+        "curr_ts": curr,
+        "gap_seconds": gaps_s,
+        "missing_samples": missing
+    })
+    return anomalies, timestamps_faltantes(prev, curr, resolution, margen)
+
+
 def rellenar_timestamps(df, valor_relleno=999999.0, margen=0.5):
     """
     Detecta huecos en el índice temporal de un DataFrame y los rellena 
     con nuevas filas donde el índice falta, usando un valor constante.
+    Los timestamps faltantes se generan con aritmética de arrays y se
+    intercalan en el índice ya ordenado sin volver a ordenar todo el DF.
+    Para datasets que no caben dos veces en RAM usar
+    rellenar_timestamps_por_bloques.
 
     Parámetros:
     -----------
@@ -25,44 +114,44 @@ def rellenar_timestamps(df, valor_relleno=999999.0, margen=0.5):
 
     # --- 1) Calcular resolución temporal ---
     resolution = df.index.to_series().diff().mode()[0]
-    resolution_seconds = resolution.total_seconds()
-
-    # --- 2) Calcular deltas y detectar huecos ---
-    deltas = df.index.to_series().diff().dt.total_seconds().dropna()
-    off_mask = (deltas - resolution_seconds).abs() > margen
-    gaps_s = deltas[off_mask]
-
-    curr_ts = gaps_s.index
-    prev_ts = curr_ts - pd.to_timedelta(gaps_s, unit="s")
-    missing = np.maximum(0, np.floor((gaps_s + margen) / resolution_seconds).astype(int) - 1)
-
-    anomalies = pd.DataFrame({
-        "prev_ts": prev_ts,
-        "curr_ts": curr_ts,
-        "gap_seconds": gaps_s.values,
-        "missing_samples": missing.values
-    }).reset_index(drop=True)
 
-    total_missing = int(missing.sum())
+    # --- 2) Detectar huecos y generar los timestamps que faltan ---
+    anomalies, new_timestamps = _detectar_huecos(df.index, resolution, margen)
+    total_missing = int(anomalies["missing_samples"].sum())
 
     if total_missing == 0:
         print("✅ No se detectaron huecos en los timestamps.")
         return df.copy(), anomalies
 
-    # --- 3) Crear los nuevos timestamps ---
-    new_timestamps = []
-    for i, row in anomalies.iterrows():
-        for j in range(1, row["missing_samples"] + 1):
-            ts_missing = row["prev_ts"] + j * resolution
-            new_timestamps.append(ts_missing)
-
-    # --- 4) Crear DataFrame con los valores de relleno ---
-    df_missing = pd.DataFrame(valor_relleno, index=new_timestamps, columns=df.columns)
-
-    # --- 5) Unir y reordenar ---
-    df_completo = pd.concat([df, df_missing]).sort_index()
+    # --- 3) Intercalar las filas de relleno en el índice ordenado ---
+    df_completo = _insertar_filas_relleno(df, new_timestamps, valor_relleno)
 
     print(f"⚠️ Se detectaron {len(anomalies)} huecos.")
     print(f"🧩 Se insertaron {total_missing} filas nuevas con el valor {valor_relleno}.")
 
     return df_completo, anomalies
+
+
+def rellenar_timestamps_por_bloques(bloques, resolution=None, valor_relleno=999999.0, margen=0.5):
+    """
+    Modo por bloques de rellenar_timestamps: recibe un iterable de DataFrames
+    consecutivos en el tiempo (índice DatetimeIndex ordenado) y va devolviendo
+    (bloque_rellenado, anomalies_del_bloque). El último timestamp de cada
+    bloque se arrastra al siguiente, así que los huecos en las fronteras
+    entre bloques se detectan igual que en el modo completo. La memoria
+    extra queda acotada por el tamaño del bloque.
+
+    Si no se indica `resolution` se toma la moda del primer bloque no vacío.
+    """
+    prev_ts = None
+    for bloque in bloques:
+        if bloque.empty:
+            continue
+        if resolution is None:
+            resolution = bloque.index.to_series().diff().mode()[0]
+
+        anomalies, nuevos = _detectar_huecos(bloque.index, resolution, margen, prev_ts)
+        if len(nuevos):
+            bloque = _insertar_filas_relleno(bloque, nuevos, valor_relleno)
+        prev_ts = bloque.index[-1]
+        yield bloque, anomalies
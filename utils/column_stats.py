@@ -0,0 +1,126 @@
+# utils/column_stats.py
+import logging
+import pandas as pd
+
+from utils.aggregation_pyramid import VALID_LIMIT, _q
+from utils.gap_index import _value_columns
+
+# -----------------------------------------------------------
+# Estadísticas por columna (<table>__stats), calculadas al construir
+#   - valores válidos (sin sentinelas): count/min/max/mean/std y primer y
+#     último timestamp con dato válido
+#   - nulos y muestras sentinela (relleno 999999.0 / anomalía -999999.0)
+#   - resolución de muestreo del dataset (moda de los deltas, en ms)
+# Todo sale de una sola pasada de agregados sobre la tabla base. ServerDataset
+# las carga una vez por versión: el gráfico y el checklist las consultan
+# como un diccionario, sin recorrer datos.
+# -----------------------------------------------------------
+
+RELLENO, ANOMALIA = 999999.0, -999999.0
+
+
+def column_stats_table(table: str) -> str:
+    return f"{table}__stats"
+
+
+def has_column_stats(con, table: str) -> bool:
+    existing = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+    return column_stats_table(table) in existing
+
+
+def _resolucion_ms(con, table, ts_col):
+    """Moda de los deltas entre timestamps consecutivos (el criterio de rellenar_timestamps)."""
+    res = con.execute(f"""
+        SELECT mode(d) FROM (
+            SELECT epoch_ms({_q(ts_col)}) - lag(epoch_ms({_q(ts_col)})) OVER (ORDER BY {_q(ts_col)}) AS d FROM {table}
+        ) WHERE d > 0
+    """).fetchone()[0]
+    return int(res) if res is not None else None
+
+
+def _aggs(col, ts_col):
+    valid = f"{_q(col)} BETWEEN {-VALID_LIMIT} AND {VALID_LIMIT}"
+    return [
+        f"count({_q(col)}) FILTER (WHERE {valid})",
+        f"count(*) - count({_q(col)})",
+        f"count(*) FILTER (WHERE {_q(col)} = {RELLENO})",
+        f"count(*) FILTER (WHERE {_q(col)} = {ANOMALIA})",
+        f"min({_q(col)}) FILTER (WHERE {valid})",
+        f"max({_q(col)}) FILTER (WHERE {valid})",
+        f"avg({_q(col)}) FILTER (WHERE {valid})",
+        f"stddev_samp({_q(col)}) FILTER (WHERE {valid})",
+        f"min({_q(ts_col)}) FILTER (WHERE {valid})",
+        f"max({_q(ts_col)}) FILTER (WHERE {valid})",
+    ]
+
+
+_CAMPOS = ["n_valid", "n_null", "n_filled", "n_anomalies", "min", "max", "mean", "std", "first_ts", "last_ts"]
+
+
+def build_column_stats(con, table: str, ts_col: str = "Timestamp"):
+    """
+    (Re)construye <table>__stats con una fila por columna de medida:
+    ("column", n_rows, n_valid, n_null, n_filled, n_anomalies, min, max,
+    mean, std, first_ts, last_ts, resolution_ms).
+    """
+    columnas = _value_columns(con, table, ts_col)
+    aggs = [a for c in columnas for a in _aggs(c, ts_col)]
+    fila = con.execute(f"SELECT count(*){''.join(', ' + a for a in aggs)} FROM {table}").fetchone()
+    n_rows, valores = fila[0], fila[1:]
+    resolucion = _resolucion_ms(con, table, ts_col)
+
+    k = len(_CAMPOS)
+    df = pd.DataFrame(
+        [[c, n_rows, *valores[i * k:(i + 1) * k], resolucion] for i, c in enumerate(columnas)],
+        columns=["column", "n_rows", *_CAMPOS, "resolution_ms"],
+    )
+    stats = column_stats_table(table)
+    con.execute(f"DROP TABLE IF EXISTS {stats}")
+    con.execute(f"""
+        CREATE TABLE {stats} (
+            "column" VARCHAR, n_rows BIGINT, n_valid BIGINT, n_null BIGINT, n_filled BIGINT, n_anomalies BIGINT,
+            "min" DOUBLE, "max" DOUBLE, mean DOUBLE, std DOUBLE, first_ts TIMESTAMP, last_ts TIMESTAMP,
+            resolution_ms BIGINT
+        )
+    """)
+    if len(df):
+        con.register("tmp_stats", df)
+        con.execute(f"INSERT INTO {stats} BY NAME SELECT * FROM tmp_stats")
+        con.unregister("tmp_stats")
+    logging.info("📊 Estadísticas de %s: %s columnas (resolución %s ms)", table, len(df), resolucion)
+
+
+def load_column_stats(con, table: str) -> dict:
+    """{columna: {n_valid, min, max, ...}} o {} si el dataset no tiene estadísticas."""
+    if not has_column_stats(con, table):
+        return {}
+    df = con.execute(f"SELECT * FROM {column_stats_table(table)}").df()
+    df = df.astype(object).where(df.notna(), None)
+    return {r.pop("column"): r for r in df.to_dict("records")}
+
+
+def _duracion(ms) -> str:
+    for unidad, factor in (("h", 3_600_000), ("min", 60_000), ("s", 1000)):
+        if ms >= factor:
+            return f"{ms / factor:g} {unidad}"
+    return f"{ms:g} ms"
+
+
+def stats_title(stats: dict) -> str:
+    """Resumen de una columna en una línea (tooltip del checklist)."""
+    if not stats or not stats.get("n_valid"):
+        return "Sin valores válidos"
+    partes = [f"{stats['min']:.6g} … {stats['max']:.6g}", f"media {stats['mean']:.6g}"]
+    if stats.get("std") is not None:
+        partes[-1] += f" ± {stats['std']:.3g}"
+    partes.append(f"{stats['n_valid']} válidos")
+    if stats.get("n_filled"):
+        partes.append(f"{stats['n_filled']} rellenos")
+    if stats.get("n_anomalies"):
+        partes.append(f"{stats['n_anomalies']} anomalías")
+    if stats.get("n_null"):
+        partes.append(f"{stats['n_null']} nulos")
+    partes.append(f"{pd.Timestamp(stats['first_ts']):%Y-%m-%d %H:%M} → {pd.Timestamp(stats['last_ts']):%Y-%m-%d %H:%M}")
+    if stats.get("resolution_ms"):
+        partes.append(f"cada {_duracion(stats['resolution_ms'])}")
+    return " · ".join(partes)
@@ -0,0 +1,42 @@
+# utils/compression.py
+import gzip
+import os
+
+# -----------------------------------------------------------
+# Compresión gzip de las respuestas del servidor Flask (callbacks de Dash,
+# layout, /metrics). Sin dependencias extra: gzip de la librería estándar.
+#   - solo si el navegador envía Accept-Encoding: gzip
+#   - solo respuestas 200 de texto/JSON por encima de HTTP_GZIP_MIN_BYTES
+#   - HTTP_GZIP_LEVEL=0 la desactiva (p.ej. si ya comprime un proxy delante)
+# -----------------------------------------------------------
+
+_COMPRIMIBLES = ("application/json", "text/", "application/javascript")
+
+
+def register_compression(server, level: int = None, min_bytes: int = None):
+    level = int(os.environ.get("HTTP_GZIP_LEVEL", 5) if level is None else level)
+    min_bytes = int(os.environ.get("HTTP_GZIP_MIN_BYTES", 1024) if min_bytes is None else min_bytes)
+    if level <= 0:
+        return server
+
+    from flask import request
+
+    @server.after_request
+    def _gzip(response):
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or "gzip" not in request.headers.get("Accept-Encoding", "").lower()
+            or not (response.mimetype or "").startswith(_COMPRIMIBLES)
+        ):
+            return response
+        data = response.get_data()
+        if len(data) < min_bytes:
+            return response
+        response.set_data(gzip.compress(data, compresslevel=level))
+        response.headers["Content-Encoding"] = "gzip"
+        response.headers.add("Vary", "Accept-Encoding")
+        return response
+
+    return server
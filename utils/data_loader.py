@@ -12,7 +12,21 @@ from utils.clean_functions._2_clean_and_unify_duplicatses import clean_and_unify
 from utils.clean_functions._3_negative_frec import negative_freq_report
 from utils.clean_functions._4_missing_data import rellenar_timestamps
 from utils.clean_functions._5_nomalizar_timestamps import normalize_timestamp_column
-
+from utils.metrics import PIPELINE_ROWS, PIPELINE_SECONDS, StepTimer
+from utils.pipeline_executor import resolve_steps, run_pipeline
+from utils.sql_pipeline import run_sql_pipeline
+from utils.streaming_pipeline import STREAMING_CHUNK_ROWS, run_streaming_pipeline, streaming_config
+
+
+# implementación por defecto de los pasos conocidos si el YAML no trae module/func
+_LEGACY_FUNCTIONS = {
+    "merge_all_datasets": merge_all_datasets,
+    "load_and_process_data": load_and_process_data,
+    "clean_and_unify_duplicates": clean_and_unify_duplicates,
+    "negative_freq_report": negative_freq_report,
+    "rellenar_timestamps": rellenar_timestamps,
+    "normalize_timestamp_column": normalize_timestamp_column,
+}
 
 # ...existing code...
 
@@ -33,95 +47,100 @@ def _available_functions_map(pipeline: dict) -> dict:
     return out
 
 
-def cargar_dataset_completo(pattern_csv: str, pipelineCleanData: dict, timestamp_col: str = "Timestamp") -> pd.DataFrame:
+def cargar_dataset_completo(pattern_csv: str, pipelineCleanData: dict, timestamp_col: str = "Timestamp",
+                            progress=None, checkpoint_dir: Path = None) -> pd.DataFrame:
     """
     Carga, unifica y limpia todos los datasets CSV siguiendo la pipeline completa.
     Cada paso se ejecuta solo si está presente en pipelineCleanData.available_functions
     y su campo enabled es True. Si falta en la lista, se salta.
+    Los pasos se resuelven con su module/func y se encadenan en el orden del YAML
+    (utils/pipeline_executor.py). Con `checkpoint_dir` la salida de cada paso se
+    guarda en Parquet y una nueva ejecución arranca desde el último paso sin cambios
+    (pipelineCleanData.checkpoint: false lo desactiva).
+    Si se pasa `progress`, se llama con el nombre de cada paso antes de ejecutarlo
+    (lo usan los trabajos de construcción en segundo plano para informar a la UI).
     """
+    # cada paso se cronometra hasta que empieza el siguiente (métricas /metrics)
+    progress = StepTimer(PIPELINE_SECONDS, forward=progress)
     # normalizar lista de ficheros
     if isinstance(pattern_csv, str):
         csv_list = [pattern_csv]
     else:
         csv_list = list(pattern_csv)
 
+    def leer_csvs():
+        dfs = [pd.read_csv(p, parse_dates=[timestamp_col]) for p in csv_list]
+        return pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
+
     # si pipeline deshabilitada -> carga simple
     if not pipelineCleanData or pipelineCleanData.get("run_enabled", True) is False:
         logging.info("⚠️ Pipeline de limpieza deshabilitada, se carga solo el CSV sin limpiar")
-        dfs = [pd.read_csv(p, parse_dates=[timestamp_col]) for p in csv_list]
-        df = pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
+        progress("read_csv")
+        df = leer_csvs()
+        progress.close()
+        PIPELINE_ROWS.observe(len(df))
         return df
 
     logging.info("🔹 Ejecutando pipeline de limpieza según configuración")
-    funcs_map = _available_functions_map(pipelineCleanData)
-
-    df = None
-    # Paso 0: merge_all_datasets
-    if funcs_map.get("merge_all_datasets", {}).get("enabled", False):
-        logging.info("Ejecutando merge_all_datasets")
-        df = merge_all_datasets(csv_list, year_filter=None)
-        logging.info(f"✔️ [0] merge_all_datasets: {len(df)} filas, {len(df.columns)} columnas")
-    else:
-        logging.debug("merge_all_datasets no configurado/disabled -> se salta")
-
-    # Paso 1: load_and_process_data
-    if funcs_map.get("load_and_process_data", {}).get("enabled", False):
-        if df is None:
-            # cargar raw si no existe df
-            dfs = [pd.read_csv(p, parse_dates=[timestamp_col]) for p in csv_list]
-            df = pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
-        logging.info("Ejecutando load_and_process_data")
-        df = load_and_process_data(df)
-        logging.info(f"✔️ [1] load_and_process_data: {len(df)} filas, {len(df.columns)} columnas")
-    else:
-        logging.debug("load_and_process_data no configurado/disabled -> se salta")
-
-    # Paso 2: clean_and_unify_duplicates
-    if funcs_map.get("clean_and_unify_duplicates", {}).get("enabled", False):
-        if df is None:
-            dfs = [pd.read_csv(p, parse_dates=[timestamp_col]) for p in csv_list]
-            df = pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
-        logging.info("✔️ [2] Ejecutando clean_and_unify_duplicates")
-        df = clean_and_unify_duplicates(df, "MergedDataset")
-    else:
-        logging.debug("clean_and_unify_duplicates no configurado/disabled -> se salta")
-
-    # Paso 3: negative_freq_report
-    if funcs_map.get("negative_freq_report", {}).get("enabled", False):
-        if df is None:
-            dfs = [pd.read_csv(p, parse_dates=[timestamp_col]) for p in csv_list]
-            df = pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
-        logging.info("✔️ [3] Ejecutando negative_freq_report")
-        df = negative_freq_report(df)
-    else:
-        logging.debug("negative_freq_report no configurado/disabled -> se salta")
-
-    # Paso 4: rellenar_timestamps
-    anomalies = []
-    if funcs_map.get("rellenar_timestamps", {}).get("enabled", False):
-        if df is None:
-            dfs = [pd.read_csv(p, parse_dates=[timestamp_col]) for p in csv_list]
-            df = pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
-        logging.info("✔️ [4] Ejecutando rellenar_timestamps")
-        df, anomalies = rellenar_timestamps(df)
-    else:
-        logging.debug("rellenar_timestamps no configurado/disabled -> se salta")
-
-    # Paso 5: normalize_timestamp_column
-    if funcs_map.get("normalize_timestamp_column", {}).get("enabled", False):
-        if df is None:
-            dfs = [pd.read_csv(p, parse_dates=[timestamp_col]) for p in csv_list]
-            df = pd.concat(dfs, ignore_index=True) if len(dfs) > 1 else dfs[0]
-        logging.info("✔️ [5] Ejecutando normalize_timestamp_column")
-        df = normalize_timestamp_column(df, timestamp_col)
-    else:
-        logging.debug("normalize_timestamp_column no configurado/disabled -> se salta")
+    steps = resolve_steps(_available_functions_map(pipelineCleanData), legacy=_LEGACY_FUNCTIONS)
+    if pipelineCleanData.get("checkpoint", True) is False:
+        checkpoint_dir = None
+    df = run_pipeline(csv_list, steps, timestamp_col, leer_csvs, progress=progress, checkpoint_dir=checkpoint_dir)
+    progress.close()
 
     if df is None:
         raise RuntimeError("La pipeline no generó DataFrame válido.")
+    PIPELINE_ROWS.observe(len(df))
 
     logging.info("✅ Pipeline de carga completada")
     logging.info(f"📈 Tamaño final: {len(df)} filas, {len(df.columns)} columnas")
-    logging.info(f"⚠️ Huecos detectados: {len(anomalies)}")
 
-    return df
\ No newline at end of file
+    return df
+
+
+def cargar_dataset_streaming(con, table: str, pattern_csv, pipelineCleanData: dict,
+                             timestamp_col: str = "Timestamp", progress=None) -> int:
+    """
+    Variante fuera de memoria de cargar_dataset_completo
+    (pipelineCleanData.streaming): los mismos pasos del YAML sobre bloques
+    ordenados en el tiempo, escribiendo cada bloque directamente en la tabla
+    `table` de `con` (utils/streaming_pipeline.py). Sin checkpoints: la
+    salida ya queda en DuckDB. Devuelve el número de filas escritas.
+    """
+    progress = StepTimer(PIPELINE_SECONDS, forward=progress)
+    csv_list = [pattern_csv] if isinstance(pattern_csv, str) else list(pattern_csv)
+    cfg = streaming_config(pipelineCleanData) or {}
+
+    if pipelineCleanData.get("run_enabled", True) is False:
+        steps = []
+    else:
+        steps = resolve_steps(_available_functions_map(pipelineCleanData), legacy=_LEGACY_FUNCTIONS)
+    filas = run_streaming_pipeline(
+        con, table, csv_list, steps, timestamp_col,
+        chunk_rows=cfg.get("chunk_rows", STREAMING_CHUNK_ROWS),
+        resolution=cfg.get("resolution"),
+        progress=progress,
+    )
+    progress.close()
+    PIPELINE_ROWS.observe(filas)
+    return filas
+
+
+def cargar_dataset_sql(con, table: str, pattern_csv, pipelineCleanData: dict,
+                       timestamp_col: str = "Timestamp", progress=None) -> int:
+    """
+    Backend DuckDB de la pipeline (pipelineCleanData.backend: duckdb): los
+    pasos del YAML se traducen a SQL sobre read_csv de los ficheros y el
+    resultado se escribe en la tabla `table` de `con` sin pasar por pandas
+    (utils/sql_pipeline.py). Devuelve el número de filas escritas.
+    """
+    progress = StepTimer(PIPELINE_SECONDS, forward=progress)
+    csv_list = [pattern_csv] if isinstance(pattern_csv, str) else list(pattern_csv)
+    if pipelineCleanData.get("run_enabled", True) is False:
+        steps = []
+    else:
+        steps = resolve_steps(_available_functions_map(pipelineCleanData), legacy=_LEGACY_FUNCTIONS)
+    filas = run_sql_pipeline(con, table, csv_list, steps, timestamp_col, progress=progress)
+    progress.close()
+    PIPELINE_ROWS.observe(filas)
+    return filas
@@ -6,14 +6,59 @@ import pandas as pd
 import yaml
 
 from utils.helpers import load_config
-from utils.data_loader import cargar_dataset_completo
+from utils.data_loader import cargar_dataset_completo, cargar_dataset_sql, cargar_dataset_streaming, _available_functions_map
+from utils.aggregation_pyramid import build_pyramid, has_pyramid, load_pyramid_meta, refresh_pyramid
+from utils.ingest_manifest import (
+    has_manifest,
+    manifest_spans,
+    pending_files,
+    changed_files,
+    record_files,
+    file_time_span,
+    overlapping_files,
+)
+from utils.clean_functions._4_missing_data import timestamps_faltantes
+from utils.clean_functions._5_nomalizar_timestamps import normalize_timestamp_column
+from utils.column_stats import build_column_stats, has_column_stats, load_column_stats
+from utils.duckdb_pool import read_connection
+from utils.dtype_plan import apply_dtype_plan, apply_plan_to_frame, has_dtype_plan, load_dtype_plan, plan_dtypes, widen_for_frame
+from utils.event_store import (
+    build_event_store,
+    check_event_codes,
+    dense_events,
+    event_code_map,
+    has_event_store,
+    is_event_storage,
+    present_codes,
+)
+from utils.gap_index import build_gap_index, has_gap_index, refresh_gap_index
+from utils.option_catalog import OptionCatalog
+from utils.partitions import partitions_dir, list_partitions, partitions_in_range, write_partitions, read_partition
+from utils.pipeline_executor import CHECKPOINT_DIR
+from utils.metrics import QUERY_SECONDS, register_cache, timed, timed_query
+from utils.ram_cache import RamCache
+from utils.shared_store import SharedStore, current_store_version, has_shared_store, write_shared_store
+from utils.sql_pipeline import pipeline_backend
+from utils.streaming_pipeline import streaming_config
 
 logger = logging.getLogger(__name__)
 
 # -----------------------------------------------------------
-# RAM cache global
+# RAM cache global (LRU con presupuesto en bytes, RAM_CACHE_BUDGET_MB)
+#   clave nombre            -> DF completo (load_full_df_to_ram)
+#   clave (nombre, 'YYYY-MM' | None, columna) -> una columna de una partición
+#                              (o de la tabla entera) pedida por ServerDataset
+# Lo expulsado se vuelve a leer de DuckDB/particiones al pedirlo.
+# Con almacén compartido (processed/shared/) los datos no pasan por aquí:
+# ServerDataset los lee de columnas mapeadas en memoria, comunes a todos
+# los workers.
 # -----------------------------------------------------------
-RAM_DATASETS: dict[str, pd.DataFrame] = {}
+RAM_DATASETS = RamCache()
+register_cache("datasets", RAM_DATASETS.stats)
+# versión del fichero DuckDB con la que se cargó cada DF en RAM
+RAM_VERSIONS: dict[str, str] = {}
+# vistas de servidor por dataset (se recrean al cambiar la versión)
+SERVER_DATASETS: dict = {}
 
 # -----------------------------------------------------------
 # ESCANEAR DATASETS
@@ -53,12 +98,16 @@ def scan_datasets(base_dir: Path):
 
         duckdb_path = processed_dir / f"{ds_dir.name}.duckdb"
 
+        dataset_type = cfg["metadata"].get("type", "TabularDataSet")
         datasets[ds_dir.name] = {
             "path": ds_dir,
             "config": config_file,
             "components": components,
             "duckdb": duckdb_path,
-            "type": cfg["metadata"].get("type", "TabularDataSet"),
+            "type": dataset_type,
+            # EventEncoded se guarda por defecto como registro (ts, código)
+            "storage": cfg["metadata"].get("storage", "events" if dataset_type == "EventEncodedDataSet" else "table"),
+            "dictionary": cfg["metadata"].get("dictionary"),
             "table_name": ds_dir.name.replace("-", "_").lower(),
             "pipelineCleanData": cfg.get("pipelineCleanData", {}),
         }
@@ -70,6 +119,10 @@ def scan_datasets(base_dir: Path):
 # Conexión DuckDB
 # -----------------------------------------------------------
 def get_duckdb_con(path: Path):
+    """
+    Conexión de lectura/escritura: solo para construcciones (sobre la copia
+    staging). Los callbacks leen con read_connection (utils/duckdb_pool.py).
+    """
     path.parent.mkdir(exist_ok=True, parents=True)
     return duckdb.connect(str(path))
 
@@ -77,11 +130,16 @@ def get_duckdb_con(path: Path):
 # -----------------------------------------------------------
 # PIPELINE REAL → cargar_dataset_completo
 # -----------------------------------------------------------
-def load_processed_or_build(con, dataset_info: dict, config: dict):
+def load_processed_or_build(con, dataset_info: dict, config: dict, progress=None):
     """
     Si DuckDB ya tiene la tabla → usarla.
     Si no → ejecutar tu pipeline REAL y guardarla.
+    En ambos casos se asegura la pirámide de agregados (<table>__lvlN), el
+    índice de tramos sentinela (<table>__gaps) y las estadísticas por
+    columna (<table>__stats).
+    `progress(paso)` se llama al empezar cada paso (pipeline y derivados).
     """
+    progress = progress or (lambda paso: None)
     table = dataset_info["table_name"]
     duckdb_path = dataset_info["duckdb"]
     raw_dir = dataset_info["path"] / "raw"
@@ -95,50 +153,469 @@ def load_processed_or_build(con, dataset_info: dict, config: dict):
     # 1) comprobar si tabla existe
     try:
         existing = con.execute("SHOW TABLES").fetchall()
-        if (table,) in existing:
-            df_sample = con.execute(f"SELECT * FROM {table} LIMIT 5").df()
-            cols = [c for c in df_sample.columns if c != "Timestamp"]
-            return df_sample, cols
     except Exception:
-        pass
+        existing = []
 
-    # 2) pipeline REAL
     csv_files = sorted(raw_dir.glob("*.csv"))
+
+    if is_event_storage(dataset_info):
+        return _load_or_build_events(con, dataset_info, csv_files, progress)
+
+    if (table,) in existing:
+        if not has_manifest(con, table):
+            # tabla construida antes del manifest: se da por ingerido lo que hay en raw/
+            record_files(con, table, csv_files)
+        else:
+            pendientes = pending_files(con, table, csv_files)
+            if pendientes:
+                _ingest_incremental(con, dataset_info, config, pendientes, progress)
+        if not has_dtype_plan(con, table):
+            # tabla anterior al plan de tipos: compactar y rehacer las copias derivadas
+            progress("compact_dtypes")
+            _compactar_tipos(con, dataset_info)
+            write_partitions(con, table, partitions_dir(dataset_info))
+            write_shared_store(con, table, dataset_info)
+        if not has_pyramid(con, table):
+            progress("build_pyramid")
+            build_pyramid(con, table)
+        if not has_gap_index(con, table):
+            progress("build_gap_index")
+            build_gap_index(con, table)
+        if not has_column_stats(con, table):
+            progress("build_column_stats")
+            build_column_stats(con, table)
+        if not list_partitions(partitions_dir(dataset_info)):
+            progress("write_partitions")
+            write_partitions(con, table, partitions_dir(dataset_info))
+        if not has_shared_store(dataset_info):
+            progress("write_shared_store")
+            write_shared_store(con, table, dataset_info)
+        df_sample = con.execute(f"SELECT * FROM {table} LIMIT 5").df()
+        cols = [c for c in df_sample.columns if c != "Timestamp"]
+        return df_sample, cols
+
+    # 2) pipeline REAL
     if not csv_files:
         raise RuntimeError(f"No hay CSVs en {raw_dir}")
 
-    df = cargar_dataset_completo(
-        [str(f) for f in csv_files],
-        pipelineCleanData=config.get("pipelineCleanData", {}),
-        timestamp_col="Timestamp"
-    )
+    pipeline = config.get("pipelineCleanData", {})
+    if pipeline_backend(pipeline) == "duckdb":
+        # 2-3) backend SQL: la pipeline entera en DuckDB sobre read_csv
+        filas = cargar_dataset_sql(con, table, [str(f) for f in csv_files], pipeline,
+                                   timestamp_col="Timestamp", progress=progress)
+        if not filas:
+            raise RuntimeError("Pipeline devolvió vacío")
+    elif streaming_config(pipeline):
+        # 2-3) modo streaming: bloques ordenados en el tiempo directos a DuckDB
+        filas = cargar_dataset_streaming(con, table, [str(f) for f in csv_files], pipeline,
+                                         timestamp_col="Timestamp", progress=progress)
+        if not filas:
+            raise RuntimeError("Pipeline devolvió vacío")
+    else:
+        df = cargar_dataset_completo(
+            [str(f) for f in csv_files],
+            pipelineCleanData=pipeline,
+            timestamp_col="Timestamp",
+            progress=progress,
+            checkpoint_dir=dataset_info.get("checkpoint_dir") or Path(duckdb_path).parent / CHECKPOINT_DIR,
+        )
+
+        if df is None or df.empty:
+            raise RuntimeError("Pipeline devolvió vacío")
+
+        # 3) guardar en DuckDB
+        progress("duckdb_table")
+        con.execute(f"DROP TABLE IF EXISTS {table}")
+        con.register("tmp_df", df)
+        con.execute(f"CREATE TABLE {table} AS SELECT * FROM tmp_df")
+        con.unregister("tmp_df")
+        del df
 
-    if df is None or df.empty:
-        raise RuntimeError("Pipeline devolvió vacío")
+    # 3b) tipos compactos (declarados en el YAML de componentes o inferidos)
+    progress("compact_dtypes")
+    _compactar_tipos(con, dataset_info)
 
-    # 3) guardar en DuckDB
-    con.execute(f"DROP TABLE IF EXISTS {table}")
-    con.register("tmp_df", df)
-    con.execute(f"CREATE TABLE {table} AS SELECT * FROM tmp_df")
-    con.unregister("tmp_df")
+    # 4) pirámide multi-resolución e índice de tramos sentinela para el gráfico
+    progress("build_pyramid")
+    build_pyramid(con, table)
+    progress("build_gap_index")
+    build_gap_index(con, table)
 
-    df_sample = df.head(5)
-    cols = [c for c in df.columns if c != "Timestamp"]
+    # 4b) estadísticas por columna (rango válido, sentinelas, resolución)
+    progress("build_column_stats")
+    build_column_stats(con, table)
+
+    # 5) manifest de ficheros ingeridos (para ingestas incrementales)
+    record_files(con, table, csv_files)
+
+    # 6) particiones año/mes en Parquet para carga perezosa por ventana
+    progress("write_partitions")
+    write_partitions(con, table, partitions_dir(dataset_info))
+
+    # 7) almacén de columnas mapeado en memoria, compartido entre workers
+    progress("write_shared_store")
+    write_shared_store(con, table, dataset_info)
+
+    df_sample = con.execute(f"SELECT * FROM {table} LIMIT 5").df()
+    cols = [c for c in df_sample.columns if c != "Timestamp"]
     return df_sample, cols
 
 
+def _load_or_build_events(con, dataset_info: dict, csv_files, progress):
+    """
+    Modo registro de eventos: <table>__events(ts, code) directamente desde los
+    CSV con DuckDB (sin pipeline de limpieza ni derivados por columna). Si hay
+    ficheros nuevos o modificados se recarga el registro entero, que escala
+    con el número de eventos.
+    """
+    table = dataset_info["table_name"]
+    if not csv_files:
+        raise RuntimeError(f"No hay CSVs en {dataset_info['path'] / 'raw'}")
+    if not has_event_store(con, table) or pending_files(con, table, csv_files):
+        progress("build_event_store")
+        check_event_codes(dataset_info)
+        build_event_store(con, table, csv_files)
+        record_files(con, table, csv_files)
+    df_sample = con.execute(f"SELECT * FROM {table} LIMIT 5").df()
+    return df_sample, [c for c in df_sample.columns if c != "Timestamp"]
+
+
+def _compactar_tipos(con, dataset_info: dict):
+    table = dataset_info["table_name"]
+    plan = plan_dtypes(con, table, dataset_info.get("components"), dataset_info.get("type"))
+    apply_dtype_plan(con, table, plan)
+
+
+def dataset_needs_build(con, dataset_info: dict) -> bool:
+    """
+    True si load_processed_or_build tendría trabajo que hacer: falta la
+    tabla, hay CSV nuevos/modificados en raw/ o falta algún derivado.
+    Solo lee (sin hash ni escrituras), pensado para llamarse en un request.
+    """
+    table = dataset_info["table_name"]
+    existing = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+    if table not in existing:
+        return True
+    if is_event_storage(dataset_info):
+        return not has_event_store(con, table) or bool(
+            changed_files(con, table, sorted((dataset_info["path"] / "raw").glob("*.csv")))
+        )
+    if changed_files(con, table, sorted((dataset_info["path"] / "raw").glob("*.csv"))):
+        return True
+    return not (
+        has_dtype_plan(con, table)
+        and has_pyramid(con, table)
+        and has_gap_index(con, table)
+        and has_column_stats(con, table)
+        and list_partitions(partitions_dir(dataset_info))
+        and has_shared_store(dataset_info)
+    )
+
+
+# -----------------------------------------------------------
+# Ingesta incremental (ficheros nuevos o modificados en raw/)
+# -----------------------------------------------------------
+def _ingest_incremental(con, dataset_info: dict, config: dict, pendientes, progress=None):
+    """
+    Pasa por la pipeline solo los CSV nuevos/modificados (más los ya ingeridos
+    cuyo rango temporal los solapa, para que la unificación de duplicados sea
+    correcta) y sustituye ese tramo en la tabla. El relleno de huecos se
+    rehace solo en las costuras entre datos viejos y nuevos.
+    """
+    progress = progress or (lambda paso: None)
+    table = dataset_info["table_name"]
+    pipeline = config.get("pipelineCleanData", {})
+    logging.info("📥 Ingesta incremental de %s: %s ficheros nuevos/modificados", table, len(pendientes))
+
+    # 1) ventana temporal afectada (cierre transitivo sobre ficheros solapados).
+    #    Incluye el rango anterior de los ficheros modificados: si ahora
+    #    cubren menos, sus filas viejas fuera del rango nuevo también se borran
+    spans = [s for s in (file_time_span(f) for f in pendientes) if s[0] is not None]
+    spans += list(manifest_spans(con, table, pendientes).values())
+    if not spans:
+        record_files(con, table, pendientes)
+        return
+    lo, hi = min(s[0] for s in spans), max(s[1] for s in spans)
+    ficheros = {str(Path(f).resolve()) for f in pendientes}
+    while True:
+        extra = [(p, a, b) for p, a, b in overlapping_files(con, table, lo, hi) if p not in ficheros]
+        if not extra:
+            break
+        for p, a, b in extra:
+            ficheros.add(p)
+            if not Path(p).exists():
+                logging.warning("Fichero del manifest ya no existe, se omite: %s", p)
+                continue
+            lo, hi = min(lo, a), max(hi, b)
+    ficheros_existentes = sorted(f for f in ficheros if Path(f).exists())
+
+    # 2) pipeline solo sobre esos ficheros
+    df_new = cargar_dataset_completo(ficheros_existentes, pipelineCleanData=pipeline, timestamp_col="Timestamp",
+                                     progress=progress)
+    df_new = normalize_timestamp_column(df_new, "Timestamp")
+    if df_new is None or df_new.empty:
+        record_files(con, table, ficheros_existentes)
+        return
+    lo, hi = min(lo, df_new["Timestamp"].min()), max(hi, df_new["Timestamp"].max())
+
+    # 3) relleno de huecos solo en las costuras viejo/nuevo
+    if _available_functions_map(pipeline).get("rellenar_timestamps", {}).get("enabled", False):
+        df_new = _rellenar_costuras(con, table, df_new, lo, hi)
+        # las filas de relleno de las costuras caen fuera de [lo, hi]: la
+        # ventana a sustituir y refrescar (pirámide, huecos, particiones) las incluye
+        lo, hi = min(lo, df_new["Timestamp"].min()), max(hi, df_new["Timestamp"].max())
+
+    # 4) sustituir el tramo en la tabla y refrescar derivados
+    progress("incremental_merge")
+    table_cols = [r[0] for r in con.execute(f"DESCRIBE {table}").fetchall()]
+    con.execute("BEGIN TRANSACTION")
+    try:
+        for c in df_new.columns:
+            if c not in table_cols:
+                con.execute(f'ALTER TABLE {table} ADD COLUMN "{c}" DOUBLE')
+        widen_for_frame(con, table, df_new)
+        con.execute(f"DELETE FROM {table} WHERE Timestamp BETWEEN ? AND ?", [lo, hi])
+        con.register("tmp_df", df_new)
+        con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM tmp_df")
+        con.unregister("tmp_df")
+        record_files(con, table, ficheros_existentes)
+        refresh_pyramid(con, table, lo, hi)
+        refresh_gap_index(con, table, lo, hi)
+        # min/max/std no se pueden restar: una pasada de agregados sobre la tabla
+        build_column_stats(con, table)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+
+    progress("write_partitions")
+    write_partitions(con, table, partitions_dir(dataset_info), lo, hi)
+    progress("write_shared_store")
+    write_shared_store(con, table, dataset_info)
+
+    logging.info("✅ Ingesta incremental de %s: %s filas en [%s, %s]", table, len(df_new), lo, hi)
+
+
+def _rellenar_costuras(con, table: str, df_new: pd.DataFrame, lo, hi, valor_relleno=999999.0, margen=0.5):
+    """Inserta filas de relleno entre la última fila vieja anterior a `lo` y la primera nueva (y simétrico al final)."""
+    meta = load_pyramid_meta(con, table)
+    if meta is not None and not meta.empty:
+        resolution = pd.Timedelta(milliseconds=int(meta["bucket_ms"].iloc[0]))
+    else:
+        resolution = df_new["Timestamp"].sort_values().diff().mode()[0]
+
+    prev_ts = con.execute(f"SELECT max(Timestamp) FROM {table} WHERE Timestamp < ?", [lo]).fetchone()[0]
+    next_ts = con.execute(f"SELECT min(Timestamp) FROM {table} WHERE Timestamp > ?", [hi]).fetchone()[0]
+
+    costuras = []
+    if prev_ts is not None:
+        costuras.append((prev_ts, df_new["Timestamp"].min()))
+    if next_ts is not None:
+        costuras.append((df_new["Timestamp"].max(), next_ts))
+    if not costuras:
+        return df_new
+
+    nuevos = timestamps_faltantes([a for a, _ in costuras], [b for _, b in costuras], resolution, margen)
+    if len(nuevos) == 0:
+        return df_new
+
+    value_cols = [c for c in df_new.columns if c != "Timestamp"]
+    df_fill = pd.DataFrame(valor_relleno, index=range(len(nuevos)), columns=value_cols)
+    df_fill.insert(0, "Timestamp", nuevos)
+    logging.info("🧩 Costuras de %s: %s filas de relleno", table, len(nuevos))
+    return pd.concat([df_new, df_fill], ignore_index=True).sort_values("Timestamp", kind="mergesort")
+
+
 # -----------------------------------------------------------
 # RAM load
 # -----------------------------------------------------------
 def load_full_df_to_ram(dataset_name: str, dataset_info: dict):
     logging.info("Loading DF to RAM: %s", dataset_name)
-    con = get_duckdb_con(dataset_info["duckdb"])
     table = dataset_info["table_name"]
 
-    df = con.execute(f"SELECT * FROM {table}").df()
+    with read_connection(dataset_info["duckdb"]) as con:
+        df = timed_query("full_table", lambda: con.execute(f"SELECT * FROM {table} ORDER BY Timestamp").df(), table)
+        df = apply_plan_to_frame(df, load_dtype_plan(con, table))
     RAM_DATASETS[dataset_name] = df
+    RAM_VERSIONS[dataset_name] = get_dataset_version(dataset_info)
     return df
 
 
-def get_ram_df(dataset_name: str):
-    return RAM_DATASETS.get(dataset_name)
+def get_ram_df(dataset_name: str, dataset_info: dict = None):
+    """DF completo en RAM; si no está (o se expulsó) y se pasa dataset_info, se recarga de DuckDB."""
+    df = RAM_DATASETS.get(dataset_name)
+    if df is None and dataset_info is not None:
+        df = load_full_df_to_ram(dataset_name, dataset_info)
+    return df
+
+
+def ram_cache_stats() -> dict:
+    """Contadores de la caché RAM (aciertos, fallos, expulsiones, bytes)."""
+    return RAM_DATASETS.stats()
+
+
+# -----------------------------------------------------------
+# Handles de dataset (lo único que viaja al navegador)
+# -----------------------------------------------------------
+def get_dataset_version(dataset_info: dict) -> str:
+    """
+    Token de versión del dataset procesado: cambia cada vez que se
+    reescribe el fichero DuckDB (mtime + tamaño).
+    """
+    duckdb_path = Path(dataset_info["duckdb"])
+    if not duckdb_path.exists():
+        return "0"
+    st = duckdb_path.stat()
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def make_dataset_handle(dataset_name: str, dataset_info: dict) -> dict:
+    """Handle ligero para dcc.Store: nombre del dataset + token de versión."""
+    return {"dataset": dataset_name, "version": get_dataset_version(dataset_info)}
+
+
+def resolve_dataset_handle(handle: dict, datasets: dict):
+    """
+    Resuelve un handle a la vista de servidor del dataset (ServerDataset),
+    sin serializar nada. Si el fichero DuckDB cambió de versión, o el puntero
+    del almacén compartido apunta a otra versión (reconstrucción hecha por
+    otro proceso), la vista y las particiones en RAM de ese dataset se
+    descartan y se recrean.
+    """
+    if not handle:
+        return None
+
+    dataset_name = handle.get("dataset")
+    dataset_info = datasets.get(dataset_name)
+    if dataset_info is None:
+        logging.warning("Handle con dataset desconocido: %s", dataset_name)
+        return None
+
+    ds = SERVER_DATASETS.get(dataset_name)
+    if (
+        ds is None
+        or ds.version != get_dataset_version(dataset_info)
+        or ds.store_version != current_store_version(dataset_info)
+    ):
+        _purge_ram(dataset_name)
+        ds = ServerDataset(dataset_name, dataset_info)
+        SERVER_DATASETS[dataset_name] = ds
+    return ds
+
+
+def _purge_ram(dataset_name: str):
+    """Quita de RAM_DATASETS el DF completo y las particiones de un dataset."""
+    for key in list(RAM_DATASETS.keys()):
+        if key == dataset_name or (isinstance(key, tuple) and key[0] == dataset_name):
+            del RAM_DATASETS[key]
+    RAM_VERSIONS.pop(dataset_name, None)
+
+
+class ServerDataset:
+    """
+    Vista en el servidor de un dataset procesado. Al crearse solo lee
+    metadatos (columnas, rango temporal), así que cambiar de dataset no
+    depende de lo ancho que sea. Los datos crudos de un tramo a resolución
+    completa se piden por columnas: salen del almacén compartido
+    (processed/shared/, columnas .npy mapeadas en memoria, sin copia por
+    worker) o, si no existe, de las particiones mensuales de
+    processed/partitions/ (o de la tabla DuckDB), leyendo solo Timestamp y la
+    columna pedida y guardando cada columna en RAM_DATASETS con clave
+    (dataset, 'YYYY-MM', columna). Las vistas gruesas salen de la pirámide.
+    """
+
+    def __init__(self, dataset_name: str, dataset_info: dict):
+        self.name = dataset_name
+        self.info = dataset_info
+        self.table = dataset_info["table_name"]
+        self.version = get_dataset_version(dataset_info)
+        self.partitions_dir = partitions_dir(dataset_info)
+        self.partitions = list_partitions(self.partitions_dir)
+        self.store_version = current_store_version(dataset_info)
+        self.store = None
+        if self.store_version is not None:
+            try:
+                self.store = SharedStore(dataset_info, self.store_version)
+            except FileNotFoundError:
+                logging.warning("Almacén compartido %s de %s incompleto, se usan particiones",
+                                self.store_version, dataset_name)
+
+        self.is_event_log = is_event_storage(dataset_info)
+        self.event_codes = {}
+        with read_connection(dataset_info["duckdb"]) as con, timed(QUERY_SECONDS, query="metadata", dataset=self.table):
+            self.columns = [r[0] for r in con.execute(f"DESCRIBE {self.table}").fetchall()]
+            self.dtype_plan = load_dtype_plan(con, self.table)
+            self.stats = load_column_stats(con, self.table)
+            if self.is_event_log:
+                # columnas = opciones 'comp::grupo::columna' con eventos en el registro
+                presentes = set(present_codes(con, self.table))
+                self.event_codes = {k: c for k, c in event_code_map(dataset_info.get("components")).items() if c in presentes}
+                self.columns = ["Timestamp", *self.event_codes]
+            self.t_min, self.t_max, self.n_rows = con.execute(
+                f"SELECT min(Timestamp), max(Timestamp), count(*) FROM {self.table}"
+            ).fetchone()
+        # opciones del checklist con índices por componente/tipo (una vez por versión)
+        self.options = OptionCatalog(dataset_info.get("components"), dataset_info.get("type"), self.columns, self.stats)
+        RAM_VERSIONS[dataset_name] = self.version
+
+    def window_key(self, x_min=None, x_max=None) -> tuple:
+        """Particiones que solapan la ventana (identifica el tramo cargado)."""
+        return tuple(partitions_in_range(x_min, x_max, self.partitions))
+
+    def window(self, x_min=None, x_max=None, columns=None) -> pd.DataFrame:
+        """
+        DF con Timestamp y `columns` (todas si None) en las particiones que
+        solapan [x_min, x_max]. Solo se leen las columnas que no estén ya en
+        la caché.
+        """
+        columnas = [c for c in (self.columns if columns is None else columns) if c != "Timestamp" and c in self.columns]
+
+        if self.is_event_log:
+            # columnas 0/1 reconstruidas solo para los códigos y el tramo pedidos
+            with read_connection(self.info["duckdb"]) as con:
+                codigos = {c: self.event_codes[c] for c in columnas}
+                return timed_query("dense_events", lambda: dense_events(con, self.table, codigos, x_min, x_max), self.table)
+
+        if self.store is not None:
+            # mismos límites que window_key: meses completos que solapan la ventana
+            if x_min is None or x_max is None:
+                return self.store.slice(columns=columnas)
+            return self.store.slice(
+                pd.Timestamp(x_min).to_period("M").start_time,
+                pd.Timestamp(x_max).to_period("M").end_time,
+                columns=columnas,
+            )
+
+        # sin particiones escritas: columnas de la tabla entera (clave None)
+        keys = self.window_key(x_min, x_max) if self.partitions else (None,)
+        frames = []
+        for key in keys:
+            partes = {c: self._column(key, c) for c in ["Timestamp", *columnas]}
+            if len(partes["Timestamp"]):
+                frames.append(pd.DataFrame(partes, copy=False))
+        if not frames:
+            return pd.DataFrame(columns=["Timestamp", *columnas])
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    def _column(self, key, col: str) -> pd.Series:
+        """Una columna de una partición (o de la tabla si key es None), cacheada por separado."""
+        clave = (self.name, key, col)
+        serie = RAM_DATASETS.get(clave)
+        if serie is None:
+            logging.info("Cargando columna %s de %s [%s]", col, self.name, key or "tabla")
+            if key is None:
+                with read_connection(self.info["duckdb"]) as con:
+                    df = timed_query("column", lambda: con.execute(
+                        f'SELECT "{col}" FROM {self.table} ORDER BY Timestamp, rowid').df(), self.table)
+            else:
+                df = timed_query("partition_column", lambda: read_partition(self.partitions_dir, key, [col]), self.table)
+                if df.empty:
+                    # partición ausente (p.ej. en plena publicación de una construcción): el mes sale de la tabla
+                    mes = pd.Period(key, freq="M")
+                    with read_connection(self.info["duckdb"]) as con:
+                        df = timed_query("column", lambda: con.execute(
+                            f'SELECT "{col}" FROM {self.table} WHERE Timestamp BETWEEN ? AND ? ORDER BY Timestamp, rowid',
+                            [mes.start_time, mes.end_time]).df(), self.table)
+            serie = apply_plan_to_frame(df, self.dtype_plan)[col].reset_index(drop=True)
+            RAM_DATASETS[clave] = serie
+        return serie
@@ -0,0 +1,199 @@
+# utils/dtype_plan.py
+import logging
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------
+# Plan de tipos compactos por columna
+#   - declarado en control_components.yml con `dtype:` en cada medida
+#     (Tabular) o en cada grupo raw/from_to (EventEncoded)
+#   - o inferido de los datos (solo conversiones sin pérdida: enteros
+#     pequeños y 0/1; un float nunca se reduce a float32 sin declararlo)
+# El plan se guarda en <table>__dtypes y se aplica tanto a la tabla DuckDB
+# como a los DFs que se cargan en RAM.
+# Los sentinelas (±999999.0) obligan como mínimo a int32 en columnas
+# enteras y caben exactos en float32 (< 2^24).
+# -----------------------------------------------------------
+
+# dtype del plan -> tipo DuckDB (bool se guarda como TINYINT para que la
+# pirámide y el índice de huecos puedan seguir agregando numéricamente)
+DUCKDB_TYPES = {
+    "bool": "TINYINT",
+    "int8": "TINYINT",
+    "int16": "SMALLINT",
+    "int32": "INTEGER",
+    "float32": "FLOAT",
+    "float64": "DOUBLE",
+    "category": "VARCHAR",
+}
+
+# tipo DuckDB -> dtype numpy de la columna en RAM
+NUMPY_TYPES = {
+    "TINYINT": "int8",
+    "SMALLINT": "int16",
+    "INTEGER": "int32",
+    "BIGINT": "int64",
+    "FLOAT": "float32",
+    "DOUBLE": "float64",
+    "BOOLEAN": "bool",
+}
+
+_INT_RANGES = [("int8", -2**7, 2**7 - 1), ("int16", -2**15, 2**15 - 1), ("int32", -2**31, 2**31 - 1)]
+_FLOAT32_EXACT = 2**24
+
+
+def dtype_table(table: str) -> str:
+    return f"{table}__dtypes"
+
+
+def has_dtype_plan(con, table: str) -> bool:
+    existing = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+    return dtype_table(table) in existing
+
+
+def load_dtype_plan(con, table: str) -> dict:
+    if not has_dtype_plan(con, table):
+        return {}
+    return dict(con.execute(f'SELECT "column", dtype FROM {dtype_table(table)}').fetchall())
+
+
+def declared_dtypes(components: dict, dataset_type: str = None) -> dict:
+    """{columna: dtype} declarados en el YAML de componentes."""
+    out = {}
+    for comp in (components or {}).values():
+        for meas_key, meas in (comp.get("measurements") or {}).items():
+            if not isinstance(meas, dict):
+                continue
+            if dataset_type == "EventEncodedDataSet":
+                # measurements: {raw: {...}, from_to: {...}} o {medida: {raw: {...}, from_to: {...}}}
+                grupos = [meas] if meas_key in ("raw", "from_to") else [meas.get("raw"), meas.get("from_to")]
+                for grupo in grupos:
+                    if isinstance(grupo, dict) and grupo.get("dtype"):
+                        for c in grupo.get("columns", []):
+                            out[str(c)] = grupo["dtype"]
+            elif meas.get("dtype"):
+                out[meas.get("display_name") or meas_key] = meas["dtype"]
+    return out
+
+
+def _menor_entero(mn, mx):
+    for nombre, lo, hi in _INT_RANGES:
+        if lo <= mn and mx <= hi:
+            return nombre
+    return None
+
+
+def resolve_dtype(declarado, mn, mx, integral, nulos):
+    """
+    dtype final de una columna numérica a partir del declarado (o None para
+    inferir) y de sus estadísticas. Si el declarado no puede representar los
+    valores (p.ej. int8 con sentinelas o NULL), se ensancha al menor que sí.
+    """
+    if mn is None:
+        return declarado if declarado in ("float32", "float64") else None
+    if declarado in ("float32", "float64"):
+        return declarado
+    if declarado == "category":
+        return None
+
+    if integral:
+        if nulos:
+            # los enteros de numpy no admiten NaN: float32 es exacto hasta 2^24
+            ok = max(abs(mn), abs(mx)) < _FLOAT32_EXACT
+            return "float32" if ok else None
+        if mn >= 0 and mx <= 1 and declarado in (None, "bool"):
+            return "bool"
+        return _menor_entero(mn, mx)
+    return None
+
+
+def plan_dtypes(con, table: str, components: dict = None, dataset_type: str = None, ts_col: str = "Timestamp") -> dict:
+    """Calcula el plan {columna: dtype} (solo columnas que cambian de tipo)."""
+    declarados = declared_dtypes(components, dataset_type)
+    desc = con.execute(f"DESCRIBE {table}").fetchall()
+    plan = {}
+    for col, tipo, *_ in desc:
+        if col == ts_col:
+            continue
+        tipo = str(tipo).upper()
+        declarado = declarados.get(col)
+        if tipo == "VARCHAR":
+            if declarado == "category":
+                plan[col] = "category"
+            continue
+        if tipo not in NUMPY_TYPES:
+            continue
+        mn, mx, integral, n_nulos = con.execute(
+            f'SELECT min("{col}"), max("{col}"), coalesce(bool_and("{col}" = round("{col}")), true), '
+            f'count(*) - count("{col}") FROM {table}'
+        ).fetchone()
+        dtype = resolve_dtype(declarado, mn, mx, bool(integral), n_nulos > 0)
+        if declarado and dtype != declarado:
+            logging.warning("dtype %s declarado para %s no cabe en sus valores; se usa %s",
+                            declarado, col, dtype or tipo)
+        if dtype and DUCKDB_TYPES[dtype] != tipo:
+            plan[col] = dtype
+        elif dtype == "bool":
+            plan[col] = dtype
+    return plan
+
+
+def apply_dtype_plan(con, table: str, plan: dict):
+    """ALTER de las columnas de la tabla según el plan y guarda el plan en <table>__dtypes."""
+    for col, dtype in plan.items():
+        con.execute(f'ALTER TABLE {table} ALTER COLUMN "{col}" SET DATA TYPE {DUCKDB_TYPES[dtype]}')
+    con.execute(f'CREATE OR REPLACE TABLE {dtype_table(table)} ("column" VARCHAR, dtype VARCHAR)')
+    if plan:
+        con.executemany(f"INSERT INTO {dtype_table(table)} VALUES (?, ?)", list(plan.items()))
+    logging.info("🗜️ Tipos compactos de %s: %s columnas convertidas", table, len(plan))
+
+
+def widen_for_frame(con, table: str, df: pd.DataFrame):
+    """
+    Antes de insertar `df` (ingesta incremental): si algún valor no cabe en
+    el tipo entero/bool de su columna (decimales, NULL, fuera de rango), la
+    columna pasa al menor tipo que lo admite (o a DOUBLE) y se actualiza el plan.
+    """
+    plan = load_dtype_plan(con, table)
+    rangos = {nombre: (lo, hi) for nombre, lo, hi in _INT_RANGES}
+    rangos["bool"] = (0, 1)
+    cambios = {}
+    for col, dtype in plan.items():
+        if col not in df.columns or dtype not in rangos:
+            continue
+        valores = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        validos = valores[~np.isnan(valores)]
+        nulos = len(validos) < len(valores)
+        lo, hi = rangos[dtype]
+        cabe = not nulos and (
+            not len(validos)
+            or (np.all(validos == np.round(validos)) and validos.min() >= lo and validos.max() <= hi)
+        )
+        if cabe:
+            continue
+
+        mn, mx = con.execute(f'SELECT min("{col}"), max("{col}") FROM {table}').fetchone()
+        extremos = [x for x in (mn, mx) if x is not None] + ([validos.min(), validos.max()] if len(validos) else [])
+        integral = bool(np.all(validos == np.round(validos)))
+        nuevo = None
+        if extremos:
+            nuevo = resolve_dtype(None, float(min(extremos)), float(max(extremos)), integral, nulos)
+        cambios[col] = nuevo or "float64"
+
+    for col, dtype in cambios.items():
+        logging.info("🗜️ %s.%s pasa de %s a %s", table, col, plan[col], dtype)
+        con.execute(f'ALTER TABLE {table} ALTER COLUMN "{col}" SET DATA TYPE {DUCKDB_TYPES[dtype]}')
+        con.execute(f'UPDATE {dtype_table(table)} SET dtype = ? WHERE "column" = ?', [dtype, col])
+    return cambios
+
+
+def apply_plan_to_frame(df: pd.DataFrame, plan: dict) -> pd.DataFrame:
+    """Ajusta un DF leído de DuckDB/Parquet a los dtypes del plan (bool y category)."""
+    for col, dtype in (plan or {}).items():
+        if col not in df.columns:
+            continue
+        if dtype == "bool" and df[col].dtype != bool:
+            df[col] = df[col].astype(bool)
+        elif dtype == "category" and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
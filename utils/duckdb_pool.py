@@ -0,0 +1,124 @@
+# utils/duckdb_pool.py
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import duckdb
+
+from utils.metrics import REGISTRY
+
+# -----------------------------------------------------------
+# Conexiones DuckDB de solo lectura compartidas por los callbacks
+#   - una conexión read_only por fichero y proceso, abierta la primera vez
+#     que se usa y reutilizada después (no se reabre el fichero por request)
+#   - cada hilo trabaja con su propio cursor de esa conexión
+#   - las construcciones publican con os.replace: si cambia la identidad del
+#     fichero (inodo, mtime, tamaño) se cierra la conexión anterior y se abre
+#     la nueva en cuanto no quedan consultas en vuelo sobre ella (hasta
+#     entonces se sigue sirviendo la versión anterior). DuckDB reutiliza la
+#     instancia de un fichero mientras tenga alguna conexión o cursor abierto,
+#     por eso hay que cerrarlos todos antes de reabrir.
+#   - read_only permite varios workers de gunicorn sobre el mismo fichero sin
+#     conflictos de lock; la escritura queda para las construcciones
+#     (get_duckdb_con de dataset_manager, sobre la copia staging)
+# -----------------------------------------------------------
+
+
+def _identidad(path: str) -> tuple:
+    st = os.stat(path)
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class _Entrada:
+    def __init__(self, path: str, ident: tuple):
+        self.ident = ident
+        self.con = duckdb.connect(path, read_only=True)
+        self.cursores = []
+        self.en_uso = 0
+
+    def close(self):
+        for cur in self.cursores:
+            try:
+                cur.close()
+            except Exception:
+                pass
+        self.con.close()
+
+
+class ReadPool:
+    def __init__(self):
+        self._entradas = {}   # ruta -> _Entrada vigente
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _adquirir(self, key: str) -> _Entrada:
+        ident = _identidad(key)  # FileNotFoundError si no hay versión publicada
+        with self._lock:
+            entrada = self._entradas.get(key)
+            if entrada is not None and entrada.ident != ident and entrada.en_uso == 0:
+                logging.info("🔄 Nueva versión de %s: se reabre en solo lectura", Path(key).name)
+                self._entradas.pop(key).close()
+                entrada = None
+            if entrada is None:
+                entrada = self._entradas[key] = _Entrada(key, ident)
+            entrada.en_uso += 1
+            return entrada
+
+    def _soltar(self, entrada: _Entrada):
+        with self._lock:
+            entrada.en_uso -= 1
+
+    def _cursor(self, key: str, entrada: _Entrada):
+        cursores = getattr(self._local, "cursores", None)
+        if cursores is None:
+            cursores = self._local.cursores = {}
+        actual = cursores.get(key)
+        if actual is None or actual[0] is not entrada:
+            cur = entrada.con.cursor()
+            with self._lock:
+                entrada.cursores.append(cur)
+            cursores[key] = actual = (entrada, cur)
+        return actual[1]
+
+    @contextmanager
+    def cursor(self, path):
+        """Cursor del hilo actual sobre la conexión vigente del fichero."""
+        key = str(Path(path).resolve())
+        entrada = self._adquirir(key)
+        try:
+            yield self._cursor(key, entrada)
+        finally:
+            self._soltar(entrada)
+
+    def close(self, path=None):
+        """Cierra las conexiones de `path` (o todas)."""
+        with self._lock:
+            keys = [str(Path(path).resolve())] if path is not None else list(self._entradas)
+            for key in keys:
+                entrada = self._entradas.pop(key, None)
+                if entrada is not None:
+                    entrada.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": len(self._entradas),
+                "cursors": sum(len(e.cursores) for e in self._entradas.values()),
+                "in_use": sum(e.en_uso for e in self._entradas.values()),
+            }
+
+
+READ_POOL = ReadPool()
+
+REGISTRY.gauge_callback("mds_duckdb_read_connections", "Conexiones, cursores y consultas en vuelo del pool de lectura",
+                        lambda: {(("state", estado),): n for estado, n in READ_POOL.stats().items()})
+
+
+def read_connection(path):
+    """
+    `with read_connection(path) as con:` para consultas de los callbacks.
+    El cursor es del hilo y se reutiliza: no se cierra al salir.
+    """
+    return READ_POOL.cursor(path)
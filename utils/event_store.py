@@ -0,0 +1,184 @@
+# utils/event_store.py
+import json
+import logging
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------
+# Almacenamiento de EventEncodedDataSet como registro de eventos
+#   <table>__events(ts TIMESTAMP, code SMALLINT), ordenado por (ts, code)
+# Los códigos vienen del diccionario (Events_Dictionary.json) y la
+# agrupación componente/raw/from_to de control_groupedDictionary.yml
+# (columns + columns_encoded). El tamaño y el tiempo de carga dependen del
+# número de eventos; las columnas 0/1 solo se reconstruyen para los códigos
+# y el tramo que se piden.
+# -----------------------------------------------------------
+
+GRUPOS = ("raw", "from_to")
+
+
+def events_table(table: str) -> str:
+    return f"{table}__events"
+
+
+def is_event_storage(dataset_info: dict) -> bool:
+    return dataset_info.get("storage") == "events"
+
+
+def has_event_store(con, table: str) -> bool:
+    existing = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+    return events_table(table) in existing
+
+
+def load_event_dictionary(dataset_info: dict) -> dict:
+    """{nombre_evento: código} del fichero metadata.dictionary (vacío si no hay)."""
+    nombre = dataset_info.get("dictionary")
+    if not nombre:
+        return {}
+    path = Path(dataset_info["path"]) / nombre
+    if not path.exists():
+        logging.warning("Diccionario de eventos no encontrado: %s", path)
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return {str(k): int(v) for k, v in json.load(f).items()}
+
+
+def _grupos_de_medidas(measurements: dict):
+    """(grupo, info) para measurements {raw: {...}, from_to: {...}} o {medida: {raw: {...}, ...}}."""
+    for key, info in (measurements or {}).items():
+        if key in GRUPOS and isinstance(info, dict):
+            yield key, info
+        elif isinstance(info, dict):
+            for grupo in GRUPOS:
+                if isinstance(info.get(grupo), dict):
+                    yield grupo, info[grupo]
+
+
+def event_code_map(components: dict) -> dict:
+    """
+    {'comp::grupo::columna': código} a partir de columns/columns_encoded de
+    control_groupedDictionary.yml (mismo formato que los valores del checklist).
+    """
+    out = {}
+    for comp_id, comp in (components or {}).items():
+        for grupo, info in _grupos_de_medidas(comp.get("measurements", {})):
+            for col, code in zip(info.get("columns", []), info.get("columns_encoded", [])):
+                out[f"{comp_id}::{grupo}::{col}"] = int(code)
+    return out
+
+
+def _nombre_evento(comp: str, grupo: str, col: str) -> str:
+    """Nombre en Events_Dictionary.json: <comp>_<col> (raw) o <comp>_from_<col> (from_to)."""
+    return f"{comp}_{col}" if grupo == "raw" else f"{comp}_from_{col}"
+
+
+def check_event_codes(dataset_info: dict) -> list:
+    """
+    Contrasta los códigos agrupados de control_groupedDictionary.yml con el
+    diccionario de eventos. Devuelve (y avisa de) las opciones cuyo código no
+    existe en el diccionario o corresponde a otro evento.
+    """
+    diccionario = load_event_dictionary(dataset_info)
+    if not diccionario:
+        return []
+    por_codigo = {c: n for n, c in diccionario.items()}
+    errores = []
+    for comp_id, comp in (dataset_info.get("components") or {}).items():
+        nombre_comp = comp.get("name", comp_id)
+        for grupo, info in _grupos_de_medidas(comp.get("measurements", {})):
+            for col, code in zip(info.get("columns", []), info.get("columns_encoded", [])):
+                esperado, real = _nombre_evento(nombre_comp, grupo, col), por_codigo.get(int(code))
+                if real != esperado:
+                    errores.append((f"{comp_id}::{grupo}::{col}", int(code), real))
+    for opcion, code, real in errores:
+        logging.warning("⚠️ %s: código %s %s en el diccionario", opcion, code,
+                        f"es '{real}'" if real else "no existe")
+    return errores
+
+
+def build_event_store(con, table: str, csv_files, ts_col: str = "Timestamp", code_col: str = "event"):
+    """
+    (Re)construye <table>__events con DuckDB leyendo todos los CSV (ts, código).
+    El Timestamp puede venir como epoch en segundos o como fecha.
+    La tabla base <table> queda como vista (Timestamp, event) sobre el registro.
+    """
+    files = ", ".join(f"'{Path(f).as_posix()}'" for f in csv_files)
+    con.execute(f"""
+        CREATE OR REPLACE TABLE {events_table(table)} AS
+        SELECT ts, code FROM (
+            SELECT
+                coalesce(
+                    make_timestamp(CAST(round(try_cast("{ts_col}" AS DOUBLE) * 1e6) AS BIGINT)),
+                    try_cast("{ts_col}" AS TIMESTAMP)
+                ) AS ts,
+                CAST("{code_col}" AS SMALLINT) AS code
+            FROM read_csv([{files}], columns = {{'{ts_col}': 'VARCHAR', '{code_col}': 'INTEGER'}}, header = true)
+        )
+        WHERE ts IS NOT NULL AND code IS NOT NULL
+        ORDER BY ts, code
+    """)
+    con.execute(f"DROP VIEW IF EXISTS {table}")
+    con.execute(f'CREATE VIEW {table} AS SELECT ts AS "Timestamp", code AS event FROM {events_table(table)}')
+    n = con.execute(f"SELECT count(*) FROM {events_table(table)}").fetchone()[0]
+    logging.info("🎫 Registro de eventos de %s: %s eventos", table, n)
+
+
+def present_codes(con, table: str) -> list:
+    return [r[0] for r in con.execute(f"SELECT DISTINCT code FROM {events_table(table)} ORDER BY code").fetchall()]
+
+
+def _filtro(codes, x_min, x_max):
+    where, params = [f"code IN ({', '.join('?' for _ in codes)})"], [int(c) for c in codes]
+    if x_min is not None and x_max is not None:
+        where.append("ts BETWEEN ? AND ?")
+        params += [pd.Timestamp(x_min), pd.Timestamp(x_max)]
+    return " AND ".join(where), params
+
+
+def dense_events(con, table: str, columns: dict, x_min=None, x_max=None, ts_col: str = "Timestamp") -> pd.DataFrame:
+    """
+    Reconstruye columnas 0/1 solo para `columns` ({nombre_columna: código}) en
+    [x_min, x_max]: una fila por timestamp con algún evento de esos códigos.
+    """
+    if not columns:
+        return pd.DataFrame(columns=[ts_col])
+    where, params = _filtro(columns.values(), x_min, x_max)
+    selects = ", ".join(
+        f'CAST(max(CASE WHEN code = {int(code)} THEN 1 ELSE 0 END) AS BOOLEAN) AS "{nombre}"'
+        for nombre, code in columns.items()
+    )
+    return con.execute(
+        f'SELECT ts AS "{ts_col}", {selects} FROM {events_table(table)} WHERE {where} GROUP BY ts ORDER BY ts',
+        params,
+    ).df()
+
+
+def event_buckets(con, table: str, codes, x_min, x_max, n_buckets: int) -> pd.DataFrame:
+    """
+    Eventos por código agregados en ~n_buckets intervalos de [x_min, x_max]:
+    (code, ts = primer evento del intervalo, n = nº de eventos). Con zoom
+    suficiente cada intervalo contiene un solo evento y se ven exactos.
+    """
+    if not codes:
+        return pd.DataFrame(columns=["code", "ts", "n"])
+    span_ms = max((pd.Timestamp(x_max) - pd.Timestamp(x_min)).total_seconds() * 1000, 1)
+    bucket_ms = max(int(span_ms // max(n_buckets, 1)), 1)
+    where, params = _filtro(codes, x_min, x_max)
+    return con.execute(
+        f"""
+        SELECT code, min(ts) AS ts, count(*) AS n
+        FROM {events_table(table)}
+        WHERE {where}
+        GROUP BY code, epoch_ms(ts) // {bucket_ms}
+        ORDER BY code, ts
+        """,
+        params,
+    ).df()
+
+
+def events_to_xy(buckets: pd.DataFrame, code: int, lane: float):
+    """x/y/n de una traza de eventos (un carril horizontal por código)."""
+    sel = buckets[buckets["code"] == code]
+    x = pd.to_datetime(sel["ts"].to_numpy())
+    return x, np.full(len(sel), lane, dtype="float64"), sel["n"].to_numpy()
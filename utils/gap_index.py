@@ -0,0 +1,174 @@
+# utils/gap_index.py
+import logging
+import numpy as np
+import pandas as pd
+
+from utils.aggregation_pyramid import _q, load_pyramid_meta
+
+# Sentinelas que el gráfico marca: valor -> tipo de tramo
+SENTINEL_KINDS = {
+    999999.0: "relleno",     # timestamps insertados por rellenar_timestamps
+    -999999.0: "anomalia",
+}
+
+# dos muestras sentinela del mismo tipo separadas por más de esto (en
+# múltiplos de la resolución) pertenecen a tramos distintos
+RUN_TOLERANCE = 1.5
+
+
+def gap_index_table(table: str) -> str:
+    return f"{table}__gaps"
+
+
+def has_gap_index(con, table: str) -> bool:
+    existing = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+    return gap_index_table(table) in existing
+
+
+def _resolution_ms(con, table, ts_col):
+    meta = load_pyramid_meta(con, table)
+    if meta is not None and not meta.empty:
+        return int(meta["bucket_ms"].iloc[0])
+    res = con.execute(f"""
+        SELECT mode(d) FROM (
+            SELECT epoch_ms({_q(ts_col)}) - lag(epoch_ms({_q(ts_col)})) OVER (ORDER BY {_q(ts_col)}) AS d FROM {table}
+        ) WHERE d > 0
+    """).fetchone()[0]
+    return int(res or 1000)
+
+
+def _value_columns(con, table, ts_col):
+    desc = con.execute(f"DESCRIBE {table}").fetchall()
+    numeric = ("DOUBLE", "FLOAT", "REAL", "DECIMAL", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "HUGEINT")
+    return [r[0] for r in desc if r[0] != ts_col and str(r[1]).upper().startswith(numeric)]
+
+
+def _runs_sql(table, col, ts_col, tol_ms, lo=None, hi=None):
+    """
+    Tramos consecutivos de un mismo sentinela en una columna. Solo se leen y
+    ordenan las filas sentinela: un tramo nuevo empieza cuando cambia el tipo
+    o cuando la distancia a la muestra anterior supera la tolerancia.
+    """
+    kind_case = " ".join(f"WHEN {_q(col)} = {v} THEN '{k}'" for v, k in SENTINEL_KINDS.items())
+    values = ", ".join(str(v) for v in SENTINEL_KINDS)
+    where = f"{_q(col)} IN ({values})"
+    if lo is not None:
+        where += f" AND {_q(ts_col)} BETWEEN '{lo}' AND '{hi}'"
+    return f"""
+        SELECT '{col.replace("'", "''")}' AS "column", min(ts) AS start_ts, max(ts) AS end_ts, kind, count(*) AS n_samples
+        FROM (
+            SELECT ts, kind, sum(nuevo) OVER (ORDER BY ts ROWS UNBOUNDED PRECEDING) AS run_id
+            FROM (
+                SELECT ts, kind,
+                    CASE WHEN kind IS DISTINCT FROM lag(kind) OVER (ORDER BY ts)
+                              OR epoch_ms(ts) - lag(epoch_ms(ts)) OVER (ORDER BY ts) > {tol_ms}
+                         THEN 1 ELSE 0 END AS nuevo
+                FROM (
+                    SELECT {_q(ts_col)}::TIMESTAMP AS ts, CASE {kind_case} END AS kind
+                    FROM {table} WHERE {where}
+                )
+            )
+        )
+        GROUP BY run_id, kind
+    """
+
+
+def build_gap_index(con, table: str, ts_col: str = "Timestamp"):
+    """
+    Construye <table>__gaps: por columna, cada tramo de valores sentinela
+    (relleno 999999.0 / anomalía -999999.0) como (start_ts, end_ts, kind,
+    n_samples). El gráfico dibuja estos tramos en vez de un marcador por
+    muestra, así que su coste no crece con el número de muestras perdidas.
+    """
+    con.execute(f"DROP TABLE IF EXISTS {gap_index_table(table)}")
+    con.execute(f"""
+        CREATE TABLE {gap_index_table(table)} (
+            "column" VARCHAR, start_ts TIMESTAMP, end_ts TIMESTAMP, kind VARCHAR, n_samples BIGINT
+        )
+    """)
+    tol_ms = int(_resolution_ms(con, table, ts_col) * RUN_TOLERANCE)
+    for col in _value_columns(con, table, ts_col):
+        con.execute(f"INSERT INTO {gap_index_table(table)} {_runs_sql(table, col, ts_col, tol_ms)}")
+    n = con.execute(f"SELECT count(*) FROM {gap_index_table(table)}").fetchone()[0]
+    logging.info("🕳️ Índice de huecos de %s: %s tramos", table, n)
+
+
+def refresh_gap_index(con, table: str, ts_min, ts_max, ts_col: str = "Timestamp"):
+    """
+    Recalcula los tramos tras reescribir [ts_min, ts_max] de la tabla base.
+    Se borran los tramos que tocan esa ventana (ampliándola a sus extremos
+    para no partir tramos que cruzan la frontera) y se vuelven a calcular.
+    """
+    if not has_gap_index(con, table):
+        return build_gap_index(con, table, ts_col)
+
+    tol_ms = int(_resolution_ms(con, table, ts_col) * RUN_TOLERANCE)
+    tol = pd.Timedelta(milliseconds=tol_ms)
+    lo, hi = pd.Timestamp(ts_min) - tol, pd.Timestamp(ts_max) + tol
+    gaps = gap_index_table(table)
+    for col in _value_columns(con, table, ts_col):
+        lo_c, hi_c = con.execute(
+            f'SELECT least(min(start_ts), ?), greatest(max(end_ts), ?) FROM {gaps} '
+            f'WHERE "column" = ? AND end_ts >= ? AND start_ts <= ?',
+            [lo, hi, col, lo, hi],
+        ).fetchone()
+        lo_c, hi_c = lo_c or lo, hi_c or hi
+        con.execute(f'DELETE FROM {gaps} WHERE "column" = ? AND end_ts >= ? AND start_ts <= ?', [col, lo_c, hi_c])
+        con.execute(f"INSERT INTO {gaps} {_runs_sql(table, col, ts_col, tol_ms, lo_c, hi_c)}")
+
+
+def query_gap_runs(con, table: str, column: str, x_min=None, x_max=None) -> pd.DataFrame:
+    """Tramos sentinela de una columna que solapan [x_min, x_max], ordenados por inicio."""
+    where, params = ['"column" = ?'], [column]
+    if x_min is not None and x_max is not None:
+        where.append("end_ts >= ? AND start_ts <= ?")
+        params += [pd.Timestamp(x_min), pd.Timestamp(x_max)]
+    return con.execute(
+        f'SELECT start_ts, end_ts, kind, n_samples FROM {gap_index_table(table)} '
+        f'WHERE {" AND ".join(where)} ORDER BY start_ts',
+        params,
+    ).df()
+
+
+def merge_runs(runs: pd.DataFrame, tolerance) -> pd.DataFrame:
+    """
+    Une tramos del mismo tipo separados menos de `tolerance` (~1 píxel en el
+    rango visible) para que el número de segmentos dibujados esté acotado.
+    """
+    if runs.empty:
+        return runs
+    partes = []
+    tol = pd.Timedelta(tolerance).value
+    for kind, grupo in runs.groupby("kind", sort=False):
+        start = grupo["start_ts"].to_numpy(dtype="datetime64[ns]").view("int64")
+        end = grupo["end_ts"].to_numpy(dtype="datetime64[ns]").view("int64")
+        orden = np.argsort(start, kind="stable")
+        start, end = start[orden], end[orden]
+        n_samples = grupo["n_samples"].to_numpy()[orden]
+
+        # un tramo empieza grupo nuevo si arranca lejos del final acumulado anterior
+        fin_acumulado = np.maximum.accumulate(end)
+        nuevo = np.ones(len(start), dtype=bool)
+        nuevo[1:] = start[1:] - fin_acumulado[:-1] > tol
+        grupo_id = np.cumsum(nuevo) - 1
+
+        partes.append(pd.DataFrame({
+            "start_ts": pd.to_datetime(start[nuevo]),
+            "end_ts": pd.to_datetime(np.maximum.reduceat(end, np.flatnonzero(nuevo))),
+            "kind": kind,
+            "n_samples": np.bincount(grupo_id, weights=n_samples).astype("int64"),
+        }))
+    return pd.concat(partes, ignore_index=True)
+
+
+def runs_from_frame(df: pd.DataFrame, column: str, ts_col: str = "Timestamp", tolerance=None) -> pd.DataFrame:
+    """Tramos sentinela calculados sobre un DF en memoria (cuando no hay índice en DuckDB)."""
+    partes = []
+    for valor, kind in SENTINEL_KINDS.items():
+        ts = df.loc[df[column] == valor, ts_col]
+        if not ts.empty:
+            partes.append(pd.DataFrame({"start_ts": ts.values, "end_ts": ts.values, "kind": kind, "n_samples": 1}))
+    if not partes:
+        return pd.DataFrame(columns=["start_ts", "end_ts", "kind", "n_samples"])
+    runs = pd.concat(partes, ignore_index=True)
+    return merge_runs(runs, tolerance if tolerance is not None else pd.Timedelta(0))
@@ -9,56 +9,58 @@ def load_config(path: Path):
     with open(path, "r", encoding="utf-8") as f:
         return yaml.safe_load(f)
 
-def build_checklist_options_from_components(components_dict, dataset_type, duckdb_columns):
+def iter_checklist_options(components_dict, dataset_type, duckdb_columns):
     """
-    Devuelve una lista de opciones para dcc.Checklist basadas en:
-      - components_dict: dict con estructura 'components' (como en tus YAMLs)
-      - dataset_type: 'TabularDataSet' o 'EventEncodedDataSet'
-      - duckdb_columns: lista de columnas reales (para evitar mostrar cols inexistentes)
+    Genera (opción, comp_id, tipo) para cada medida del YAML presente en
+    duckdb_columns; tipo = 'type' de la medida (Tabular) o raw/from_to
+    (EventEncoded). La pertenencia se comprueba contra un set.
     """
-    options = []
-
-    if not components_dict:
-        # fallback: todas las columnas excepto Timestamp
-        for c in duckdb_columns:
-            if c.lower() != "timestamp":
-                options.append({"label": c, "value": c})
-        return options
+    columnas = set(duckdb_columns)
 
-    for comp_id, comp in components_dict.items():
+    for comp_id, comp in (components_dict or {}).items():
         measurements = comp.get("measurements", {})
 
         # EventEncoded: measurements contains groups raw/from_to with columns lists (names)
         if dataset_type == "EventEncodedDataSet":
-            for meas_id, meas_info in measurements.items():
-                if "raw" in meas_info:
-                    cols = meas_info["raw"].get("columns", [])
-                    for c in cols:
-                        if c in duckdb_columns:
-                            options.append({
-                                "label": f"{c} ({comp.get('name', comp_id)} · raw)",
-                                "value": f"{comp_id}::raw::{c}"
-                            })
-                if "from_to" in meas_info:
-                    cols = meas_info["from_to"].get("columns", [])
-                    for c in cols:
-                        if c in duckdb_columns:
-                            options.append({
-                                "label": f"{c} ({comp.get('name', comp_id)} · from_to)",
-                                "value": f"{comp_id}::from_to::{c}"
-                            })
+            # measurements = {raw: {...}, from_to: {...}} o {medida: {raw: {...}, from_to: {...}}}
+            if any(g in measurements for g in ("raw", "from_to")):
+                bloques = [measurements]
+            else:
+                bloques = [m for m in measurements.values() if isinstance(m, dict)]
+            for meas_info in bloques:
+                for grupo in ("raw", "from_to"):
+                    if grupo not in meas_info:
+                        continue
+                    for c in meas_info[grupo].get("columns", []):
+                        value = f"{comp_id}::{grupo}::{c}"
+                        # en modo registro de eventos las columnas son los propios valores
+                        if c in columnas or value in columnas:
+                            yield {
+                                "label": f"{c} ({comp.get('name', comp_id)} · {grupo})",
+                                "value": value
+                            }, comp_id, grupo
         else:
             # Tabular: measurements map names to meta; we show the measurement keys if exist in DB
             for meas_key, meas_meta in measurements.items():
                 col_candidates = [meas_meta.get("display_name"), meas_key]
                 for cand in col_candidates:
-                    if cand and cand in duckdb_columns:
-                        options.append({
+                    if cand and cand in columnas:
+                        yield {
                             "label": f"{meas_meta.get('display_name', meas_key)} ({comp.get('name', comp_id)})",
                             "value": cand
-                        })
+                        }, comp_id, meas_meta.get("type")
                         break
 
+
+def build_checklist_options_from_components(components_dict, dataset_type, duckdb_columns):
+    """
+    Devuelve una lista de opciones para dcc.Checklist basadas en:
+      - components_dict: dict con estructura 'components' (como en tus YAMLs)
+      - dataset_type: 'TabularDataSet' o 'EventEncodedDataSet'
+      - duckdb_columns: lista de columnas reales (para evitar mostrar cols inexistentes)
+    """
+    options = [opt for opt, _, _ in iter_checklist_options(components_dict, dataset_type, duckdb_columns)]
+
     # Fallback: si options queda vacío, generar options con todas las columnas reales (except Timestamp)
     if not options:
         for c in duckdb_columns:
@@ -0,0 +1,135 @@
+# utils/ingest_manifest.py
+import hashlib
+import logging
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+
+
+def manifest_table(table: str) -> str:
+    return f"{table}__manifest"
+
+
+def file_sha256(path, chunk_size: int = 1 << 20) -> str:
+    """Hash del contenido del fichero (lectura por bloques)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_time_span(path, timestamp_col: str = "Timestamp"):
+    """(ts_min, ts_max) de un CSV leyendo solo la columna de tiempo."""
+    ts = pd.read_csv(path, usecols=[timestamp_col])[timestamp_col]
+    ts = pd.to_datetime(ts, errors="coerce").dropna()
+    if ts.empty:
+        return None, None
+    return ts.min(), ts.max()
+
+
+def ensure_manifest(con, table: str):
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {manifest_table(table)} (
+            path VARCHAR PRIMARY KEY,
+            size BIGINT,
+            mtime_ns BIGINT,
+            sha256 VARCHAR,
+            ts_min TIMESTAMP,
+            ts_max TIMESTAMP,
+            ingested_at TIMESTAMP
+        )
+    """)
+
+
+def has_manifest(con, table: str) -> bool:
+    existing = {r[0] for r in con.execute("SHOW TABLES").fetchall()}
+    return manifest_table(table) in existing
+
+
+def load_manifest(con, table: str) -> pd.DataFrame:
+    ensure_manifest(con, table)
+    return con.execute(f"SELECT * FROM {manifest_table(table)}").df()
+
+
+def pending_files(con, table: str, csv_files):
+    """
+    Compara los CSV de raw/ con el manifest y devuelve la lista de ficheros
+    nuevos o modificados. Si tamaño y mtime coinciden no se calcula el hash;
+    si difieren pero el hash es el mismo (fichero "tocado") solo se actualiza
+    el manifest, sin reingestar.
+    """
+    manifest = load_manifest(con, table).set_index("path")
+    pending = []
+    for f in csv_files:
+        key = str(Path(f).resolve())
+        st = Path(f).stat()
+        if key in manifest.index:
+            row = manifest.loc[key]
+            if int(row["size"]) == st.st_size and int(row["mtime_ns"]) == st.st_mtime_ns:
+                continue
+            if row["sha256"] == file_sha256(f):
+                con.execute(
+                    f"UPDATE {manifest_table(table)} SET size = ?, mtime_ns = ? WHERE path = ?",
+                    [st.st_size, st.st_mtime_ns, key],
+                )
+                continue
+        pending.append(str(f))
+    return pending
+
+
+def changed_files(con, table: str, csv_files):
+    """
+    Versión de solo lectura y sin hash de pending_files: ficheros que no
+    están en el manifest o cuyo tamaño/mtime no coincide. Sirve para decidir
+    barato si hace falta lanzar una construcción (que ya hará la comprobación
+    fina con hash).
+    """
+    if not has_manifest(con, table):
+        return [str(f) for f in csv_files]
+    known = {
+        path: (size, mtime_ns)
+        for path, size, mtime_ns in con.execute(f"SELECT path, size, mtime_ns FROM {manifest_table(table)}").fetchall()
+    }
+    changed = []
+    for f in csv_files:
+        st = Path(f).stat()
+        if known.get(str(Path(f).resolve())) != (st.st_size, st.st_mtime_ns):
+            changed.append(str(f))
+    return changed
+
+
+def record_files(con, table: str, csv_files, timestamp_col: str = "Timestamp"):
+    """Registra (o actualiza) los ficheros en el manifest con su huella y rango temporal."""
+    ensure_manifest(con, table)
+    now = datetime.now()
+    for f in csv_files:
+        key = str(Path(f).resolve())
+        st = Path(f).stat()
+        ts_min, ts_max = file_time_span(f, timestamp_col)
+        con.execute(f"DELETE FROM {manifest_table(table)} WHERE path = ?", [key])
+        con.execute(
+            f"INSERT INTO {manifest_table(table)} VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [key, st.st_size, st.st_mtime_ns, file_sha256(f), ts_min, ts_max, now],
+        )
+    logging.info("📒 Manifest de %s actualizado con %s ficheros", table, len(csv_files))
+
+
+def manifest_spans(con, table: str, csv_files) -> dict:
+    """{path: (ts_min, ts_max)} registrados en el manifest para los ficheros dados (los que estén)."""
+    keys = [str(Path(f).resolve()) for f in csv_files]
+    if not keys or not has_manifest(con, table):
+        return {}
+    rows = con.execute(
+        f"SELECT path, ts_min, ts_max FROM {manifest_table(table)} WHERE list_contains(?, path)", [keys]
+    ).fetchall()
+    return {p: (a, b) for p, a, b in rows if a is not None}
+
+
+def overlapping_files(con, table: str, ts_min, ts_max):
+    """Ficheros ya ingeridos cuyo rango temporal solapa [ts_min, ts_max]."""
+    rows = con.execute(
+        f"SELECT path, ts_min, ts_max FROM {manifest_table(table)} WHERE ts_max >= ? AND ts_min <= ?",
+        [ts_min, ts_max],
+    ).fetchall()
+    return rows
@@ -0,0 +1,275 @@
+# utils/metrics.py
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+# -----------------------------------------------------------
+# Métricas en memoria con salida en formato texto de Prometheus (/metrics)
+#   - histogramas de latencia (buckets fijos), contadores y gauges
+#   - cada observación es un bisect + sumas bajo un lock: coste de
+#     microsegundos, se puede dejar activo en producción
+#   - las métricas son por proceso: con varios workers de gunicorn cada
+#     scrape ve las del worker que atiende la petición (label `pid`)
+# -----------------------------------------------------------
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+SIZE_BUCKETS = (1e2, 1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = (k + '="' + str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+               for k, v in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _fmt_num(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [counts por bucket..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels_key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self._series.get(key)
+            if serie is None:
+                serie = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            serie[i] += 1
+            serie[-2] += value
+            serie[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for key, serie in sorted(series.items()):
+            acumulado = 0
+            for le, n in zip(self.buckets + (float("inf"),), serie):
+                acumulado += n
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, (('le', _fmt_num(le)),))} {acumulado}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_num(serie[-2])}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {serie[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        lines += [f"{self.name}{_fmt_labels(k)} {_fmt_num(v)}" for k, v in sorted(values.items())]
+        return lines
+
+
+class CallbackGauge:
+    """Gauge/contador cuyo valor se lee al hacer scrape: fn() -> {labels_dict_o_tupla: valor} o valor."""
+
+    def __init__(self, name: str, help_text: str, fn, kind: str = "gauge"):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.kind = kind
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.fn()
+        except Exception:
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, v in values.items():
+            key = _labels_key(labels) if isinstance(labels, dict) else tuple(labels)
+            if v is not None:
+                lines.append(f"{self.name}{_fmt_labels(key)} {_fmt_num(v)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def histogram(self, name: str, help_text: str = "", buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get(name, lambda: Histogram(name, help_text, buckets))
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get(name, lambda: Counter(name, help_text))
+
+    def gauge_callback(self, name: str, help_text: str, fn, kind: str = "gauge"):
+        with self._lock:
+            self._metrics[name] = CallbackGauge(name, help_text, fn, kind)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CALLBACK_SECONDS = REGISTRY.histogram("mds_callback_seconds", "Latencia de los callbacks de Dash")
+CALLBACK_ERRORS = REGISTRY.counter("mds_callback_errors_total", "Excepciones en callbacks de Dash")
+CALLBACK_PAYLOAD = REGISTRY.histogram("mds_callback_response_bytes", "Bytes de la respuesta de cada callback",
+                                      SIZE_BUCKETS)
+PIPELINE_SECONDS = REGISTRY.histogram("mds_pipeline_step_seconds", "Duración de cada paso de la pipeline de limpieza")
+PIPELINE_ROWS = REGISTRY.histogram("mds_pipeline_rows", "Filas del DF al terminar la pipeline", SIZE_BUCKETS)
+QUERY_SECONDS = REGISTRY.histogram("mds_duckdb_query_seconds", "Latencia de las consultas DuckDB")
+QUERY_ROWS = REGISTRY.histogram("mds_duckdb_query_rows", "Filas devueltas por las consultas DuckDB", SIZE_BUCKETS)
+
+
+# cachés RAM registradas: nombre -> función stats() de RamCache
+_CACHES = {}
+
+
+def register_cache(name: str, stats_fn):
+    _CACHES[name] = stats_fn
+
+
+def _cache_stat(campo: str):
+    return lambda: {(("cache", nombre),): fn().get(campo) for nombre, fn in list(_CACHES.items())}
+
+
+for _campo, _tipo, _ayuda in (
+    ("bytes", "gauge", "Bytes ocupados por la caché RAM"),
+    ("budget_bytes", "gauge", "Presupuesto en bytes de la caché RAM"),
+    ("entries", "gauge", "Entradas en la caché RAM"),
+    ("hits", "counter", "Aciertos de la caché RAM"),
+    ("misses", "counter", "Fallos de la caché RAM"),
+    ("evictions", "counter", "Expulsiones de la caché RAM"),
+):
+    _nombre = f"mds_ram_cache_{_campo}" + ("_total" if _tipo == "counter" else "")
+    REGISTRY.gauge_callback(_nombre, _ayuda, _cache_stat(_campo), _tipo)
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - t, **labels)
+
+
+def timed_query(query: str, fn, dataset: str = ""):
+    """Ejecuta fn() (una consulta que devuelve un DF) y registra latencia y filas."""
+    t = time.perf_counter()
+    df = fn()
+    QUERY_SECONDS.observe(time.perf_counter() - t, query=query, dataset=dataset)
+    QUERY_ROWS.observe(len(df), query=query, dataset=dataset)
+    return df
+
+
+def instrument_callback(name: str):
+    """
+    Decorador para callbacks de Dash: latencia y errores. El nombre queda en
+    flask.g para que el after_request de /metrics asocie los bytes de la
+    respuesta al callback.
+    """
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                from flask import g
+                g.mds_callback = name
+            except RuntimeError:
+                pass  # fuera de una petición (benchmarks, llamadas directas)
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if type(e).__name__ != "PreventUpdate":
+                    CALLBACK_ERRORS.inc(callback=name, error=type(e).__name__)
+                raise
+            finally:
+                CALLBACK_SECONDS.observe(time.perf_counter() - t, callback=name)
+        return wrapper
+    return deco
+
+
+class StepTimer:
+    """
+    Callback `progress(paso)` que mide cada paso hasta que empieza el siguiente
+    (o hasta close()) y reenvía la llamada al `progress` original.
+    """
+
+    def __init__(self, histogram: Histogram, forward=None, **labels):
+        self.histogram = histogram
+        self.forward = forward
+        self.labels = labels
+        self._paso = None
+        self._t = None
+
+    def __call__(self, paso):
+        self.close()
+        self._paso, self._t = paso, time.perf_counter()
+        if self.forward is not None:
+            self.forward(paso)
+
+    def close(self):
+        if self._paso is not None:
+            self.histogram.observe(time.perf_counter() - self._t, step=self._paso, **self.labels)
+            self._paso = None
+
+
+def register_metrics_route(server, path: str = "/metrics"):
+    """
+    Añade /metrics (texto de Prometheus) al servidor Flask y un after_request
+    que registra los bytes de las respuestas de los callbacks instrumentados.
+    """
+    import os
+    from flask import Response, g
+
+    REGISTRY.gauge_callback("mds_process_info", "Proceso que atiende el scrape", lambda: {(("pid", os.getpid()),): 1})
+
+    @server.after_request
+    def _bytes_callback(response):
+        name = g.pop("mds_callback", None)
+        if name is not None and not response.direct_passthrough:
+            CALLBACK_PAYLOAD.observe(response.calculate_content_length() or 0, callback=name)
+        return response
+
+    @server.route(path)
+    def _metrics():
+        return Response(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return server
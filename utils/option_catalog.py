@@ -0,0 +1,58 @@
+# utils/option_catalog.py
+from utils.column_stats import stats_title
+from utils.helpers import iter_checklist_options
+
+# -----------------------------------------------------------
+# Catálogo de opciones del checklist de un dataset
+# Se construye una vez por versión del dataset (ServerDataset) con
+# índices invertidos por componente y por tipo, de modo que los filtros
+# del callback son búsquedas en diccionarios y no recorren el YAML.
+# Con estadísticas del dataset (<table>__stats) cada opción lleva su
+# resumen como tooltip (title).
+# -----------------------------------------------------------
+
+
+class OptionCatalog:
+    def __init__(self, components_dict, dataset_type, columns, stats=None):
+        self.options = []
+        self.by_component = {}
+        self.by_type = {}
+        for opt, comp_id, tipo in iter_checklist_options(components_dict, dataset_type, columns):
+            i = len(self.options)
+            self.options.append(opt)
+            self.by_component.setdefault(comp_id, []).append(i)
+            if tipo:
+                self.by_type.setdefault(str(tipo).lower(), []).append(i)
+
+        # sin medidas del YAML -> todas las columnas reales menos Timestamp
+        if not self.options:
+            self.options = [{"label": c, "value": c} for c in columns if c.lower() != "timestamp"]
+
+        if stats:
+            for opt in self.options:
+                # 'comp::grupo::columna' -> columna real
+                real = opt["value"].rsplit("::", 1)[-1]
+                if real in stats:
+                    opt["title"] = stats_title(stats[real])
+
+        self.index = {opt["value"]: i for i, opt in enumerate(self.options)}
+        self._por_etiqueta = {}
+
+    def _pick(self, indices):
+        return [self.options[i] for i in indices]
+
+    def for_component(self, comp_id):
+        return self._pick(self.by_component.get(comp_id, []))
+
+    def for_type(self, tipo):
+        """Opciones del tipo; si no está indexado, las que lo contienen en la etiqueta (memorizado)."""
+        tipo = str(tipo).lower()
+        if tipo in self.by_type:
+            return self._pick(self.by_type[tipo])
+        if tipo not in self._por_etiqueta:
+            self._por_etiqueta[tipo] = [i for i, opt in enumerate(self.options) if tipo in opt["label"].lower()]
+        return self._pick(self._por_etiqueta[tipo])
+
+    def for_values(self, values):
+        """Opciones de los valores dados (en el orden del catálogo)."""
+        return self._pick(sorted(self.index[v] for v in set(values or []) if v in self.index))
@@ -0,0 +1,97 @@
+# utils/partitions.py
+import logging
+import shutil
+from pathlib import Path
+import duckdb
+import pandas as pd
+
+
+def partitions_dir(dataset_info: dict) -> Path:
+    """Directorio con el dataset procesado particionado: processed/partitions/year=YYYY/month=M/"""
+    return Path(dataset_info["duckdb"]).parent / "partitions"
+
+
+def partition_key(year: int, month: int) -> str:
+    return f"{int(year):04d}-{int(month):02d}"
+
+
+def _partition_path(out_dir: Path, key: str) -> Path:
+    year, month = key.split("-")
+    return out_dir / f"year={int(year)}" / f"month={int(month)}"
+
+
+def list_partitions(out_dir: Path):
+    """Claves 'YYYY-MM' de las particiones escritas, ordenadas."""
+    out_dir = Path(out_dir)
+    if not out_dir.exists():
+        return []
+    keys = []
+    for month_dir in out_dir.glob("year=*/month=*"):
+        if any(month_dir.glob("*.parquet")):
+            year = month_dir.parent.name.split("=", 1)[1]
+            month = month_dir.name.split("=", 1)[1]
+            keys.append(partition_key(year, month))
+    return sorted(keys)
+
+
+def partitions_in_range(x_min=None, x_max=None, available=None):
+    """
+    Claves 'YYYY-MM' que solapan [x_min, x_max]. Sin límites -> todas las
+    disponibles. Si se pasa `available`, se filtra a las que existen.
+    """
+    if x_min is None or x_max is None:
+        return list(available or [])
+    months = pd.period_range(pd.Timestamp(x_min).to_period("M"), pd.Timestamp(x_max).to_period("M"), freq="M")
+    keys = [partition_key(p.year, p.month) for p in months]
+    if available is not None:
+        avail = set(available)
+        keys = [k for k in keys if k in avail]
+    return keys
+
+
+def write_partitions(con, table: str, out_dir: Path, ts_min=None, ts_max=None, ts_col: str = "Timestamp"):
+    """
+    Exporta la tabla a Parquet particionado por año/mes.
+    Con ts_min/ts_max solo se reescriben los meses que tocan ese tramo
+    (tras una ingesta incremental); sin ellos se reescribe todo.
+    """
+    out_dir = Path(out_dir)
+    where = ""
+    if ts_min is not None and ts_max is not None:
+        keys = partitions_in_range(ts_min, ts_max)
+        for key in keys:
+            shutil.rmtree(_partition_path(out_dir, key), ignore_errors=True)
+        lo = pd.Timestamp(ts_min).to_period("M").start_time
+        hi = pd.Timestamp(ts_max).to_period("M").end_time
+        where = f"WHERE \"{ts_col}\" BETWEEN '{lo}' AND '{hi}'"
+    else:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    con.execute(f"""
+        COPY (
+            SELECT *, year("{ts_col}") AS year, month("{ts_col}") AS month
+            FROM {table} {where}
+            ORDER BY "{ts_col}"
+        ) TO '{out_dir.as_posix()}' (FORMAT PARQUET, PARTITION_BY (year, month), OVERWRITE_OR_IGNORE true)
+    """)
+    logging.info("🗂️ Particiones de %s escritas en %s", table, out_dir)
+
+
+def read_partition(out_dir: Path, key: str, columns=None, ts_col: str = "Timestamp") -> pd.DataFrame:
+    """
+    Lee una partición mensual (opcionalmente solo algunas columnas) ordenada
+    por tiempo. El orden es determinista aunque haya timestamps repetidos
+    (desempate por fichero y fila), así que columnas leídas por separado
+    quedan alineadas.
+    """
+    files = sorted(_partition_path(Path(out_dir), key).glob("*.parquet"))
+    if not files:
+        return pd.DataFrame()
+    file_list = ", ".join(f"'{f.as_posix()}'" for f in files)
+    select = "*" if columns is None else ", ".join(f'"{c}"' for c in [ts_col, *[c for c in columns if c != ts_col]])
+    with duckdb.connect() as con:
+        return con.execute(
+            f"SELECT {select} FROM read_parquet([{file_list}], hive_partitioning = false, filename = true, file_row_number = true) "
+            f"ORDER BY \"{ts_col}\", filename, file_row_number"
+        ).df()
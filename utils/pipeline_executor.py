@@ -0,0 +1,183 @@
+# utils/pipeline_executor.py
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+# -----------------------------------------------------------
+# Ejecutor de la pipeline de limpieza definida en control_dataset.yml
+#   - cada paso de available_functions se resuelve con module + func
+#   - los pasos forman una cadena en el orden del YAML: la entrada de cada
+#     uno es la salida del anterior (el primero recibe la lista de CSV si su
+#     primer parámetro es un patrón/lista de ficheros; si no, los CSV leídos)
+#   - la salida de cada paso se guarda como checkpoint Parquet en
+#     processed/checkpoints/, con clave = hash(huella de los CSV + config y
+#     código de todos los pasos hasta él). Al cambiar un paso solo se
+#     re-ejecutan ese paso y los siguientes; sin cambios, se lee el último.
+# -----------------------------------------------------------
+
+CHECKPOINT_DIR = "checkpoints"
+
+# primeros parámetros que indican que el paso lee los ficheros él mismo
+_PARAMS_FICHEROS = ("file_pattern", "csv_list", "files", "pattern_csv")
+
+
+class PipelineStep:
+    def __init__(self, name: str, cfg: dict, legacy=None):
+        self.name = name
+        self.cfg = cfg or {}
+        self.params = dict(self.cfg.get("params") or {})
+        self.func = self._resolver(legacy)
+        self.signature = inspect.signature(self.func)
+        primero = next(iter(self.signature.parameters), None)
+        self.reads_files = primero in _PARAMS_FICHEROS
+
+    def _resolver(self, legacy):
+        module, func = self.cfg.get("module"), self.cfg.get("func")
+        if module and func:
+            return getattr(importlib.import_module(module), func)
+        if legacy is not None:
+            logging.warning("Paso %s sin module/func: se usa la implementación por defecto", self.name)
+            return legacy
+        raise ValueError(f"El paso {self.name} necesita 'module' y 'func'")
+
+    def fingerprint(self) -> str:
+        """Config del paso + código fuente de su módulo (editar la función invalida el checkpoint)."""
+        try:
+            codigo = hashlib.sha1(Path(inspect.getsourcefile(self.func)).read_bytes()).hexdigest()
+        except (TypeError, OSError):
+            codigo = getattr(self.func, "__qualname__", self.name)
+        config = {k: self.cfg.get(k) for k in ("module", "func", "params")}
+        return json.dumps({"name": self.name, "config": config, "code": codigo}, sort_keys=True, default=str)
+
+    def __call__(self, entrada, timestamp_col: str):
+        # parámetros conocidos que la pipeline siempre ha pasado + params del YAML
+        disponibles = {"df_name": "MergedDataset", "timestamp_col": timestamp_col, "year_filter": None}
+        acepta_kwargs = any(p.kind == p.VAR_KEYWORD for p in self.signature.parameters.values())
+        kwargs = {k: v for k, v in disponibles.items() if k in self.signature.parameters}
+        kwargs.update({k: v for k, v in self.params.items() if acepta_kwargs or k in self.signature.parameters})
+        out = self.func(entrada, **kwargs)
+        # algunos pasos devuelven (df, extra), p.ej. rellenar_timestamps -> (df, huecos)
+        if isinstance(out, tuple):
+            df, *extra = out
+            if extra and hasattr(extra[0], "__len__"):
+                logging.info(f"⚠️ Huecos detectados: {len(extra[0])}")
+            return df
+        return out
+
+
+def resolve_steps(funcs_map: dict, legacy: dict = None) -> list:
+    """Pasos habilitados, en el orden del YAML."""
+    legacy = legacy or {}
+    return [PipelineStep(name, cfg, legacy.get(name)) for name, cfg in funcs_map.items() if cfg.get("enabled", False)]
+
+
+def input_fingerprint(csv_list, timestamp_col: str) -> str:
+    """Huella barata de la entrada: nombre, tamaño y mtime de cada CSV (sin leerlos)."""
+    partes = [timestamp_col]
+    for f in csv_list:
+        try:
+            st = os.stat(f)
+            partes.append(f"{Path(f).name}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            partes.append(f"{f}:?")
+    return hashlib.sha1("|".join(partes).encode()).hexdigest()
+
+
+def step_keys(steps: list, fingerprint: str) -> list:
+    """Clave de cada paso encadenada con las anteriores: cambiar uno invalida los siguientes."""
+    keys, prev = [], fingerprint
+    for step in steps:
+        prev = hashlib.sha1((prev + step.fingerprint()).encode()).hexdigest()
+        keys.append(prev)
+    return keys
+
+
+# -----------------------------------------------------------
+# Checkpoints (Parquet vía DuckDB, sin depender de pyarrow)
+# -----------------------------------------------------------
+def _checkpoint_path(out_dir: Path, i: int, step: PipelineStep, key: str) -> Path:
+    return Path(out_dir) / f"{i:02d}_{step.name}-{key[:16]}.parquet"
+
+
+def _write_checkpoint(df: pd.DataFrame, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # el índice (Timestamp tras merge_all_datasets) se guarda como columna
+    if isinstance(df.index, pd.RangeIndex):
+        frame, indice, nombres = df.reset_index(drop=True), [], []
+    else:
+        frame = df.reset_index()
+        indice, nombres = list(frame.columns[:df.index.nlevels]), list(df.index.names)
+    tmp = path.with_name(path.name + ".tmp")
+    con = duckdb.connect()
+    try:
+        con.register("checkpoint_df", frame)
+        con.execute(f"COPY checkpoint_df TO '{tmp.as_posix()}' (FORMAT PARQUET)")
+    finally:
+        con.close()
+    path.with_suffix(".json").write_text(json.dumps({"index": indice, "names": nombres}), encoding="utf-8")
+    os.replace(tmp, path)
+
+    # solo se conserva el checkpoint vigente de cada posición de la pipeline
+    prefijo = path.name.split("-", 1)[0] + "-"
+    for old in path.parent.glob(f"{prefijo}*"):
+        if old.name not in (path.name, path.with_suffix(".json").name):
+            old.unlink(missing_ok=True)
+
+
+def _read_checkpoint(path: Path) -> pd.DataFrame:
+    con = duckdb.connect()
+    try:
+        df = con.execute(f"SELECT * FROM read_parquet('{path.as_posix()}')").df()
+    finally:
+        con.close()
+    meta = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+    if meta.get("index"):
+        df = df.set_index(meta["index"])
+        df.index.names = meta["names"]
+    return df
+
+
+def run_pipeline(csv_list: list, steps: list, timestamp_col: str, read_csvs, progress=None,
+                 checkpoint_dir: Path = None) -> pd.DataFrame:
+    """
+    Ejecuta los pasos en cadena. Con checkpoint_dir, arranca desde el último
+    checkpoint válido y guarda la salida de cada paso que ejecuta.
+    `read_csvs()` lee los CSV una sola vez cuando el primer paso espera un DF.
+    """
+    progress = progress or (lambda paso: None)
+    keys = step_keys(steps, input_fingerprint(csv_list, timestamp_col))
+
+    df, inicio = None, 0
+    if checkpoint_dir is not None:
+        for i in range(len(steps) - 1, -1, -1):
+            path = _checkpoint_path(checkpoint_dir, i, steps[i], keys[i])
+            if path.exists() and path.with_suffix(".json").exists():
+                progress("checkpoint")
+                df, inicio = _read_checkpoint(path), i + 1
+                logging.info("♻️ Checkpoint de %s reutilizado (%s filas); quedan %s pasos",
+                             steps[i].name, len(df), len(steps) - inicio)
+                break
+
+    for i in range(inicio, len(steps)):
+        step = steps[i]
+        progress(step.name)
+        if df is None:
+            entrada = list(csv_list) if step.reads_files else read_csvs()
+        else:
+            entrada = df
+        logging.info("Ejecutando %s", step.name)
+        df = step(entrada, timestamp_col)
+        if df is None:
+            raise RuntimeError(f"El paso {step.name} no devolvió un DataFrame.")
+        logging.info(f"✔️ [{i}] {step.name}: {len(df)} filas, {len(df.columns)} columnas")
+        if checkpoint_dir is not None:
+            _write_checkpoint(df, _checkpoint_path(checkpoint_dir, i, step, keys[i]))
+
+    return df
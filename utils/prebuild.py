@@ -0,0 +1,103 @@
+# utils/prebuild.py
+"""
+Construcción previa de todos los datasets, antes de arrancar el servidor.
+
+Escanea Datasets/, y para cada dataset sin versión publicada o desfasado
+respecto a raw/ (dataset_needs_build) lanza run_build: DuckDB, pirámide,
+índice de huecos, particiones y almacén compartido, publicados con
+os.replace como en las construcciones en segundo plano. Los datasets se
+construyen en paralelo, uno por proceso. Sin cambios en la entrada no hace
+nada; los datasets sin CSV en raw/ se saltan.
+
+Uso:
+    python -m utils.prebuild                      # todos los datasets de Datasets/
+    python -m utils.prebuild --dataset MDS-Dataset --workers 2
+    python -m utils.prebuild --check              # código 0 si todo se puede servir
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from utils.build_jobs import is_ready, read_build_status, readiness, run_build
+from utils.dataset_manager import scan_datasets
+
+DATASETS_DIR = Path(__file__).resolve().parents[1] / "Datasets"
+
+
+def prebuild(datasets: dict, workers: int = None) -> dict:
+    """
+    Construye en paralelo los datasets pendientes y los que fallaron sin
+    dejar una versión al día (se reintentan). Devuelve {dataset: estado} de
+    los que se intentaron construir ("done", "error" o "busy" si otro
+    proceso ya lo estaba construyendo).
+    """
+    estado = readiness(datasets)
+    for nombre in estado["empty"]:
+        logging.info("📭 %s: sin CSV en raw/, no se construye", nombre)
+    pendientes = {**estado["pending"], **estado["errors"]}
+    if not pendientes:
+        logging.info("✅ Todos los datasets están al día: nada que construir")
+        return {}
+    logging.info("🏗️ Datasets a construir: %s", ", ".join(pendientes))
+
+    nombres = list(pendientes)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(nombres)))
+    t = time.time()
+    if workers == 1:
+        for nombre in nombres:
+            run_build(nombre, datasets[nombre])
+    else:
+        # spawn: mismos procesos limpios que las construcciones en segundo plano
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for fut in [pool.submit(run_build, nombre, datasets[nombre]) for nombre in nombres]:
+                fut.result()
+
+    resultado = {}
+    for nombre in nombres:
+        status = read_build_status(datasets[nombre]) or {}
+        estado = status.get("state")
+        resultado[nombre] = estado if estado in ("done", "error") else "busy"
+        if estado == "error":
+            logging.error("❌ %s: %s", nombre, status.get("error"))
+    logging.info("🏁 Construcción previa terminada en %.1f s: %s", time.time() - t, resultado)
+    return resultado
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Construye todos los datasets antes de arrancar el servidor.")
+    parser.add_argument("--base-dir", default=str(DATASETS_DIR), help="Carpeta con los datasets")
+    parser.add_argument("--dataset", nargs="*", help="Datasets a construir (por defecto todos)")
+    parser.add_argument("--workers", type=int, help="Procesos en paralelo (por defecto nº de CPUs)")
+    parser.add_argument("--check", action="store_true", help="Solo comprobar: código 0 si todo está listo")
+    args = parser.parse_args(argv)
+
+    datasets = scan_datasets(Path(args.base_dir))
+    if args.dataset:
+        desconocidos = set(args.dataset) - set(datasets)
+        if desconocidos:
+            parser.error(f"Datasets desconocidos: {', '.join(sorted(desconocidos))}")
+        datasets = {k: v for k, v in datasets.items() if k in args.dataset}
+
+    if args.check:
+        estado = readiness(datasets)
+        for nombre, motivo in estado["pending"].items():
+            logging.info("⏳ %s: %s", nombre, motivo)
+        for nombre, error in estado["errors"].items():
+            sin_version = " (sin versión publicada)" if nombre in estado["unbuilt"] else ""
+            logging.warning("❌ %s: última construcción fallida%s: %s", nombre, sin_version, error)
+        for nombre in estado["empty"]:
+            logging.info("📭 %s: sin CSV en raw/", nombre)
+        return 0 if is_ready(estado) else 1
+
+    resultado = prebuild(datasets, args.workers)
+    return 1 if "error" in resultado.values() else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# utils/ram_cache.py
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Presupuesto por defecto (MB) de la caché de DFs en RAM de cada worker.
+# Se puede cambiar con la variable de entorno RAM_CACHE_BUDGET_MB.
+DEFAULT_BUDGET_MB = 1024
+
+
+def frame_nbytes(obj) -> int:
+    """Huella en memoria de un DF/serie (deep=True para contar strings/objetos) o tupla de arrays."""
+    if isinstance(obj, (tuple, list)):
+        return sum(frame_nbytes(o) for o in obj)
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True, index=True))
+    return int(getattr(obj, "nbytes", 0))
+
+
+def budget_from_env(var: str = "RAM_CACHE_BUDGET_MB", default_mb: float = DEFAULT_BUDGET_MB) -> int:
+    try:
+        mb = float(os.environ.get(var, default_mb))
+    except ValueError:
+        mb = default_mb
+    return int(mb * 1024 * 1024)
+
+
+class RamCache:
+    """
+    Caché LRU con presupuesto en bytes y la interfaz de dict que ya usaba
+    RAM_DATASETS (get, [], in, del, keys...). Cada entrada se mide al
+    guardarse; si el total supera el presupuesto se expulsan las menos
+    usadas recientemente (nunca la que se acaba de guardar). Las claves
+    pueden ser un dataset entero, una partición o una columna: la expulsión
+    trabaja igual sobre cualquiera de ellas.
+    """
+
+    def __init__(self, budget_bytes: int = None):
+        self.budget_bytes = budget_from_env() if budget_bytes is None else int(budget_bytes)
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.RLock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- lectura ---
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._data[key]
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(list(self._data.keys()))
+
+    def keys(self):
+        return list(self._data.keys())
+
+    # --- escritura ---
+    def __setitem__(self, key, value):
+        size = frame_nbytes(value)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = value
+            self._sizes[key] = size
+            self.nbytes += size
+            if size > self.budget_bytes:
+                logging.warning("Entrada %s (%.1f MB) supera el presupuesto de la caché (%.1f MB)",
+                                key, size / 2**20, self.budget_bytes / 2**20)
+            self._evict(keep=key)
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key not in self._data:
+                raise KeyError(key)
+            self._drop(key)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key]
+            self._drop(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def set_budget(self, budget_bytes: int):
+        with self._lock:
+            self.budget_bytes = int(budget_bytes)
+            self._evict()
+
+    def _drop(self, key):
+        del self._data[key]
+        self.nbytes -= self._sizes.pop(key, 0)
+
+    def _evict(self, keep=None):
+        while self.nbytes > self.budget_bytes:
+            victim = next((k for k in self._data if k != keep), None)
+            if victim is None:
+                break
+            size = self._sizes.get(victim, 0)
+            self._drop(victim)
+            self.evictions += 1
+            logging.info("♻️ Caché RAM: expulsado %s (%.1f MB)", victim, size / 2**20)
+
+    # --- métricas ---
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self.nbytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
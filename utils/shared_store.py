@@ -0,0 +1,163 @@
+# utils/shared_store.py
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from utils.dtype_plan import NUMPY_TYPES, load_dtype_plan
+
+# Almacén de columnas compartido entre procesos (workers de gunicorn):
+#   processed/shared/<version>/<i>.npy   una columna por fichero, ordenadas por Timestamp
+#   processed/shared/<version>/meta.json columnas, dtypes, filas
+#   processed/shared/CURRENT              puntero a la versión vigente
+# Cada worker abre los .npy con mmap de solo lectura, así que todas las
+# copias comparten las mismas páginas de la caché del sistema operativo.
+
+POINTER_FILE = "CURRENT"
+META_FILE = "meta.json"
+EXPORT_CHUNK_VECTORS = 64  # vectores de 2048 filas por bloque al exportar
+
+_NUMERIC_TYPES = ("DOUBLE", "FLOAT", "REAL", "DECIMAL", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "HUGEINT",
+                  "UINTEGER", "UBIGINT", "USMALLINT", "UTINYINT", "BOOLEAN")
+
+
+def shared_store_dir(dataset_info: dict) -> Path:
+    return Path(dataset_info["duckdb"]).parent / "shared"
+
+
+def current_store_version(dataset_info: dict):
+    """Versión a la que apunta CURRENT (None si todavía no hay almacén)."""
+    pointer = shared_store_dir(dataset_info) / POINTER_FILE
+    try:
+        return pointer.read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def has_shared_store(dataset_info: dict) -> bool:
+    version = current_store_version(dataset_info)
+    return version is not None and (shared_store_dir(dataset_info) / version / META_FILE).exists()
+
+
+def write_shared_store(con, table: str, dataset_info: dict, ts_col: str = "Timestamp"):
+    """
+    Exporta la tabla a una versión nueva del almacén y mueve CURRENT a ella
+    de forma atómica (os.replace). Los workers que ya tenían mapeada la
+    versión anterior la siguen leyendo hasta que detectan el cambio de
+    puntero; las versiones más antiguas se borran.
+    Solo se exportan tablas con columnas numéricas/booleanas (el .npy de
+    objetos no se puede mapear); si hay otras, no se crea almacén.
+    """
+    desc = con.execute(f"DESCRIBE {table}").fetchall()
+    columns = [r[0] for r in desc]
+    tipos = {r[0]: str(r[1]).upper() for r in desc}
+    plan = load_dtype_plan(con, table)
+    no_numericas = [r[0] for r in desc if r[0] != ts_col and not str(r[1]).upper().startswith(_NUMERIC_TYPES)]
+    if no_numericas:
+        logging.warning("Almacén compartido omitido para %s: columnas no numéricas %s", table, no_numericas)
+        return None
+
+    base = shared_store_dir(dataset_info)
+    base.mkdir(parents=True, exist_ok=True)
+    version = f"v{time.time_ns():x}"
+    out_dir = base / version
+    out_dir.mkdir()
+
+    # filas sin Timestamp fuera: romperían el orden que usa searchsorted
+    where = f'WHERE "{ts_col}" IS NOT NULL'
+    valores = [c for c in columns if c != ts_col]
+    conteos = con.execute(
+        "SELECT count(*)" + "".join(f', count(*) - count("{c}")' for c in valores) + f" FROM {table} {where}"
+    ).fetchone()
+    n_rows, nulos = conteos[0], dict(zip(valores, conteos[1:]))
+
+    dtypes, selects = {}, []
+    for col in columns:
+        if col == ts_col:
+            dtypes[col] = "datetime64[ns]"
+            selects.append(f'epoch_ns("{ts_col}")')
+            continue
+        # se conserva el tipo compacto de la tabla (plan de dtypes); con NULL
+        # se guarda como float para poder usar NaN
+        dtype = "bool" if plan.get(col) == "bool" else NUMPY_TYPES.get(tipos[col], "float64")
+        if nulos[col] and not dtype.startswith("float"):
+            dtype = "float64"
+        dtypes[col] = dtype
+        selects.append(f'"{col}"' if tipos[col] in NUMPY_TYPES else f'"{col}"::DOUBLE')
+
+    # un único recorrido ordenado (rowid desempata Timestamps repetidos igual
+    # para todas las columnas) volcado por bloques a los .npy abiertos
+    salidas = [np.lib.format.open_memmap(out_dir / f"{i}.npy", mode="w+", dtype=dtypes[col], shape=(n_rows,))
+               for i, col in enumerate(columns)]
+    res = con.execute(
+        f"SELECT {', '.join(selects)} FROM {table} {where} ORDER BY \"{ts_col}\", rowid"
+    )
+    fila = 0
+    while True:
+        bloque = res.fetch_df_chunk(EXPORT_CHUNK_VECTORS)
+        if bloque.empty:
+            break
+        n = len(bloque)
+        for i, col in enumerate(columns):
+            serie = bloque.iloc[:, i]
+            if col == ts_col:
+                salidas[i][fila:fila + n] = serie.to_numpy(dtype="int64").view("datetime64[ns]")
+            elif dtypes[col].startswith("float"):
+                salidas[i][fila:fila + n] = serie.to_numpy(dtype=dtypes[col], na_value=np.nan)
+            else:
+                salidas[i][fila:fila + n] = serie.to_numpy(dtype=dtypes[col])
+        fila += n
+    for salida in salidas:
+        salida.flush()
+    del salidas
+
+    meta = {"version": version, "table": table, "ts_col": ts_col, "n_rows": int(n_rows),
+            "columns": columns, "dtypes": dtypes}
+    (out_dir / META_FILE).write_text(json.dumps(meta), encoding="utf-8")
+
+    publish_store_version(dataset_info, version)
+    logging.info("🧠 Almacén compartido de %s: versión %s (%s filas)", table, version, n_rows)
+    return version
+
+
+def publish_store_version(dataset_info: dict, version: str):
+    """Mueve CURRENT a `version` (os.replace) y borra las demás versiones."""
+    base = shared_store_dir(dataset_info)
+    tmp = base / f"{POINTER_FILE}.tmp"
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, base / POINTER_FILE)
+
+    # los ficheros ya mapeados siguen siendo válidos tras borrarlos (POSIX)
+    for old in base.iterdir():
+        if old.is_dir() and old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+class SharedStore:
+    """Columnas de una versión del almacén mapeadas en memoria (solo lectura)."""
+
+    def __init__(self, dataset_info: dict, version: str = None):
+        self.version = version or current_store_version(dataset_info)
+        if self.version is None:
+            raise FileNotFoundError(f"Sin almacén compartido en {shared_store_dir(dataset_info)}")
+        path = shared_store_dir(dataset_info) / self.version
+        meta = json.loads((path / META_FILE).read_text(encoding="utf-8"))
+        self.ts_col = meta["ts_col"]
+        self.columns = meta["columns"]
+        self.n_rows = meta["n_rows"]
+        self.arrays = {col: np.load(path / f"{i}.npy", mmap_mode="r") for i, col in enumerate(self.columns)}
+
+    def slice(self, x_min=None, x_max=None, columns=None) -> pd.DataFrame:
+        """
+        Filas con Timestamp en [x_min, x_max] como DataFrame sin copia: cada
+        columna es una vista del mmap (localizada con searchsorted).
+        """
+        ts = self.arrays[self.ts_col]
+        i0 = 0 if x_min is None else int(np.searchsorted(ts, np.datetime64(pd.Timestamp(x_min), "ns"), side="left"))
+        i1 = len(ts) if x_max is None else int(np.searchsorted(ts, np.datetime64(pd.Timestamp(x_max), "ns"), side="right"))
+        cols = self.columns if columns is None else [self.ts_col, *[c for c in columns if c != self.ts_col]]
+        return pd.DataFrame({c: self.arrays[c][i0:i1] for c in cols}, copy=False)
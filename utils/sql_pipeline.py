@@ -0,0 +1,208 @@
+# utils/sql_pipeline.py
+import inspect
+import logging
+from pathlib import Path
+
+from utils.clean_functions._0_merge_datasets import merge_all_datasets
+from utils.clean_functions._2_clean_and_unify_duplicatses import clean_and_unify_duplicates
+from utils.clean_functions._3_negative_frec import negative_freq_report
+from utils.clean_functions._4_missing_data import rellenar_timestamps
+from utils.clean_functions._5_nomalizar_timestamps import normalize_timestamp_column
+
+# -----------------------------------------------------------
+# Backend DuckDB de la pipeline de limpieza (pipelineCleanData.backend: duckdb)
+#   - los pasos conocidos se traducen a SQL y se encadenan como CTE sobre
+#     read_csv de los ficheros raw; una sola sentencia CREATE TABLE AS,
+#     multihilo y con spill a disco, sin pasar por DataFrames de pandas
+#       · merge_all_datasets          -> read_csv + try_cast del Timestamp
+#       · clean_and_unify_duplicates  -> GROUP BY Timestamp con la suma compensada
+#                                        de pandas en el orden de las filas
+#       · negative_freq_report        -> CASE abs(x - sentinela) <= atol
+#       · rellenar_timestamps         -> LAG + moda de los deltas + generate_series
+#       · normalize_timestamp_column  -> (el Timestamp ya es columna)
+#   - el resultado es el mismo que el de la pipeline pandas salvo en la
+#     lectura: read_csv de pandas (float_precision por defecto) puede fallar
+#     en el último bit con valores de 17 cifras significativas, que DuckDB
+#     lee exactos (diferencias relativas < 1e-15)
+#   - los pasos con module/func propios no tienen traducción y obligan a usar
+#     backend pandas
+# -----------------------------------------------------------
+
+BACKENDS = ("pandas", "duckdb")
+_TIPOS_NUMERICOS = ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+                    "UINTEGER", "UBIGINT", "FLOAT", "DOUBLE", "DECIMAL")
+# columnas auxiliares de orden: fichero y fila de origen, fila de relleno
+_AUX = ("__fichero", "__fila", "__relleno")
+
+
+def pipeline_backend(pipeline: dict) -> str:
+    backend = str((pipeline or {}).get("backend") or "pandas").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"pipelineCleanData.backend desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+    return backend
+
+
+def _q(nombre: str) -> str:
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+
+def csv_source_sql(con, csv_list, timestamp_col: str = "Timestamp"):
+    """
+    (sql, columnas) de la lectura de los CSV con el criterio de
+    merge_all_datasets: Timestamp a TIMESTAMP_NS, filas con timestamp
+    inválido fuera, medidas numéricas como DOUBLE y las columnas auxiliares
+    __fichero/__fila para ordenar de forma estable como el mergesort.
+    """
+    union = "\nUNION ALL BY NAME\n".join(
+        f"SELECT {i} AS __fichero, row_number() OVER () AS __fila, * "
+        f"FROM read_csv('{Path(f).as_posix()}', header = true, types = {{'{timestamp_col}': 'VARCHAR'}})"
+        for i, f in enumerate(csv_list)
+    )
+    columnas, selects = [], []
+    for nombre, tipo, *_ in con.execute(f"DESCRIBE SELECT * FROM ({union})").fetchall():
+        if nombre in _AUX or nombre == timestamp_col:
+            continue
+        columnas.append(nombre)
+        if tipo.split("(")[0] in _TIPOS_NUMERICOS:
+            selects.append(f"CAST({_q(nombre)} AS DOUBLE) AS {_q(nombre)}")
+        else:
+            selects.append(_q(nombre))
+    ts = f"try_cast({_q(timestamp_col)} AS TIMESTAMP_NS)"
+    sql = (
+        f"SELECT {ts} AS {_q(timestamp_col)}{''.join(', ' + s for s in selects)}, "
+        f"__fichero, __fila, 0 AS __relleno\n"
+        f"FROM ({union})\nWHERE {ts} IS NOT NULL"
+    )
+    return sql, columnas
+
+
+def _params(func, step) -> dict:
+    """Parámetros por defecto de la función pandas + los del YAML."""
+    out = {k: p.default for k, p in inspect.signature(func).parameters.items() if p.default is not p.empty}
+    out.update(step.params)
+    return out
+
+
+# -----------------------------------------------------------
+# Traducción de cada paso a CTE: (nombre, sql) leyendo de `prev`
+# -----------------------------------------------------------
+def _media_kahan(col: str) -> str:
+    """
+    Media como groupby().mean() de pandas: suma compensada (Kahan) de los
+    valores no nulos en el orden de las filas de origen, dividida por su
+    número. avg() suma en otro orden y difiere en el último bit (~1e-16
+    relativo), lo que rompería la igualdad exacta con el backend pandas.
+    """
+    c = _q(col)
+    t = "(a.s + (e.s - a.c))"
+    comp = f"(({t} - a.s) - (e.s - a.c))"
+    # con ±inf la compensación es NaN: pandas la pone a 0 (GH#50367)
+    kahan = f"(a, e) -> {{'s': {t}, 'c': CASE WHEN isnan({comp}) THEN 0.0 ELSE {comp} END}}"
+    return (
+        f"list_reduce(list_transform(list({c} ORDER BY __fichero, __fila) FILTER (WHERE {c} IS NOT NULL), "
+        f"x -> {{'s': x, 'c': 0.0::DOUBLE}}), {kahan}, {{'s': 0.0::DOUBLE, 'c': 0.0::DOUBLE}}).s "
+        f"/ nullif(count({c}), 0)"
+    )
+
+
+def _sql_duplicados(pre: str, prev: str, columnas: list, ts: str) -> list:
+    """
+    Timestamps repetidos -> una fila con la media de cada columna. Solo los
+    grupos con más de una fila pasan por la suma compensada (es cara); el
+    resto sigue tal cual, que es lo que da la media de un único valor.
+    """
+    medias = "".join(f", {_media_kahan(c)} AS {_q(c)}" for c in columnas)
+    return [
+        (f"{pre}repetidos", f"SELECT {_q(ts)} FROM {prev} GROUP BY {_q(ts)} HAVING count(*) > 1"),
+        (f"{pre}medias",
+         f"SELECT {_q(ts)}{medias}, min(__fichero) AS __fichero, min(__fila) AS __fila, "
+         f"min(__relleno) AS __relleno FROM {prev} SEMI JOIN {pre}repetidos USING ({_q(ts)}) GROUP BY {_q(ts)}"),
+        (f"{pre}dups",
+         f"SELECT * FROM {prev} ANTI JOIN {pre}repetidos USING ({_q(ts)}) "
+         f"UNION ALL BY NAME SELECT * FROM {pre}medias"),
+    ]
+
+
+def _sql_sentinelas(pre: str, prev: str, columnas: list, params: dict) -> list:
+    sentinels = params.get("sentinels")
+    sentinels = [float(sentinels)] if isinstance(sentinels, (int, float)) else [float(s) for s in sentinels]
+    atol = float(params.get("atol", 1e-6))
+    cols = [c for c in params.get("freq_cols", ()) if c in columnas]
+    if not cols or not sentinels:
+        return []
+    reemplazos = ", ".join(
+        f"CASE WHEN {' OR '.join(f'abs({_q(c)} - {s!r}) <= {atol!r}' for s in sentinels)} "
+        f"THEN NULL ELSE {_q(c)} END AS {_q(c)}"
+        for c in cols
+    )
+    return [(f"{pre}sentinelas", f"SELECT * REPLACE ({reemplazos}) FROM {prev}")]
+
+
+def _sql_relleno(pre: str, prev: str, columnas: list, params: dict, ts: str) -> list:
+    """
+    Igual que rellenar_timestamps: resolución = moda de los deltas (la menor
+    si hay empate), hueco si |delta - res| > margen y floor((delta + margen)
+    / res) - 1 filas de relleno a prev + j·res, detrás de las originales.
+    """
+    margen = float(params.get("margen", 0.5))
+    valor = float(params.get("valor_relleno", 999999.0))
+    relleno = "".join(f", {valor!r} AS {_q(c)}" for c in columnas)
+    return [
+        (f"{pre}deltas",
+         f"SELECT lag(epoch_ns({_q(ts)})) OVER (ORDER BY {_q(ts)}) AS p, epoch_ns({_q(ts)}) AS c FROM {prev}"),
+        (f"{pre}resolucion",
+         f"SELECT c - p AS res FROM {pre}deltas WHERE p IS NOT NULL GROUP BY c - p ORDER BY count(*) DESC, res LIMIT 1"),
+        (f"{pre}huecos",
+         f"SELECT p, res, greatest(0, CAST(floor(((c - p) / 1e9 + {margen!r}) / (res / 1e9)) AS BIGINT) - 1) AS n "
+         f"FROM {pre}deltas, {pre}resolucion WHERE p IS NOT NULL AND abs((c - p) / 1e9 - res / 1e9) > {margen!r}"),
+        (f"{pre}nuevos",
+         f"SELECT make_timestamp_ns(p + j * res) AS {_q(ts)}{relleno}, "
+         f"NULL::BIGINT AS __fichero, NULL::BIGINT AS __fila, 1 AS __relleno "
+         f"FROM (SELECT p, res, unnest(generate_series(1, n)) AS j FROM {pre}huecos WHERE n > 0)"),
+        (f"{pre}relleno", f"SELECT * FROM {prev} UNION ALL BY NAME SELECT * FROM {pre}nuevos"),
+    ]
+
+
+def build_pipeline_sql(con, table: str, csv_list, steps: list, timestamp_col: str = "Timestamp") -> str:
+    """Sentencia CREATE TABLE AS con todos los pasos habilitados encadenados como CTE."""
+    fuente, columnas = csv_source_sql(con, csv_list, timestamp_col)
+    ctes, prev = [("fuente", fuente)], "fuente"
+
+    for i, step in enumerate(steps):
+        if step.func is merge_all_datasets:
+            if i:
+                raise ValueError(f"{step.name} solo puede ser el primer paso con backend duckdb")
+            continue
+        pre = f"s{i}_"  # prefijo por posición: un paso puede repetirse
+        if step.func is clean_and_unify_duplicates:
+            nuevas = _sql_duplicados(pre, prev, columnas, timestamp_col)
+        elif step.func is negative_freq_report:
+            nuevas = _sql_sentinelas(pre, prev, columnas, _params(negative_freq_report, step))
+        elif step.func is rellenar_timestamps:
+            nuevas = _sql_relleno(pre, prev, columnas, _params(rellenar_timestamps, step), timestamp_col)
+        elif step.func is normalize_timestamp_column:
+            nuevas = []
+        else:
+            raise ValueError(f"El paso {step.name} no tiene traducción SQL: usa pipelineCleanData.backend: pandas")
+        ctes += nuevas
+        if nuevas:
+            prev = nuevas[-1][0]
+        logging.info("🦆 Paso %s traducido a SQL", step.name)
+
+    cuerpo = ",\n".join(f"{nombre} AS (\n{sql}\n)" for nombre, sql in ctes)
+    select = ", ".join(_q(c) for c in [timestamp_col, *columnas])
+    return (
+        f"CREATE OR REPLACE TABLE {table} AS\nWITH {cuerpo}\n"
+        f"SELECT {select} FROM {prev}\nORDER BY {_q(timestamp_col)}, __relleno, __fichero, __fila"
+    )
+
+
+def run_sql_pipeline(con, table: str, csv_list, steps: list, timestamp_col: str = "Timestamp", progress=None) -> int:
+    """Ejecuta la pipeline en DuckDB y deja el resultado en `table`. Devuelve el número de filas."""
+    progress = progress or (lambda paso: None)
+    progress("sql_pipeline")
+    logging.info("🦆 Pipeline de limpieza en DuckDB sobre %s CSV", len(csv_list))
+    con.execute(build_pipeline_sql(con, table, csv_list, steps, timestamp_col))
+    filas = con.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+    logging.info("✅ Pipeline SQL completada: %s filas", filas)
+    return filas
@@ -0,0 +1,181 @@
+# utils/streaming_pipeline.py
+import logging
+
+import pandas as pd
+
+from utils.clean_functions._0_merge_datasets import merge_all_datasets
+from utils.clean_functions._2_clean_and_unify_duplicatses import clean_and_unify_duplicates
+from utils.clean_functions._4_missing_data import rellenar_timestamps, rellenar_timestamps_por_bloques
+from utils.sql_pipeline import csv_source_sql
+
+# -----------------------------------------------------------
+# Modo streaming (fuera de memoria) de la pipeline de limpieza
+#   - DuckDB lee todos los CSV y los ordena por tiempo (con spill a disco si
+#     no cabe en RAM); los bloques de `chunk_rows` filas se sacan con
+#     fetch_df_chunk desde un cursor aparte
+#   - cada paso es un generador sobre bloques consecutivos en el tiempo:
+#       · duplicados: las filas del último timestamp de cada bloque se
+#         arrastran al siguiente antes del groupby(...).mean()
+#       · huecos: rellenar_timestamps_por_bloques arrastra el último
+#         timestamp, así que los huecos en las fronteras se detectan igual
+#       · el resto de pasos se aplica bloque a bloque (deben ser por fila)
+#   - cada bloque limpio se inserta directamente en la tabla DuckDB: la
+#     memoria de Python queda acotada por el tamaño del bloque
+# -----------------------------------------------------------
+
+STREAMING_CHUNK_ROWS = 500_000
+_VECTOR_ROWS = 2048  # filas por vector de DuckDB (unidad de fetch_df_chunk)
+
+
+def streaming_config(pipeline: dict) -> dict:
+    """
+    Config del modo streaming de pipelineCleanData (None si está desactivado).
+    Acepta `streaming: true` o `streaming: {enabled, chunk_rows, resolution}`.
+    """
+    cfg = (pipeline or {}).get("streaming")
+    if cfg is True:
+        cfg = {"enabled": True}
+    if not isinstance(cfg, dict) or not cfg.get("enabled", False):
+        return None
+    return {
+        "chunk_rows": max(int(cfg.get("chunk_rows") or STREAMING_CHUNK_ROWS), 1),
+        "resolution": cfg.get("resolution"),
+    }
+
+
+# -----------------------------------------------------------
+# Fuente: CSV ordenados por tiempo
+# -----------------------------------------------------------
+def stream_sorted_csvs(con, csv_list, timestamp_col: str = "Timestamp", chunk_rows: int = STREAMING_CHUNK_ROWS):
+    """
+    Genera DataFrames de ~chunk_rows filas indexados por `timestamp_col`, en
+    orden temporal global (misma lectura que el backend SQL: medidas
+    numéricas como DOUBLE, así todos los bloques tienen los mismos tipos).
+    """
+    fuente, _ = csv_source_sql(con, csv_list, timestamp_col)
+    sql = (
+        f"SELECT * EXCLUDE (__fichero, __fila, __relleno) FROM ({fuente})\n"
+        f'ORDER BY "{timestamp_col}", __fichero, __fila'
+    )
+    # cursor propio: la conexión principal queda libre para ir insertando
+    cur = con.cursor()
+    try:
+        cur.execute(sql)
+        vectores = max(chunk_rows // _VECTOR_ROWS, 1)
+        while True:
+            bloque = cur.fetch_df_chunk(vectores)
+            if bloque is None or bloque.empty:
+                break
+            yield bloque.set_index(timestamp_col)
+    finally:
+        cur.close()
+
+
+# -----------------------------------------------------------
+# Pasos con estado entre bloques
+# -----------------------------------------------------------
+def unify_duplicates_stream(bloques, stats: dict = None):
+    """
+    clean_and_unify_duplicates por bloques: las filas con el último timestamp
+    del bloque pueden seguir en el siguiente, así que se arrastran y se
+    agrupan junto a él. Cada grupo de duplicados se promedia completo.
+    """
+    stats = stats if stats is not None else {}
+    resto = None
+    for bloque in bloques:
+        if resto is not None and len(resto):
+            bloque = pd.concat([resto, bloque])
+        if bloque.empty:
+            continue
+        corte = bloque.index.searchsorted(bloque.index[-1], side="left")
+        resto, cuerpo = bloque.iloc[corte:], bloque.iloc[:corte]
+        if len(cuerpo):
+            unificado = cuerpo.groupby(level=0).mean()
+            stats["duplicados"] = stats.get("duplicados", 0) + len(cuerpo) - len(unificado)
+            yield unificado
+    if resto is not None and len(resto):
+        unificado = resto.groupby(level=0).mean()
+        stats["duplicados"] = stats.get("duplicados", 0) + len(resto) - len(unificado)
+        yield unificado
+
+
+def fill_gaps_stream(bloques, resolution=None, valor_relleno=999999.0, margen=0.5, stats: dict = None):
+    """
+    rellenar_timestamps por bloques. Sin `resolution` se usa la moda del
+    primer bloque (en el modo completo es la moda de todo el dataset).
+    """
+    stats = stats if stats is not None else {}
+    if resolution is not None:
+        resolution = pd.Timedelta(resolution)
+    for bloque, anomalies in rellenar_timestamps_por_bloques(bloques, resolution, valor_relleno, margen):
+        stats["huecos"] = stats.get("huecos", 0) + len(anomalies)
+        stats["filas_relleno"] = stats.get("filas_relleno", 0) + int(anomalies["missing_samples"].sum())
+        yield bloque
+
+
+def map_stream(bloques, step, timestamp_col: str):
+    """Pasos sin estado (por fila): se aplican a cada bloque por separado."""
+    for bloque in bloques:
+        yield step(bloque, timestamp_col)
+
+
+# -----------------------------------------------------------
+# Ejecución completa: CSV -> pasos -> tabla DuckDB
+# -----------------------------------------------------------
+def _etapas(bloques, steps: list, timestamp_col: str, resolution, stats: dict):
+    """Encadena los generadores de los pasos habilitados, en el orden del YAML."""
+    for i, step in enumerate(steps):
+        if step.func is merge_all_datasets:
+            if i:
+                raise ValueError(f"{step.name} solo puede ser el primer paso en modo streaming")
+            continue  # la fuente ya hace su trabajo
+        if step.reads_files:
+            raise ValueError(f"El paso {step.name} lee los ficheros él mismo: no admite modo streaming")
+        if step.func is clean_and_unify_duplicates:
+            bloques = unify_duplicates_stream(bloques, stats)
+        elif step.func is rellenar_timestamps:
+            params = {k: v for k, v in step.params.items() if k in ("valor_relleno", "margen")}
+            bloques = fill_gaps_stream(bloques, resolution or step.params.get("resolution"), stats=stats, **params)
+        else:
+            bloques = map_stream(bloques, step, timestamp_col)
+    return bloques
+
+
+def run_streaming_pipeline(con, table: str, csv_list, steps: list, timestamp_col: str = "Timestamp",
+                           chunk_rows: int = STREAMING_CHUNK_ROWS, resolution=None, progress=None) -> int:
+    """
+    Ejecuta la pipeline por bloques y escribe el resultado en `table`
+    (la reemplaza). Devuelve el número de filas insertadas.
+    """
+    progress = progress or (lambda paso: None)
+    stats = {}
+    progress("stream_pipeline")
+    logging.info("🌊 Pipeline en streaming sobre %s CSV (bloques de %s filas)", len(csv_list), chunk_rows)
+
+    bloques = _etapas(stream_sorted_csvs(con, csv_list, timestamp_col, chunk_rows), steps, timestamp_col,
+                      resolution, stats)
+
+    con.execute(f"DROP TABLE IF EXISTS {table}")
+    filas, n_bloques = 0, 0
+    for bloque in bloques:
+        if bloque.empty:
+            continue
+        if timestamp_col not in bloque.columns:
+            # sin normalize_timestamp_column el tiempo sigue en el índice
+            bloque = bloque.reset_index()
+        con.register("stream_chunk", bloque)
+        if n_bloques == 0:
+            con.execute(f"CREATE TABLE {table} AS SELECT * FROM stream_chunk")
+        else:
+            con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM stream_chunk")
+        con.unregister("stream_chunk")
+        filas += len(bloque)
+        n_bloques += 1
+        logging.info("   ✔️ Bloque %s: %s filas (total %s)", n_bloques, len(bloque), filas)
+
+    if "duplicados" in stats:
+        logging.info("🔁 %s filas duplicadas unificadas", stats["duplicados"])
+    if "huecos" in stats:
+        logging.info("⚠️ Huecos detectados: %s (%s filas de relleno)", stats["huecos"], stats["filas_relleno"])
+    logging.info("✅ Pipeline en streaming completada: %s filas en %s bloques", filas, n_bloques)
+    return filas
@@ -1,2 +1,3 @@
 export PORT=80
+python3 -m utils.prebuild
 gunicorn -w 1 app:server